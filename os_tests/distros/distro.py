@@ -64,7 +64,7 @@ class Distro(object):
                 out += utils_lib.run_cmd(self, "systemd-analyze blame")
 
                 out += "journalctl -b:\n\n"
-                out += utils_lib.run_cmd(self, "sudo journalctl -b")
+                out += utils_lib.run_cmd(self, "sudo journalctl -b", stream=True)
             except Exception as error:
                 out = "Failed to collect VM info: {0}.".format(error)
 
@@ -0,0 +1,274 @@
+import base64
+import hashlib
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import os_tests
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+AGENT_SCRIPT = os.path.join(
+    os.path.dirname(os_tests.__file__), "utils", "os_tests_agent.py"
+)
+# seconds to wait for agent answering the first ping
+START_TIMEOUT = 30
+# extra seconds to wait for response after cmd timeout, the agent kills cmd by itself
+RESPONSE_MARGIN = 30
+# bytes of each read request when fetching files
+CHUNK_SIZE = 4 * 1024 * 1024
+# agent dir relative to home of login user, the agent is run as root so it is
+# not put in a dir other users can write
+AGENT_DIR = ".cache/os-tests"
+
+
+class AgentError(Exception):
+    "Agent is not running or cannot finish request, callers fall back to plain ssh."
+
+
+class AgentTimeout(Exception):
+    "Cmd run by agent timed out, it is the same as ssh cmd timeout."
+
+
+class LocalTransport:
+    """
+    Run agent in a local subprocess, to test agent without remote system.
+    """
+
+    def __init__(self, cmd=None):
+        self.proc = subprocess.Popen(
+            cmd or [sys.executable, AGENT_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def write(self, data):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def readline(self):
+        return self.proc.stdout.readline()
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.proc.stdout.close()
+
+
+class SSHTransport:
+    """
+    Run agent in one exec channel of an existing paramiko ssh connection.
+    """
+
+    def __init__(self, ssh_client, cmd):
+        self.channel = ssh_client.get_transport().open_session()
+        self.channel.exec_command(cmd)
+        self.stdout = self.channel.makefile("rb")
+
+    def write(self, data):
+        self.channel.sendall(data)
+
+    def readline(self):
+        return self.stdout.readline()
+
+    def close(self):
+        self.channel.close()
+
+
+class AgentClient:
+    """
+    Send requests to agent through transport, requests from different threads
+    share the transport and are matched to responses by request id.
+    """
+
+    def __init__(self, transport, log=None):
+        self.transport = transport
+        self.log = log or LOG
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.alive = True
+        self.thread = threading.Thread(target=self._read_loop, name="agent-reader")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _read_loop(self):
+        while True:
+            try:
+                line = self.transport.readline()
+            except Exception:
+                line = b""
+            if not line:
+                break
+            try:
+                resp = json.loads(line)
+            except ValueError:
+                self.log.info("agent: bad response {}".format(line[:200]))
+                continue
+            with self.lock:
+                waiter = self.pending.pop(resp.get("id"), None)
+            if waiter:
+                waiter["resp"] = resp
+                waiter["event"].set()
+        with self.lock:
+            self.alive = False
+            for waiter in self.pending.values():
+                waiter["event"].set()
+            self.pending.clear()
+
+    def is_alive(self):
+        return self.alive
+
+    def request(self, op, wait=None, **kwargs):
+        """
+        Send request and wait for its response in wait seconds.
+        Return:
+            response dict
+        """
+        req_id = next(self.ids)
+        waiter = {"event": threading.Event(), "resp": None}
+        line = (json.dumps(dict(kwargs, id=req_id, op=op)) + "\n").encode()
+        with self.lock:
+            if not self.alive:
+                raise AgentError("agent is not running")
+            self.pending[req_id] = waiter
+            try:
+                self.transport.write(line)
+            except Exception as err:
+                self.pending.pop(req_id, None)
+                self.alive = False
+                raise AgentError("cannot send to agent: {}".format(err))
+        if not waiter["event"].wait(wait):
+            with self.lock:
+                self.pending.pop(req_id, None)
+            raise AgentError("no response of {} in {}s".format(op, wait))
+        resp = waiter["resp"]
+        if resp is None:
+            raise AgentError("agent exited")
+        if resp.get("error"):
+            raise AgentError(resp["error"])
+        return resp
+
+    def ping(self, wait=START_TIMEOUT):
+        return self.request("ping", wait=wait)
+
+    def exec(self, cmd, timeout=120):
+        """
+        Run cmd the same as ssh exec.
+        Return:
+            (status, output), output is stdout followed by stderr
+        """
+        resp = self.request(
+            "exec", wait=timeout + RESPONSE_MARGIN, cmd=cmd, timeout=timeout
+        )
+        if resp["timeout"]:
+            raise AgentTimeout("cmd timed out after {}s: {}".format(timeout, cmd))
+        return resp["status"], resp["stdout"] + resp["stderr"]
+
+    def stat(self, path, wait=60):
+        return self.request("stat", wait=wait, path=path)
+
+    def read(self, path, offset=0, size=CHUNK_SIZE, wait=120):
+        resp = self.request("read", wait=wait, path=path, offset=offset, size=size)
+        return base64.b64decode(resp["data"]), resp["eof"]
+
+    def write(self, path, data, append=False, mode=None, wait=120):
+        return self.request(
+            "write",
+            wait=wait,
+            path=path,
+            data=base64.b64encode(data).decode(),
+            append=append,
+            mode=mode,
+        )
+
+    def tail(self, path, offset=0, wait=120):
+        """
+        Return:
+            (new content since offset, new offset)
+        """
+        resp = self.request("tail", wait=wait, path=path, offset=offset)
+        return base64.b64decode(resp["data"]), resp["offset"]
+
+    def get_file(self, rmt_file, local_file):
+        "Fetch file from system under test in chunks."
+        offset = 0
+        with open(local_file, "wb") as fh:
+            while True:
+                data, eof = self.read(rmt_file, offset=offset)
+                fh.write(data)
+                offset += len(data)
+                if eof:
+                    break
+        return offset
+
+    def close(self):
+        with self.lock:
+            self.alive = False
+        try:
+            self.transport.close()
+        except Exception:
+            pass
+
+
+def get_agent_digest():
+    with open(AGENT_SCRIPT, "rb") as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+
+def get_agent_path(digest=None):
+    "Remote path of agent, named by its content so a changed agent is uploaded again."
+    return "{}/os_tests_agent_{}.py".format(AGENT_DIR, (digest or get_agent_digest())[:12])
+
+
+def start_ssh_agent(ssh, log=None):
+    """
+    Upload agent if it is not there and start it as root in a new channel of ssh.
+    The uploaded file is run only if it is owned by login user in a private
+    dir and its sha1 is the agent's, a broken upload is replaced.
+    Return:
+        AgentClient or None if agent cannot start, eg. no python or sudo needs password
+    """
+    log = log or LOG
+    digest = get_agent_digest()
+    agent_path = get_agent_path(digest)
+    check_cmd = "test -O {0} && test ! -L {0} && echo '{1}  {0}' | sha1sum -c --status".format(
+        agent_path, digest
+    )
+    try:
+        ret, _, _ = ssh.cli_run(
+            cmd="mkdir -p {0} && chmod 700 {0} && {1}".format(AGENT_DIR, check_cmd)
+        )
+        if ret != 0:
+            if not ssh.put_file(local_file=AGENT_SCRIPT, rmt_file=agent_path):
+                log.info("cannot upload agent to {}".format(ssh.rmt_node))
+                return None
+            ret, _, _ = ssh.cli_run(cmd=check_cmd)
+            if ret != 0:
+                log.info("uploaded agent on {} does not match, do not run it".format(ssh.rmt_node))
+                return None
+        cmd = "py=$(command -v python3 || echo /usr/libexec/platform-python); "
+        cmd += "exec sudo -n $py {}".format(agent_path)
+        client = AgentClient(SSHTransport(ssh.ssh_client, cmd), log=log)
+        try:
+            client.ping()
+        except AgentError:
+            client.close()
+            raise
+    except Exception as err:
+        log.info(
+            "agent is not available on {}, use plain ssh: {}".format(ssh.rmt_node, err)
+        )
+        return None
+    log.info("agent started on {}".format(ssh.rmt_node))
+    return client
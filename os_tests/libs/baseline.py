@@ -0,0 +1,344 @@
+import collections
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+
+import os_tests
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os_tests.__file__), "data", "baseline_log.json"
+)
+# shorter literals match too many lines to help rejecting them
+MIN_LITERAL_SIZE = 3
+INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+[:)]")
+QUANTIFIER = re.compile(r"\{\d*(,\d*)?\}")
+# a line is similar to a baseline content if their difflib ratio is over it
+SIMILAR_RATE = 70
+# lines whose similarity results are kept, cases check the same log lines
+SIMILAR_CACHE_SIZE = 100000
+START_WORD = re.compile(r"\w{3,}")
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_required_literal(pattern):
+    """
+    Return the longest literal string that every match of regex pattern
+    contains, or None if it cannot be told, eg. "|" at top level.
+    Only literals out of groups and char classes are taken, a char followed
+    by "*", "?" or "{m,n}" is optional and not taken.
+    """
+    if INLINE_FLAGS.search(pattern):
+        return None
+    runs = []
+    run = ""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if in_class:
+            if char == "\\":
+                i += 1
+            elif char == "]":
+                in_class = False
+        elif char == "\\":
+            escaped = pattern[i + 1 : i + 2]
+            if depth == 0 and escaped and not escaped.isalnum():
+                run += escaped
+            else:
+                runs.append(run)
+                run = ""
+            i += 1
+        elif char == "[":
+            runs.append(run)
+            run = ""
+            in_class = True
+            # "]" right after "[" or "[^" is a member of the class
+            if pattern[i + 1 : i + 2] == "^":
+                i += 1
+            if pattern[i + 1 : i + 2] == "]":
+                i += 1
+        elif char == "(":
+            runs.append(run)
+            run = ""
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|":
+            if depth == 0:
+                return None
+        elif char in "*?{":
+            runs.append(run[:-1])
+            run = ""
+            quantifier = QUANTIFIER.match(pattern, i)
+            if quantifier:
+                i = quantifier.end() - 1
+        elif char in "+.^$":
+            runs.append(run)
+            run = ""
+        elif depth == 0:
+            run += char
+        i += 1
+    runs.append(run)
+    literal = max(runs, key=len)
+    return literal if len(literal) >= MIN_LITERAL_SIZE else None
+
+
+def get_example(pattern):
+    """
+    Return a short string matching regex pattern, None if it cannot be made,
+    eg. pattern has lookarounds or backrefs.
+    """
+    categories = {
+        sre_parse.CATEGORY_DIGIT: "0",
+        sre_parse.CATEGORY_NOT_DIGIT: "a",
+        sre_parse.CATEGORY_SPACE: " ",
+        sre_parse.CATEGORY_NOT_SPACE: "a",
+        sre_parse.CATEGORY_WORD: "a",
+        sre_parse.CATEGORY_NOT_WORD: " ",
+    }
+
+    def make(items):
+        text = ""
+        for op, av in items:
+            if op == sre_parse.LITERAL:
+                text += chr(av)
+            elif op == sre_parse.NOT_LITERAL:
+                text += "a" if av != ord("a") else "b"
+            elif op == sre_parse.ANY:
+                text += "x"
+            elif op == sre_parse.IN:
+                op, av = av[0]
+                if op == sre_parse.LITERAL:
+                    text += chr(av)
+                elif op == sre_parse.RANGE:
+                    text += chr(av[0])
+                elif op == sre_parse.CATEGORY and av in categories:
+                    text += categories[av]
+                else:
+                    return None
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                sub = make(av[2])
+                if sub is None:
+                    return None
+                text += sub * av[0]
+            elif op == sre_parse.SUBPATTERN:
+                sub = make(av[-1])
+                if sub is None:
+                    return None
+                text += sub
+            elif op == sre_parse.BRANCH:
+                sub = make(av[1][0])
+                if sub is None:
+                    return None
+                text += sub
+            elif op != sre_parse.AT:
+                return None
+        return text
+
+    try:
+        return make(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+
+def is_required_literal(regex, literal):
+    "Literal is in an example match of compiled regex."
+    example = get_example(regex.pattern)
+    return example is not None and bool(regex.search(example)) and literal in example
+
+
+def get_start_word(line):
+    "Return the first word of line with 3 chars at least, None if no such word."
+    found = START_WORD.search(line)
+    return found.group() if found else None
+
+
+def clean_sentence(line1, line2, start_words=None):
+    """
+    Cut the longer line to start from the first word of the shorter line, if
+    both lines contain the word. start_words are the start words of line1
+    and line2 if they are known.
+    """
+    line1_longer = len(line1) > len(line2)
+    if start_words:
+        word = start_words[1] if line1_longer else start_words[0]
+    else:
+        word = get_start_word(line2 if line1_longer else line1)
+    if not word or word not in line1 or word not in line2:
+        return line1, line2
+    if line1_longer:
+        return line1[line1.index(word) :], line2
+    return line1, line2[line2.index(word) :]
+
+
+def get_upper_ratio(line1, line2, counter1=None, counter2=None):
+    """
+    Return an upper bound of difflib.SequenceMatcher(None, line1, line2).ratio(),
+    from the line lengths and then the chars in common.
+    """
+    total = len(line1) + len(line2)
+    if not total:
+        return 1.0
+    upper = 2.0 * min(len(line1), len(line2)) / total
+    if upper * 100 <= SIMILAR_RATE:
+        return upper
+    counter1 = counter1 if counter1 is not None else collections.Counter(line1)
+    counter2 = counter2 if counter2 is not None else collections.Counter(line2)
+    return 2.0 * sum((counter1 & counter2).values()) / total
+
+
+class BaselineIndex:
+    """
+    Baseline of known log messages with its regex compiled once.
+    Rules are scoped by the cases they list, rules without cases apply to all.
+    Each regex is keyed by the longest literal its matches must contain, a line
+    is checked only by the regex whose literal is in it(and the ones without
+    literal), and a line without any literal is rejected by one search.
+    """
+
+    def __init__(self, baseline_dict):
+        self.baseline = baseline_dict
+        self.order = {key: seq for seq, key in enumerate(baseline_dict)}
+        # {key: set of cases}, rules without cases are not here
+        self.rule_cases = {}
+        # {case: [keys]}
+        self.case_keys = {}
+        # {literal: [(key, regex)]}
+        self.literal_rules = {}
+        # [(key, regex)] of regex without literal
+        self.other_rules = []
+        self.triggers = []
+        # [(key, content, start word, chars counter)] to compare lines with
+        self.contents = []
+        self.similar_cache = {}
+        for key, rule in baseline_dict.items():
+            cases = set(re.split(r"[,\s]+", (rule.get("cases") or "").strip())) - {""}
+            if cases:
+                self.rule_cases[key] = cases
+                for case in cases:
+                    self.case_keys.setdefault(case, []).append(key)
+            if rule.get("trigger"):
+                self.triggers.append(rule["trigger"])
+            content = rule["content"]
+            self.contents.append(
+                (key, content, get_start_word(content), collections.Counter(content))
+            )
+            for content in rule["content"].split(";"):
+                if not content:
+                    continue
+                try:
+                    regex = re.compile(content)
+                except re.error as err:
+                    LOG.info("skip bad regex in baseline {}: {}".format(key, err))
+                    continue
+                literal = get_required_literal(content)
+                if literal and not is_required_literal(regex, literal):
+                    LOG.info(
+                        "'{}' is not in the match of baseline {}, check it without literal".format(
+                            literal, key
+                        )
+                    )
+                    literal = None
+                if literal:
+                    self.literal_rules.setdefault(literal, []).append((key, regex))
+                else:
+                    self.other_rules.append((key, regex))
+        self.prefilter = None
+        if self.literal_rules:
+            self.prefilter = re.compile(
+                "|".join(
+                    re.escape(i)
+                    for i in sorted(self.literal_rules, key=len, reverse=True)
+                )
+            )
+
+    def in_scope(self, key, case=None):
+        "Rule applies to case, all rules apply if case is None."
+        return case is None or key not in self.rule_cases or case in self.rule_cases[key]
+
+    def keys_of_case(self, case):
+        "Return keys of rules listing case."
+        return self.case_keys.get(case, [])
+
+    def match(self, line, case=None):
+        """
+        Return key of the rule whose regex is found in line, the last one in
+        baseline if more rules match, None if no rule matches.
+        """
+        candidates = list(self.other_rules)
+        if self.prefilter and self.prefilter.search(line):
+            for literal, rules in self.literal_rules.items():
+                if literal in line:
+                    candidates.extend(rules)
+        candidates.sort(key=lambda rule: self.order[rule[0]], reverse=True)
+        for key, regex in candidates:
+            if self.in_scope(key, case) and regex.search(line):
+                return key
+        return None
+
+    def similar(self, line, case=None):
+        """
+        Return (key, rate) of the first baseline content(in baseline order)
+        whose difflib ratio with line is over SIMILAR_RATE after
+        clean_sentence(), (None, None) if no content is similar.
+        Only contents whose ratio upper bound is over SIMILAR_RATE are
+        compared by difflib, results are cached for the next cases.
+        """
+        cache_key = (line, case)
+        if cache_key in self.similar_cache:
+            return self.similar_cache[cache_key]
+        result = (None, None)
+        line_word = get_start_word(line)
+        line_counter = collections.Counter(line)
+        for key, content, content_word, content_counter in self.contents:
+            if not self.in_scope(key, case):
+                continue
+            line1, line2 = clean_sentence(line, content, (line_word, content_word))
+            if (
+                get_upper_ratio(
+                    line1,
+                    line2,
+                    line_counter if line1 is line else None,
+                    content_counter if line2 is content else None,
+                )
+                * 100
+                <= SIMILAR_RATE
+            ):
+                continue
+            rate = difflib.SequenceMatcher(None, a=line1, b=line2).ratio() * 100
+            if rate > SIMILAR_RATE:
+                result = (key, rate)
+                break
+        if len(self.similar_cache) >= SIMILAR_CACHE_SIZE:
+            self.similar_cache.clear()
+        self.similar_cache[cache_key] = result
+        return result
+
+
+def get_baseline_index(baseline_dict=None):
+    """
+    Return the index of baseline_log.json loaded once in a run, or a new
+    index of baseline_dict if it is not the one loaded.
+    """
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            with open(BASELINE_FILE, "r") as fh:
+                LOG.info("Loading baseline data file from {}".format(BASELINE_FILE))
+                _INDEX = BaselineIndex(json.load(fh))
+    if baseline_dict is None or baseline_dict is _INDEX.baseline:
+        return _INDEX
+    return BaselineIndex(baseline_dict)
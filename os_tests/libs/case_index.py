@@ -0,0 +1,305 @@
+import ast
+import importlib
+import json
+import logging
+import os
+import re
+from fnmatch import fnmatch
+
+from .utils_lib import parse_case_doc
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# short names can be used in select expression
+FIELD_ALIASES = {"name": "case_name", "tag": "case_tag"}
+# fields might have multiple values separated by ","
+MULTI_VALUE_FIELDS = ["case_tag"]
+QUERY_TOKEN = re.compile(r'\s*(?:([&|!()])|([\w.-]+)\s*([:=])\s*(?:"([^"]*)"|([^\s&|!()]+))|([^\s&|!()]+))')
+
+
+class CaseIndex:
+    """
+    Index of cases and their parsed docs, built by parsing test files instead
+    of importing them. The index is cached in a local json file and only the
+    changed test files are parsed again.
+    """
+
+    def __init__(self, start_dir, top_level_dir, pattern="test_*.py", cache_file=None):
+        self.start_dir = os.path.realpath(start_dir)
+        self.top_level_dir = os.path.realpath(top_level_dir)
+        self.pattern = pattern
+        self.cache_file = cache_file or os.path.expanduser(
+            "~/.cache/os-tests/case_index.json"
+        )
+        self.files = {}
+        self.cases = {}
+        self.postings = None
+        self.load()
+
+    def load(self):
+        cache_data = {}
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as fh:
+                    cache_data = json.load(fh)
+            except Exception as err:
+                LOG.info("cannot load case index from {}: {}".format(self.cache_file, err))
+        is_changed = False
+        for test_file in self._find_files():
+            file_stat = os.stat(test_file)
+            file_data = cache_data.get(test_file)
+            if (
+                not file_data
+                or file_data["mtime"] != file_stat.st_mtime_ns
+                or file_data["size"] != file_stat.st_size
+            ):
+                file_data = {
+                    "mtime": file_stat.st_mtime_ns,
+                    "size": file_stat.st_size,
+                    "cases": self._parse_file(test_file),
+                }
+                is_changed = True
+            self.files[test_file] = file_data
+            self.cases.update(file_data["cases"])
+        cached_files = [i for i in cache_data if i.startswith(self.start_dir + os.sep)]
+        if is_changed or set(cached_files) != set(self.files):
+            self.save()
+
+    def save(self):
+        # other test dirs(eg. another installation) share the same cache file
+        cache_data = {}
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as fh:
+                    cache_data = json.load(fh)
+            except Exception:
+                pass
+        for test_file in list(cache_data):
+            if test_file.startswith(self.start_dir + os.sep):
+                del cache_data[test_file]
+        cache_data.update(self.files)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = "{}.{}.tmp".format(self.cache_file, os.getpid())
+            with open(tmp_file, "w") as fh:
+                json.dump(cache_data, fh, default=str)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as err:
+            LOG.info("cannot save case index to {}: {}".format(self.cache_file, err))
+
+    def _find_files(self):
+        """
+        Find test files in the same order as unittest discover.
+        """
+        test_files = []
+        paths = [self.start_dir]
+        while paths:
+            path = paths.pop(0)
+            sub_paths = []
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if os.path.isfile(full_path) and name.endswith(".py"):
+                    if fnmatch(name, self.pattern):
+                        test_files.append(full_path)
+                elif os.path.isfile(os.path.join(full_path, "__init__.py")):
+                    sub_paths.append(full_path)
+            paths = sub_paths + paths
+        return test_files
+
+    def _parse_file(self, test_file):
+        """
+        Get cases from test file without importing it.
+        Return:
+            dict of case id and its doc, class name and file
+        """
+        cases = {}
+        module_name = os.path.splitext(
+            os.path.relpath(test_file, self.top_level_dir)
+        )[0].replace(os.sep, ".")
+        try:
+            with open(test_file, "r") as fh:
+                tree = ast.parse(fh.read(), filename=test_file)
+        except Exception as err:
+            LOG.info("Cannot parse {}: {}".format(test_file, err))
+            return cases
+        class_nodes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+        for class_node in sorted(class_nodes, key=lambda node: node.name):
+            if not any(self._is_testcase(base) for base in class_node.bases):
+                continue
+            method_nodes = [
+                node
+                for node in class_node.body
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and node.name.startswith("test")
+            ]
+            for method_node in sorted(method_nodes, key=lambda node: node.name):
+                case_id = "{}.{}.{}".format(
+                    module_name, class_node.name, method_node.name
+                )
+                cases[case_id] = {
+                    "file": test_file,
+                    "class_name": class_node.name,
+                    "doc": parse_case_doc(
+                        ast.get_docstring(method_node, clean=False), case_id
+                    ),
+                }
+        return cases
+
+    def get_loadable(self, case_names):
+        """
+        Return case_names whose test module can be imported, unittest discover
+        leaves out the cases of modules it cannot import, eg. a required pkg
+        is not installed, and they cannot run.
+        """
+        modules = {}
+        loadable = []
+        for case_name in case_names:
+            module_name = case_name.rsplit(".", 2)[0]
+            if module_name not in modules:
+                try:
+                    importlib.import_module(module_name)
+                    modules[module_name] = True
+                except Exception as err:
+                    LOG.info("Cannot import {}, skip its cases: {}".format(module_name, err))
+                    modules[module_name] = False
+            if modules[module_name]:
+                loadable.append(case_name)
+        return loadable
+
+    def _build_postings(self):
+        """
+        Build inverted index: field -> value -> set of case ids.
+        """
+        self.postings = {}
+        for case_name, case_data in self.cases.items():
+            for field, field_value in case_data["doc"].items():
+                if field_value is None or isinstance(field_value, dict):
+                    continue
+                values = field_value if isinstance(field_value, list) else [field_value]
+                values = [str(value) for value in values]
+                if field in MULTI_VALUE_FIELDS:
+                    values = [i.strip() for value in values for i in value.split(",")]
+                for value in values:
+                    self.postings.setdefault(field, {}).setdefault(value, set()).add(
+                        case_name
+                    )
+
+    def match(self, field, value, strict=False):
+        """
+        Return set of case ids whose field contains value, or equals value if strict.
+        """
+        if self.postings is None:
+            self._build_postings()
+        field = FIELD_ALIASES.get(field, field)
+        field_postings = self.postings.get(field) or {}
+        if strict:
+            return set(field_postings.get(value) or set())
+        matched = set()
+        for field_value, case_names in field_postings.items():
+            if value in field_value:
+                matched |= case_names
+        return matched
+
+    def filter(self, patterns=None, skip_patterns=None, filter_field="case_name", strict=False):
+        """
+        Select cases by comma separated patterns and skip_patterns on filter_field.
+        Return:
+            list of case ids in index order
+        """
+        selected = set(self.cases)
+        if patterns:
+            selected = set()
+            for pattern in patterns.split(","):
+                selected |= self.match(filter_field, pattern, strict=strict)
+        if skip_patterns:
+            for pattern in skip_patterns.split(","):
+                selected -= self.match(filter_field, pattern, strict=strict)
+        return [case_name for case_name in self.cases if case_name in selected]
+
+    def query(self, expr):
+        """
+        Select cases by boolean expression, eg. "component:kernel & tag:tier1 & !name:ltp".
+        field:value matches cases whose field contains value, field=value requires
+        exactly equal, value without field matches case_name.
+        Operators are "&", "|", "!" and parentheses, "&" binds tighter than "|".
+        Return:
+            list of case ids in index order
+        """
+        self._tokens = self._tokenize(expr)
+        self._pos = 0
+        selected = self._parse_or()
+        if self._pos < len(self._tokens):
+            raise ValueError("unexpected '{}' in select expression: {}".format(
+                self._tokens[self._pos][1], expr))
+        return [case_name for case_name in self.cases if case_name in selected]
+
+    @staticmethod
+    def _tokenize(expr):
+        tokens = []
+        pos = 0
+        expr = expr.rstrip()
+        while pos < len(expr):
+            ret = QUERY_TOKEN.match(expr, pos)
+            if not ret or ret.end() == pos:
+                raise ValueError("cannot parse select expression from: {}".format(expr[pos:]))
+            operator, field, sep, quoted_value, value, name = ret.groups()
+            if operator:
+                tokens.append(("op", operator))
+            elif field:
+                tokens.append(("term", (field, quoted_value if quoted_value is not None else value, sep == "=")))
+            else:
+                tokens.append(("term", ("case_name", name, False)))
+            pos = ret.end()
+        return tokens
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return (None, None)
+
+    def _parse_or(self):
+        selected = self._parse_and()
+        while self._peek() == ("op", "|"):
+            self._pos += 1
+            selected = selected | self._parse_and()
+        return selected
+
+    def _parse_and(self):
+        operands = [self._parse_not()]
+        while self._peek() == ("op", "&"):
+            self._pos += 1
+            operands.append(self._parse_not())
+        # intersect from the shortest posting list
+        operands.sort(key=len)
+        selected = operands[0]
+        for operand in operands[1:]:
+            selected = selected & operand
+        return selected
+
+    def _parse_not(self):
+        if self._peek() == ("op", "!"):
+            self._pos += 1
+            return set(self.cases) - self._parse_not()
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token_type, token = self._peek()
+        self._pos += 1
+        if token_type == "term":
+            field, value, strict = token
+            return self.match(field, value, strict=strict)
+        if token == "(":
+            selected = self._parse_or()
+            if self._peek() != ("op", ")"):
+                raise ValueError("missing ')' in select expression")
+            self._pos += 1
+            return selected
+        raise ValueError("unexpected '{}' in select expression".format(token or "end"))
+
+    @staticmethod
+    def _is_testcase(base):
+        if isinstance(base, ast.Attribute):
+            return base.attr == "TestCase"
+        if isinstance(base, ast.Name):
+            return base.id == "TestCase"
+        return False
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import unittest
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# seconds a leased case is kept by worker without heartbeat
+LEASE_TIME = 300
+# seconds between 2 heartbeats of worker
+HEARTBEAT_INTERVAL = 30
+# seconds for workers to poll the queue when all left cases are leased by others
+POLL_INTERVAL = 10
+# a case is given up after leased so many times by workers which then disappeared
+MAX_ATTEMPTS = 2
+
+
+class CaseQueue:
+    """
+    Cases shared by coordinator and workers in a sqlite db. Workers lease cases
+    and keep the leases by heartbeat, cases leased by a crashed worker are back
+    to pending after the lease expires.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+
+    def _connect(self):
+        # sqlite connection cannot be shared between threads, open one per call
+        conn = sqlite3.connect(self.db_file, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_cases(self, case_ids):
+        "Called by coordinator, cases are leased in the order of case_ids."
+        os.makedirs(os.path.dirname(os.path.realpath(self.db_file)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cases (case_id TEXT PRIMARY KEY, seq INTEGER, "
+                "state TEXT, worker TEXT, lease_expire REAL, attempts INTEGER DEFAULT 0, "
+                "results_dir TEXT, row TEXT, done_time REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS workers (name TEXT PRIMARY KEY, heartbeat REAL)"
+            )
+            for seq, case_id in enumerate(case_ids):
+                conn.execute(
+                    "INSERT OR IGNORE INTO cases (case_id, seq, state) VALUES (?, ?, 'pending')",
+                    (case_id, seq),
+                )
+            conn.execute("COMMIT")
+
+    def reclaim(self):
+        "Put the cases whose lease expired back to pending."
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            num = self._reclaim(conn)
+            conn.execute("COMMIT")
+        return num
+
+    def _reclaim(self, conn):
+        now = time.time()
+        expired = conn.execute(
+            "SELECT case_id, worker, attempts FROM cases WHERE state = 'leased' AND lease_expire < ?",
+            (now,),
+        ).fetchall()
+        for case in expired:
+            if case["attempts"] >= MAX_ATTEMPTS:
+                LOG.info(
+                    "{} lost in {} workers, give it up".format(case["case_id"], case["attempts"])
+                )
+                row = [0, case["case_id"], "ERROR", "worker {} lost".format(case["worker"]),
+                       0, "", case["case_id"].split(".")[-2]]
+                conn.execute(
+                    "UPDATE cases SET state = 'done', row = ?, done_time = ? WHERE case_id = ?",
+                    (json.dumps(row), now, case["case_id"]),
+                )
+            else:
+                LOG.info("{} lease expired, {} might be gone".format(case["case_id"], case["worker"]))
+                conn.execute(
+                    "UPDATE cases SET state = 'pending', worker = NULL WHERE case_id = ?",
+                    (case["case_id"],),
+                )
+        return len(expired)
+
+    def lease(self, worker):
+        """
+        Lease next pending case to worker.
+        Return:
+            case id or None if no pending case
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim(conn)
+            case = conn.execute(
+                "SELECT case_id FROM cases WHERE state = 'pending' ORDER BY seq LIMIT 1"
+            ).fetchone()
+            if case:
+                conn.execute(
+                    "UPDATE cases SET state = 'leased', worker = ?, lease_expire = ?, "
+                    "attempts = attempts + 1 WHERE case_id = ?",
+                    (worker, time.time() + LEASE_TIME, case["case_id"]),
+                )
+            conn.execute("COMMIT")
+        return case and case["case_id"] or None
+
+    def release(self, case_id, worker):
+        "Give back a leased case without result."
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cases SET state = 'pending', worker = NULL, attempts = attempts - 1 "
+                "WHERE case_id = ? AND worker = ? AND state = 'leased'",
+                (case_id, worker),
+            )
+
+    def heartbeat(self, worker):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (name, heartbeat) VALUES (?, ?)", (worker, now)
+            )
+            conn.execute(
+                "UPDATE cases SET lease_expire = ? WHERE worker = ? AND state = 'leased'",
+                (now + LEASE_TIME, worker),
+            )
+
+    def complete(self, case_id, worker, row, results_dir):
+        """
+        Save result of a case leased by worker.
+        Return:
+            False if the case is not leased by worker any more, eg. its lease
+            expired and it is leased by another worker, the result is dropped.
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE cases SET state = 'done', row = ?, results_dir = ?, done_time = ? "
+                "WHERE case_id = ? AND worker = ? AND state = 'leased'",
+                (json.dumps(row), results_dir, time.time(), case_id, worker),
+            ).rowcount
+        if not updated:
+            LOG.info("{} is not leased by {} any more, drop its result".format(case_id, worker))
+        return bool(updated)
+
+    def count(self):
+        "Return dict of case num in each state."
+        with self._connect() as conn:
+            return {
+                case["state"]: case["num"]
+                for case in conn.execute(
+                    "SELECT state, COUNT(*) AS num FROM cases GROUP BY state"
+                ).fetchall()
+            }
+
+    def is_finished(self):
+        num = self.count()
+        return not num.get("pending") and not num.get("leased")
+
+    def results(self):
+        "Return list of (row, results_dir) of done cases in finished order."
+        with self._connect() as conn:
+            return [
+                (json.loads(case["row"]), case["results_dir"])
+                for case in conn.execute(
+                    "SELECT row, results_dir FROM cases WHERE state = 'done' ORDER BY done_time"
+                ).fetchall()
+            ]
+
+
+class LeasedCases:
+    """
+    Queue of cases leased from CaseQueue for HTMLTestRunner, it has the same
+    get_nowait()/put() as queue.Queue used by runner workers.
+    """
+
+    def __init__(self, db_file, name=None, setup_case=None):
+        self.case_queue = CaseQueue(db_file)
+        self.name = name or "{}-{}".format(socket.gethostname(), os.getpid())
+        # called with each loaded case to set params, etc.
+        self.setup_case = setup_case
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._heartbeat_loop, name="heartbeat")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _heartbeat_loop(self):
+        while True:
+            try:
+                self.case_queue.heartbeat(self.name)
+            except sqlite3.Error as err:
+                LOG.info("heartbeat failed: {}".format(err))
+            if self.stopped.wait(HEARTBEAT_INTERVAL):
+                break
+
+    def stop(self):
+        self.stopped.set()
+
+    @property
+    def planned(self):
+        return sum(self.case_queue.count().values())
+
+    def get_nowait(self):
+        """
+        Return next leased case, wait if all left cases are leased by other
+        workers as they might come back to pending.
+        Raise queue.Empty when all cases are done.
+        """
+        while True:
+            with self.lock:
+                case_id = self.case_queue.lease(self.name)
+            if case_id:
+                for case in unittest.defaultTestLoader.loadTestsFromName(case_id):
+                    if case.id() != case_id:
+                        break
+                    if self.setup_case:
+                        self.setup_case(case)
+                    return case
+                # loaded another case or nothing, do not keep it leased
+                LOG.info("Cannot load case:{}".format(case_id))
+                self.case_queue.complete(
+                    case_id, self.name, [0, case_id, "ERROR", "cannot load case",
+                                         0, "", case_id.split(".")[-2]], None)
+                continue
+            if self.case_queue.is_finished():
+                raise queue.Empty
+            time.sleep(POLL_INTERVAL)
+
+    def put(self, ts):
+        self.case_queue.release(ts.id(), self.name)
+
+    def complete(self, ts, row):
+        self.case_queue.complete(ts.id(), self.name, row, ts.params["results_dir"])
@@ -0,0 +1,191 @@
+import collections
+import itertools
+import os
+import re
+import select
+import shlex
+import signal
+import subprocess
+import time
+
+# lines of streamed output kept in memory, logged and returned
+STREAM_HEAD_LINES = 50
+STREAM_TAIL_LINES = 100
+# a line longer than it is cut, so memory does not grow with a line without "\n"
+MAX_LINE_SIZE = 64 * 1024
+# matched lines kept for each keyword, enough to be shown in failure message
+MAX_MATCHES = 20
+CHUNK_SIZE = 65536
+# seconds for a timed out remote cmd to exit after SIGTERM before SIGKILL
+KILL_GRACE = 10
+# exit status of a cmd stopped by timeout(1), after SIGTERM or SIGKILL
+TIMEOUT_STATUS = (124, 137)
+
+_FILE_COUNTER = itertools.count(1)
+
+
+def get_timeout_cmd(cmd, timeout):
+    "Return cmd run under timeout(1), so it is stopped on the node it runs on."
+    return "timeout -k {} {} bash -c {}".format(KILL_GRACE, timeout, shlex.quote(cmd))
+
+
+def is_timed_out(status, start, timeout):
+    "cmd of get_timeout_cmd() exited with status was stopped by timeout(1)."
+    return status in TIMEOUT_STATUS and time.time() - start >= timeout
+
+
+def get_stream_file(out_dir, cmd):
+    "Return a new attachment file name for output of cmd."
+    name = re.sub(r"[^\w.-]+", "_", cmd).strip("_")[:60]
+    return os.path.join(out_dir, "cmd-{}-{}.log".format(next(_FILE_COUNTER), name))
+
+
+class StreamCapture:
+    """
+    Copy cmd output to a file chunk by chunk, keep only its head and tail
+    lines in memory and match keywords line by line as the output comes.
+    patterns are matched the same as expect_kw of run_cmd(".*kw.*" in a
+    line), words are plain strings as cancel_kw.
+    """
+
+    def __init__(
+        self,
+        out_file,
+        patterns=None,
+        words=None,
+        head=STREAM_HEAD_LINES,
+        tail=STREAM_TAIL_LINES,
+    ):
+        self.out_file = out_file
+        self.fh = open(out_file, "wb")
+        self.head_num = head
+        self.head = []
+        self.tail = collections.deque(maxlen=tail)
+        self.line_num = 0
+        self.size = 0
+        self.partial = b""
+        self.patterns = {
+            kw: re.compile(".*" in kw and kw or ".*{}.*".format(kw))
+            for kw in patterns or []
+        }
+        self.matches = {kw: [] for kw in self.patterns}
+        self.words = {word: False for word in words or []}
+
+    def feed(self, data):
+        if not data:
+            return
+        self.fh.write(data)
+        self.size += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        if len(self.partial) > MAX_LINE_SIZE:
+            lines.append(self.partial)
+            self.partial = b""
+        for line in lines:
+            self._add_line(line.decode("utf-8", "replace") + "\n")
+
+    def _add_line(self, line):
+        self.line_num += 1
+        if len(self.head) < self.head_num:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+        for kw, pattern in self.patterns.items():
+            if len(self.matches[kw]) < MAX_MATCHES:
+                self.matches[kw].extend(pattern.findall(line))
+        for word in self.words:
+            if not self.words[word] and word in line:
+                self.words[word] = True
+
+    def close(self):
+        if self.partial:
+            self._add_line(self.partial.decode("utf-8", "replace"))
+            self.partial = b""
+        self.fh.close()
+
+    def findall(self, kw):
+        return self.matches.get(kw) or []
+
+    def contains(self, word):
+        return self.words.get(word, False)
+
+    @property
+    def summary(self):
+        "Head and tail of output, with a mark of skipped lines."
+        skipped = self.line_num - len(self.head) - len(self.tail)
+        mark = ""
+        if skipped > 0:
+            mark = "...({} lines skipped, full output {} bytes in {})...\n".format(
+                skipped, self.size, self.out_file
+            )
+        return "".join(self.head) + mark + "".join(self.tail)
+
+
+def stream_ssh(ssh_client, cmd, capture, timeout):
+    """
+    Run cmd in a new channel and feed its output to capture. cmd runs under
+    timeout(1) on the node, so it is stopped there too when it times out,
+    the channel is only closed locally if the node does not stop it in time.
+    Return:
+        exit status
+    """
+    channel = ssh_client.get_transport().open_session()
+    try:
+        channel.set_combine_stderr(True)
+        channel.settimeout(1)
+        channel.exec_command(get_timeout_cmd(cmd, timeout))
+        start = time.time()
+        deadline = start + timeout + KILL_GRACE * 2
+        while True:
+            try:
+                data = channel.recv(CHUNK_SIZE)
+            except OSError:
+                # socket.timeout, no output in last second
+                data = None
+            if data:
+                capture.feed(data)
+            elif data == b"":
+                break
+            if time.time() > deadline:
+                raise TimeoutError("timed out after {}s: {}".format(timeout, cmd))
+        status = channel.recv_exit_status()
+        if is_timed_out(status, start, timeout):
+            raise TimeoutError("timed out after {}s: {}".format(timeout, cmd))
+        return status
+    finally:
+        channel.close()
+        capture.close()
+
+
+def stream_local(cmd, capture, timeout):
+    """
+    Run cmd in local shell and feed its output to capture.
+    Return:
+        exit status
+    """
+    proc = subprocess.Popen(
+        cmd,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    try:
+        deadline = time.time() + timeout
+        fd = proc.stdout.fileno()
+        while True:
+            ready, _, _ = select.select([fd], [], [], 1)
+            if ready:
+                data = os.read(fd, CHUNK_SIZE)
+                if not data:
+                    break
+                capture.feed(data)
+            if time.time() > deadline:
+                # children of shell might keep the pipe open, kill the session
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                raise TimeoutError("timed out after {}s: {}".format(timeout, cmd))
+        return proc.wait()
+    finally:
+        proc.stdout.close()
+        capture.close()
@@ -0,0 +1,124 @@
+import fcntl
+import heapq
+import json
+import logging
+import os
+import threading
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# keep the latest N durations of each case, the estimation is their median
+MAX_HISTORY = 5
+# used when a case never ran before
+DEFAULT_DURATION = 60
+
+
+def get_duration_key(params):
+    """
+    Durations are stored per provider and instance type, as the same case
+    can take very different time on different systems.
+    """
+    provider = "local"
+    if params.get("Cloud"):
+        provider = params["Cloud"].get("provider") or provider
+    elif params.get("remote_nodes"):
+        provider = "remote"
+    instance_type = params.get("instance_type")
+    for section, key in [("VM", "vm_size"), ("Flavor", "name")]:
+        if instance_type:
+            break
+        if isinstance(params.get(section), dict):
+            instance_type = params[section].get(key)
+    return "{}/{}".format(provider, instance_type or "default")
+
+
+class DurationDB:
+    """
+    Per-case durations kept across runs in a local json file, keyed by case id,
+    provider and instance type. Several processes can share the file, each
+    one merges its new durations into the file under a file lock on save.
+    """
+
+    def __init__(self, params):
+        self.db_file = params.get("duration_db") or os.path.expanduser(
+            "~/.cache/os-tests/durations.json"
+        )
+        self.key = get_duration_key(params)
+        self.lock = threading.Lock()
+        self.data = {}
+        # {case_id: [durations]} recorded but not saved yet
+        self.unsaved = {}
+        self.load()
+
+    def load(self):
+        self.data = self._read()
+
+    def _read(self):
+        if not os.path.exists(self.db_file):
+            return {}
+        try:
+            with open(self.db_file, "r") as fh:
+                return json.load(fh)
+        except Exception as err:
+            LOG.info("cannot load durations from {}: {}".format(self.db_file, err))
+            return {}
+
+    def save(self):
+        "Merge unsaved durations into the file, other processes' ones are kept."
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+                with open("{}.lock".format(self.db_file), "w") as lock_fh:
+                    fcntl.flock(lock_fh, fcntl.LOCK_EX)
+                    data = self._read()
+                    for case_id, durations in self.unsaved.items():
+                        history = data.setdefault(self.key, {}).setdefault(case_id, [])
+                        history.extend(durations)
+                        del history[:-MAX_HISTORY]
+                    tmp_file = "{}.{}.tmp".format(self.db_file, os.getpid())
+                    with open(tmp_file, "w") as fh:
+                        json.dump(data, fh, indent=1, sort_keys=True)
+                    os.replace(tmp_file, self.db_file)
+                self.data = data
+                self.unsaved = {}
+            except OSError as err:
+                LOG.info("cannot save durations to {}: {}".format(self.db_file, err))
+
+    def record(self, case_id, duration):
+        with self.lock:
+            duration = round(duration, 3)
+            self.unsaved.setdefault(case_id, []).append(duration)
+            history = self.data.setdefault(self.key, {}).setdefault(case_id, [])
+            history.append(duration)
+            del history[:-MAX_HISTORY]
+
+    def estimate(self, case_id):
+        """
+        Return the estimated duration of case, fall back to the history from
+        other instance types and then DEFAULT_DURATION.
+        """
+        history = self.data.get(self.key, {}).get(case_id)
+        if not history:
+            history = []
+            for key in self.data:
+                history.extend(self.data[key].get(case_id) or [])
+        if not history:
+            return DEFAULT_DURATION
+        history = sorted(history)
+        return history[len(history) // 2]
+
+    def sort_lpt(self, cases):
+        """
+        Sort cases longest processing time first, workers pulling cases from a
+        shared queue in this order makes the shards finish at about the same time.
+        """
+        return sorted(cases, key=lambda case: self.estimate(case.id()), reverse=True)
+
+    def predict(self, case_ids, workers=1):
+        """
+        Predict the wall time of running case_ids on workers with LPT scheduling.
+        """
+        loads = [0] * max(int(workers), 1)
+        for duration in sorted([self.estimate(i) for i in case_ids], reverse=True):
+            heapq.heapreplace(loads, loads[0] + duration)
+        return max(loads)
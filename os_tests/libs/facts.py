@@ -0,0 +1,64 @@
+import logging
+import re
+import threading
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# cmds changing installed pkgs, facts got before might be stale after them
+PKG_CHANGE_CMD = re.compile(
+    r"\b(yum|dnf|zypper|apt-get|apt|rpm|rpm-ostree|leapp)\b[^;&|]*\s"
+    r"(install|reinstall|localinstall|remove|erase|update|upgrade|downgrade|swap|"
+    # short options of rpm install/upgrade/freshen/erase, not queries(eg. -qi)
+    r"distro-sync|-(?![a-zA-Z]*q)[a-zA-Z]*[iUFe][a-zA-Z]*)\b"
+)
+
+
+class FactCache:
+    """
+    Facts of systems under test which do not change until reboot, eg. platform,
+    release and arch. They are kept per node and boot_id across cases, a new
+    boot_id starts with no facts. Callers clear them after changing the system,
+    eg. installing pkgs or writing config.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {node: (boot_id, {name: value})}
+        self.facts = {}
+
+    def get(self, node, boot_id, name, func, keep=None):
+        """
+        Return fact name of node, func is called to get it if it is not cached.
+        It is not cached if boot_id is unknown, or keep(value) is False.
+        """
+        if not boot_id:
+            return func()
+        with self.lock:
+            cached_boot_id, facts = self.facts.get(node, (None, {}))
+            if cached_boot_id == boot_id and name in facts:
+                return facts[name]
+        value = func()
+        if keep is not None and not keep(value):
+            return value
+        with self.lock:
+            cached_boot_id, facts = self.facts.get(node, (None, {}))
+            if cached_boot_id != boot_id:
+                facts = {}
+                self.facts[node] = (boot_id, facts)
+            facts[name] = value
+        return value
+
+    def clear(self, node=None, names=None):
+        "Forget facts of node(default all nodes), only names if it is given."
+        with self.lock:
+            for key in list(self.facts):
+                if node is not None and key != node:
+                    continue
+                if names is None:
+                    del self.facts[key]
+                    continue
+                for name in names:
+                    self.facts[key][1].pop(name, None)
+
+
+FACTS = FactCache()
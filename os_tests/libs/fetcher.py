@@ -0,0 +1,248 @@
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# files fetched at the same time, each in its own ssh channel
+FETCH_WORKERS = 4
+# attempts of each file, a failed attempt is resumed from the bytes already got
+FETCH_RETRY = 3
+# seconds without data before a stream is taken as broken
+STREAM_TIMEOUT = 300
+CHUNK_SIZE = 1024 * 1024
+# compressed already(eg. cores are zstd/lz4 compressed by systemd-coredump), not gzip them again
+COMPRESSED_SUFFIXES = (".zst", ".lz4", ".xz", ".gz", ".bz2", ".zip", ".tgz", ".rpm")
+# exit status of shell when gzip is not installed
+GZIP_NOT_FOUND = 127
+
+
+class ByteBudget:
+    """
+    Bytes of artifacts allowed to fetch in a run, shared by all cases and
+    workers, so a run with many crashes does not spend its time on copying
+    cores. No limit if limit is None.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, size):
+        with self.lock:
+            if self.limit is not None and self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self.lock:
+            self.used = max(0, self.used - size)
+
+
+BUDGET = ByteBudget()
+
+
+class SSHStream:
+    "Output of cmd run in a new channel of a paramiko ssh connection."
+
+    def __init__(self, ssh_client, cmd, timeout=STREAM_TIMEOUT):
+        self.timeout = timeout
+        self.channel = ssh_client.get_transport().open_session()
+        self.channel.settimeout(timeout)
+        self.channel.exec_command(cmd)
+
+    def read(self, size=CHUNK_SIZE):
+        return self.channel.recv(size)
+
+    def close(self):
+        "Return exit status of cmd, None if it is not got as connection is broken."
+        try:
+            if self.channel.status_event.wait(self.timeout):
+                return self.channel.recv_exit_status()
+            return None
+        finally:
+            self.channel.close()
+
+
+class LocalStream:
+    "Output of cmd run in local shell, when cases run on the test host."
+
+    def __init__(self, cmd, timeout=STREAM_TIMEOUT):
+        self.proc = subprocess.Popen(
+            cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def read(self, size=CHUNK_SIZE):
+        return os.read(self.proc.stdout.fileno(), size)
+
+    def close(self):
+        self.proc.stdout.close()
+        return self.proc.wait()
+
+
+def get_digest(local_file):
+    digest = hashlib.sha256()
+    with open(local_file, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def quote(path):
+    return "'{}'".format(path.replace("'", "'\\''"))
+
+
+class ArtifactFetcher:
+    """
+    Fetch files from the system under test, they are read as root and:
+    - fetched in parallel, each in its own stream
+    - gzipped on the fly unless they are compressed already
+    - written to "<local file>.part" and resumed from its size after a broken stream
+    - verified by sha256 before renamed to local file
+    - skipped if they are over the byte budget of the run
+    open_stream(cmd) returns SSHStream or LocalStream running cmd.
+    """
+
+    def __init__(self, open_stream, budget=BUDGET, workers=FETCH_WORKERS, log=None):
+        self.open_stream = open_stream
+        self.budget = budget
+        self.workers = workers
+        self.log = log or LOG
+        # gzip might not exist on the system under test
+        self.is_gzip = True
+
+    def run(self, cmd):
+        stream = self.open_stream(cmd)
+        chunks = []
+        try:
+            for chunk in iter(lambda: stream.read(), b""):
+                chunks.append(chunk)
+        finally:
+            status = stream.close()
+        return status, b"".join(chunks).decode("utf-8", "replace")
+
+    def stat(self, rmt_files):
+        """
+        Return:
+            {rmt_file: (size, sha256)} of files which exist
+        """
+        cmd = 'for f in {}; do s=$(stat -L -c %s "$f") && h=$(sha256sum < "$f") && echo "$s ${{h%% *}} $f"; done'.format(
+            " ".join(quote(i) for i in rmt_files)
+        )
+        _, output = self.run("sudo sh -c {}".format(quote(cmd)))
+        stats = {}
+        for line in output.splitlines():
+            items = line.split(" ", 2)
+            if len(items) == 3 and items[0].isdigit():
+                stats[items[2]] = (int(items[0]), items[1])
+        return stats
+
+    def fetch(self, files):
+        """
+        Arguments:
+            files {dict} -- {remote file: local file}
+        Return:
+            {remote file: local file, or None if it is not fetched}
+        """
+        stats = self.stat(list(files))
+        jobs = {}
+        for rmt_file, local_file in files.items():
+            if rmt_file not in stats:
+                self.log.info("{} not found, skip it".format(rmt_file))
+                continue
+            size, digest = stats[rmt_file]
+            if not self.budget.reserve(size):
+                self.log.info(
+                    "skip {}({} bytes), artifact budget {} bytes used up".format(
+                        rmt_file, size, self.budget.limit
+                    )
+                )
+                continue
+            jobs[rmt_file] = (local_file, size, digest)
+        results = {i: None for i in files}
+        if not jobs:
+            return results
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                rmt_file: executor.submit(self.fetch_file, rmt_file, *job)
+                for rmt_file, job in jobs.items()
+            }
+            for rmt_file, future in futures.items():
+                is_fetched, msgs = future.result()
+                for msg in msgs:
+                    self.log.info(msg)
+                if is_fetched:
+                    results[rmt_file] = jobs[rmt_file][0]
+                else:
+                    self.budget.release(jobs[rmt_file][1])
+        return results
+
+    def fetch_file(self, rmt_file, local_file, size, digest):
+        """
+        Runs in worker threads, messages are returned to be logged by caller
+        as case debug log only gets records from case thread.
+        Return:
+            (is_fetched, messages)
+        """
+        msgs = []
+        part_file = local_file + ".part"
+        os.makedirs(os.path.dirname(os.path.abspath(local_file)), exist_ok=True)
+        for attempt in range(1, FETCH_RETRY + 1):
+            open(part_file, "ab").close()
+            offset = os.path.getsize(part_file)
+            if offset > size:
+                os.unlink(part_file)
+                open(part_file, "ab").close()
+                offset = 0
+            if offset < size:
+                try:
+                    self._fetch_range(rmt_file, part_file, offset)
+                except Exception as err:
+                    msgs.append(
+                        "fetch {} broken at {}/{} bytes in attempt {}: {}".format(
+                            rmt_file, os.path.getsize(part_file), size, attempt, err
+                        )
+                    )
+                    continue
+            if os.path.getsize(part_file) < size:
+                msgs.append("fetch {} incomplete, resume it".format(rmt_file))
+                continue
+            if get_digest(part_file) != digest:
+                msgs.append("checksum of {} mismatch, fetch it again".format(rmt_file))
+                os.unlink(part_file)
+                continue
+            os.replace(part_file, local_file)
+            msgs.append("fetched {}({} bytes) to {}".format(rmt_file, size, local_file))
+            return True, msgs
+        msgs.append("cannot fetch {} after {} attempts".format(rmt_file, FETCH_RETRY))
+        return False, msgs
+
+    def _fetch_range(self, rmt_file, part_file, offset):
+        "Append content of rmt_file from offset to part_file."
+        is_gzip = self.is_gzip and not rmt_file.endswith(COMPRESSED_SUFFIXES)
+        cmd = "sudo tail -c +{} {}".format(offset + 1, quote(rmt_file))
+        if is_gzip:
+            cmd += " | gzip -1"
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if is_gzip else None
+        stream = self.open_stream(cmd)
+        try:
+            with open(part_file, "ab") as fh:
+                for chunk in iter(lambda: stream.read(), b""):
+                    if decompressor:
+                        chunk = decompressor.decompress(chunk)
+                    fh.write(chunk)
+                if decompressor:
+                    fh.write(decompressor.flush())
+        finally:
+            status = stream.close()
+            # only a missing gzip turns it off, the status of the pipe is gzip's
+            if is_gzip and status == GZIP_NOT_FOUND:
+                self.is_gzip = False
+        if status != 0:
+            raise OSError("'{}' exited with {}".format(cmd, status))
@@ -1,50 +1,81 @@
+import re
+
 from os_tests.libs import utils_lib
+from os_tests.libs.agent import AgentError
+
+# paths without shell expansion can be checked by agent directly
+PLAIN_PATH = re.compile(r"^[\w./@+:,=-]+$")
 
 
 class File:
+    """
+    File checks on the system under test. Each check also accepts a list of
+    paths and returns a list of bool, the list is checked in one remote exec.
+    """
+
     def __init__(self, test_instance):
         self.test_instance = test_instance
 
-    def exists(self, file_path):
-        if file_path:
-            ret = utils_lib.run_cmd(
+    def _stat(self, stat_key, items):
+        """
+        Check paths by agent.
+        Return:
+            bool or list of bool, None if agent cannot do it
+        """
+        agent = utils_lib.get_agent(self.test_instance)
+        paths = items if isinstance(items, (list, tuple)) else [items]
+        if not agent or not all(PLAIN_PATH.match(i or "") for i in paths):
+            return None
+        rets = []
+        try:
+            for path in paths:
+                rets.append(bool(agent.stat(path)[stat_key]))
+        except AgentError as err:
+            self.test_instance.log.info("agent cannot stat: {}".format(err))
+            return None
+        if not isinstance(items, (list, tuple)):
+            rets = rets[0]
+        self.test_instance.log.info("{} {}: {}".format(stat_key, items, rets))
+        return rets
+
+    def _check(self, get_cmd, items, stat_key=None):
+        if stat_key:
+            ret = self._stat(stat_key, items)
+            if ret is not None:
+                return ret
+        if isinstance(items, (list, tuple)):
+            rets = utils_lib.run_cmds(
                 self.test_instance,
-                cmd="sudo test -e {}".format(file_path),
-                ret_status=True,
+                [get_cmd(i) if i else "false" for i in items],
             )
-            if ret == 0:
-                return True
-        return False
-
-    def is_file(self, file_path):
-        if file_path:
+            return [status == 0 for status, _ in rets]
+        if items:
             ret = utils_lib.run_cmd(
                 self.test_instance,
-                cmd="sudo test -f {}".format(file_path),
+                cmd=get_cmd(items),
                 ret_status=True,
             )
             if ret == 0:
                 return True
         return False
 
+    def exists(self, file_path):
+        return self._check("sudo test -e {}".format, file_path, stat_key="exists")
+
+    def is_file(self, file_path):
+        return self._check("sudo test -f {}".format, file_path, stat_key="is_file")
+
     def is_directory(self, path_name):
-        if path_name:
-            ret = utils_lib.run_cmd(
-                self.test_instance,
-                cmd="sudo test -d {}".format(path_name),
-                ret_status=True,
-            )
-            if ret == 0:
-                return True
-        return False
+        return self._check("sudo test -d {}".format, path_name, stat_key="is_dir")
 
     def contains(self, pattern, file_path):
-        if file_path:
-            ret = utils_lib.run_cmd(
-                self.test_instance,
-                cmd="sudo grep -qs -- {} {}".format(pattern, file_path),
-                ret_status=True,
+        if isinstance(pattern, (list, tuple)):
+            # check patterns in the same file in one batch
+            if not file_path:
+                return [False] * len(pattern)
+            return self._check(
+                lambda i: "sudo grep -qs -- {} {}".format(i, file_path), pattern
             )
-            if ret == 0:
-                return True
-        return False
\ No newline at end of file
+        return self._check(
+            lambda i: "sudo grep -qs -- {} {}".format(pattern, i), file_path
+        )
@@ -1,12 +1,20 @@
 from unittest import TextTestResult
 from unittest.signals import registerResult
+from . import node_monitor
 from . import utils_lib
+from .duration_db import DurationDB
+from .tracer import TRACER
 import sys
 import time
 import warnings
 import string
 import contextlib
+import itertools
+import json
 import os
+import queue
+import threading
+from xml.sax.saxutils import escape
 from jinja2 import Template, FileSystemLoader, Environment, PackageLoader, select_autoescape
 
 class ResultSummary:
@@ -25,21 +33,45 @@ class ResultSummary:
         self.node_info = None
         self.run_date = time.asctime()
 
+    def add_case(self, row):
+        "row is [id, case_id, status, reason, duration, debug_log, class_name]"
+        if row[2] == 'PASS':
+            self.case_pass += 1
+        if row[2] == 'FAIL':
+            self.case_fail += 1
+        if row[2] == 'ERROR':
+            self.case_error += 1
+        if row[2] == 'SKIP':
+            self.case_skip += 1
+        self.table_rows.append(row)
+
     def compute_totals(self):
         self.total = self.case_pass + self.case_error + self.case_fail + self.case_skip
         if self.total - self.case_skip > 0:
             self.pass_rate = self.case_pass / (self.total - self.case_skip) * 100
 
 
+_ENV = None
+
+def get_template(template_name):
+    global _ENV
+    if _ENV is None:
+        _ENV = Environment(loader=PackageLoader("os_tests", "templates"))
+    return _ENV.get_template(template_name)
+
+def append_report_case(logfile, template_name, row):
+    "Append a single case row to logfile, so results are there before the run ends."
+    if template_name.endswith('xml'):
+        row = [escape(v) if isinstance(v, str) else v for v in row]
+    with open(logfile, "a+") as fh:
+        fh.write(get_template(template_name).render(row=row) + '\n')
+
 def generated_report(logfile, template_name, result):
     if os.path.exists(logfile):
         os.unlink(logfile)
 
-    file_loader = PackageLoader("os_tests", "templates")
-    env = Environment(loader=file_loader)
-    template = env.get_template(template_name)
+    template = get_template(template_name)
     if template_name.endswith('xml'):
-        from xml.sax.saxutils import escape
         for row in result.table_rows:
             # escap special character(<&>) in output
             for i,v in enumerate(row):
@@ -50,6 +82,21 @@ def generated_report(logfile, template_name, result):
         fh.write(output)
     print("{} generated".format(os.path.realpath(logfile)))
 
+def write_reports(logdir, result):
+    "Generate sum.html and sum.xml of summary result under logdir/results."
+    result.compute_totals()
+    node_info_file = "{}/attachments/node_info".format(logdir)
+    if os.path.exists(node_info_file):
+        with open(node_info_file) as fh:
+            result.node_info = fh.read()
+    results_dir = logdir + '/results'
+    if not os.path.exists(results_dir):
+        os.mkdir(results_dir)
+    sum_html = os.path.join(results_dir, "sum.html")
+    generated_report(sum_html, "sum.html", result)
+    sum_junit = os.path.join(results_dir, "sum.xml")
+    generated_report(sum_junit, "sum.xml", result)
+
 @contextlib.contextmanager
 def pushd(new_dir):
     previous_dir = os.getcwd()
@@ -74,6 +121,24 @@ class _WritelnDecorator(object):
             self.write(arg)
         self.write('\n') # text-mode streams translate to \r\n if needed
 
+class _LineWriter(object):
+    """Hold partial lines, so output from parallel workers is not interleaved"""
+    def __init__(self, stream, lock):
+        self.stream = stream
+        self.lock = lock
+        self.buf = ''
+
+    def write(self, arg):
+        self.buf += arg
+        if '\n' in self.buf:
+            lines, self.buf = self.buf.rsplit('\n', 1)
+            with self.lock:
+                self.stream.write(lines + '\n')
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
 class HTMLTestResult(TextTestResult):
     
     def __init__(self, stream, descriptions, verbosity, *, durations=None):
@@ -81,6 +146,42 @@ class HTMLTestResult(TextTestResult):
         to ensure compatibility as the interface changes."""
         super(HTMLTestResult, self).__init__(stream, descriptions, verbosity)
         self.planned = 0
+        # shared by workers to number cases across the whole run
+        self.counter = None
+        self.case_num = 0
+        self.worker = None
+        # case id -> (status, reason), set when the case reports its outcome
+        self.outcomes = {}
+
+    def _set_outcome(self, test, status, reason):
+        # keep the same priority as before if a case reports more than once,
+        # eg. test body failed and tearDown hit error
+        priority = ['PASS', 'SKIP', 'ERROR', 'FAIL']
+        previous = self.outcomes.get(test.id())
+        if previous and priority.index(previous[0]) > priority.index(status):
+            return
+        self.outcomes[test.id()] = (status, reason)
+
+    def addSuccess(self, test):
+        super(HTMLTestResult, self).addSuccess(test)
+        self._set_outcome(test, 'PASS', '')
+
+    def addFailure(self, test, err):
+        super(HTMLTestResult, self).addFailure(test, err)
+        self._set_outcome(test, 'FAIL', self.failures[-1][1])
+
+    def addError(self, test, err):
+        super(HTMLTestResult, self).addError(test, err)
+        self._set_outcome(test, 'ERROR', self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        super(HTMLTestResult, self).addSkip(test, reason)
+        self._set_outcome(test, 'SKIP', reason)
+
+    def startTest(self, test):
+        if self.counter is not None:
+            self.case_num = next(self.counter)
+        super(HTMLTestResult, self).startTest(test)
 
     def getDescription(self, test):
         # do not return the docs content to make output clean
@@ -89,8 +190,11 @@ class HTMLTestResult(TextTestResult):
         #    return '\n'.join((str(test), doc_first_line))
         #else:
         ret = str(test)
-        if self.testsRun:
-            ret = "{} - {}/{}".format(ret, self.testsRun, self.planned )
+        case_num = self.case_num or self.testsRun
+        if case_num:
+            ret = "{} - {}/{}".format(ret, case_num, self.planned )
+        if self.worker:
+            ret = "{} [{}]".format(ret, self.worker)
         return ret
 
 class HTMLTestRunner(object):
@@ -126,14 +230,230 @@ class HTMLTestRunner(object):
     def _makeResult(self):
         return self.resultclass(self.stream, self.descriptions, self.verbosity)
 
-    def run(self, test, logdir=None):
-        "Run the given test case or test suite."
+    def _run_case(self, ts, result, test_result_summary):
+        "Run a single case and record its result into summary."
+        logdir = ts.params['results_dir']
+        results_dir = logdir + '/results'
+        os.makedirs(results_dir, exist_ok=True)
+        sum_txt = results_dir + '/sum.log'
+        with self.lock:
+            test_result_summary.comment = ts.params.get('comment')
+            self.case_id += 1
+            id = self.case_id
+        row = None
+        try:
+            case_startTime = time.perf_counter()
+            startTestRun = getattr(result, 'startTestRun', None)
+            if startTestRun is not None:
+                startTestRun()
+            try:
+                with TRACER.span(ts.id(), cat='case'):
+                    ts(result)
+            finally:
+                stopTestRun = getattr(result, 'stopTestRun', None)
+                if stopTestRun is not None:
+                    stopTestRun()
+                ts.duration = round(time.perf_counter() - case_startTime, 3)
+            test_class_name = ts.__class__.__name__
+            case_dir = '.'.join([test_class_name, ts.id()])
+            debug_dir = logdir + "/attachments/" + case_dir
+            os.makedirs(debug_dir, exist_ok=True)
+            # relative path is used in report, the real path is used for writing
+            debug_log = "../attachments/" + case_dir + '/' + ts.id() + '.debug'
+            debug_log_file = os.path.join(debug_dir, ts.id() + '.debug')
+            case_status, case_reason = result.outcomes.pop(ts.id(), (None, None))
+            if case_status != 'SKIP':
+                # skipped cases end at once, they would pull the estimation down
+                self.duration_db.record(ts.id(), ts.duration)
+                self.duration_db.save()
+            if case_status in ['FAIL', 'ERROR', 'SKIP']:
+                try:
+                    ts.log.info('{0}case done{0}'.format('-'*20))
+                    ts.log.info(case_reason)
+                    ts.log.info('{} - {}'.format(ts.id(), case_status))
+                except Exception as err:
+                    with open(debug_log_file, 'a+') as fh:
+                        fh.write('{0}case done{0}'.format('-'*20))
+                        fh.write(case_reason)
+                        fh.write('{} - {}'.format(ts.id(), case_status))
+                if case_status in ['ERROR', 'FAIL'] and hasattr(ts, 'log') and ts.params.get('enable_auto_result_check'):
+                    ts.log.info("-----enable_auto_result_check enabled, auto check result--------")
+                    src_content = ''
+                    with open(debug_log_file, 'r') as fh:
+                        src_content = fh.read()
+                    ret, _ = utils_lib.find_word(ts, src_content, case=ts.id())
+                    case_reason = "{} IS_KNOWN:{} Please check auto analyze details in debug log".format(case_reason, not ret)
+            else:
+                with open(debug_log_file, 'a+') as fh:
+                    fh.write('{} - PASS'.format(ts.id()))
+                case_status = 'PASS'
+                case_reason = ''
+            with self.lock:
+                row = [id, ts.id(), case_status, case_reason, ts.duration, debug_log, test_class_name]
+                test_result_summary.add_case(row)
+                with open(sum_txt, 'a+') as fh:
+                    fh.write('case: {} - {}\n'.format(ts.id(),case_status))
+                    if case_reason:
+                        fh.write('info: {}\n'.format(case_reason))
+                # the journal keeps finished cases in case the run is interrupted, see --resume
+                run_time = round(self.prior_run_time + time.perf_counter() - self.start_time, 3)
+                with open(results_dir + '/journal.jsonl', 'a+') as fh:
+                    fh.write(json.dumps({'row': row, 'run_time': run_time}) + '\n')
+                append_report_case(results_dir + '/sum.partial.xml', 'testcase.xml', row)
+                utils_lib.save_resources(logdir, self.workers)
+        except Exception as err:
+            if row is None:
+                # case without row is lost from summary, and its lease in case queue is kept forever
+                row = [id, ts.id(), 'ERROR', 'case run failed: {}'.format(err), getattr(ts, 'duration', 0), '', ts.__class__.__name__]
+                with self.lock:
+                    test_result_summary.add_case(row)
+                    with open(sum_txt, 'a+') as fh:
+                        fh.write('case: {} - {}\ninfo: {}\n'.format(ts.id(), row[2], row[3]))
+            raise
+        finally:
+            if self.case_queue is not None:
+                if row is None:
+                    self.case_queue.put(ts)
+                else:
+                    self.case_queue.complete(ts, row)
+
+    def _load_journal(self, journal_file, test_result_summary):
+        "Rebuild summary from journal of the interrupted run, return the finished case ids."
+        finished = set()
+        if not os.path.exists(journal_file):
+            return finished
+        with open(journal_file) as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line might be incomplete if controller died while writing it
+                    continue
+                test_result_summary.add_case(record['row'])
+                self.case_id = max(self.case_id, record['row'][0])
+                self.prior_run_time = max(self.prior_run_time, record['run_time'])
+                finished.add(record['row'][1])
+        self.stream.writeln("resume run, {} cases finished already".format(len(finished)))
+        return finished
+
+    def _run_parallel(self, cases, workers, result, test_result_summary):
+        "Run cases from a shared queue, one thread per worker."
+        if isinstance(cases, list):
+            if not cases:
+                return
+            case_queue = queue.Queue()
+            for ts in cases:
+                case_queue.put(ts)
+        else:
+            # queue-like, eg. case_queue.LeasedCases
+            case_queue = cases
+        stream_lock = threading.Lock()
+        # workers still pulling cases, a case is handed back only when one is left
+        alive = set(id(worker) for worker in workers)
+        threads = []
+        worker_results = []
+        for worker in workers:
+            stream = _WritelnDecorator(_LineWriter(self.stream, stream_lock))
+            worker_result = self.resultclass(stream, self.descriptions, self.verbosity)
+            registerResult(worker_result)
+            worker_result.failfast = self.failfast
+            worker_result.buffer = self.buffer
+            worker_result.tb_locals = self.tb_locals
+            worker_result.planned = result.planned
+            worker_result.counter = self.counter
+            worker_result.worker = worker['name']
+            worker_results.append(worker_result)
+            thread = threading.Thread(target=self._worker_loop, name=worker['name'],
+                                      args=(worker, workers, alive, case_queue, worker_result, test_result_summary))
+            thread.daemon = True
+            threads.append(thread)
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for worker_result in worker_results:
+            result.testsRun += worker_result.testsRun
+            result.failures.extend(worker_result.failures)
+            result.errors.extend(worker_result.errors)
+            result.skipped.extend(worker_result.skipped)
+            result.expectedFailures.extend(worker_result.expectedFailures)
+            result.unexpectedSuccesses.extend(worker_result.unexpectedSuccesses)
+            if worker_result.shouldStop:
+                result.shouldStop = True
+
+    @staticmethod
+    def _find_monitor(worker):
+        vm = worker['vms'] and worker['vms'][0] or None
+        return node_monitor.find_monitor(host=worker['params'].get('remote_node'), vm=vm)
+
+    def _is_node_down(self, worker):
+        monitor = self._find_monitor(worker)
+        return bool(monitor and monitor.is_open)
+
+    def _wait_node(self, worker):
+        "Wait about a probe interval for the node of worker to be reachable again."
+        monitor = self._find_monitor(worker)
+        if monitor and monitor.is_probe:
+            monitor.wait_ready(timeout=node_monitor.PROBE_INTERVAL)
+        if self._is_node_down(worker):
+            time.sleep(node_monitor.PROBE_INTERVAL)
+
+    def _worker_loop(self, worker, workers, alive, case_queue, result, test_result_summary):
+        while not result.shouldStop:
+            try:
+                ts = case_queue.get_nowait()
+            except queue.Empty:
+                with self.worker_lock:
+                    # a case might be handed back after the queue was found empty
+                    if isinstance(case_queue, queue.Queue) and not case_queue.empty():
+                        continue
+                    alive.discard(id(worker))
+                break
+            if self._is_node_down(worker):
+                # leave the case to other workers pulling cases whose node is up,
+                # run it here if there is none, so it still gets its result
+                with self.worker_lock:
+                    is_handed = any(id(i) in alive and not self._is_node_down(i)
+                                    for i in workers if i is not worker)
+                    if is_handed:
+                        case_queue.put(ts)
+                if is_handed:
+                    result.stream.writeln("{} node is down, requeue {} to other workers".format(worker['name'], ts.id()))
+                    self._wait_node(worker)
+                    continue
+            utils_lib.bind_case(ts, worker)
+            try:
+                self._run_case(ts, result, test_result_summary)
+            except Exception as err:
+                result.stream.writeln("{} hit error in {}: {}".format(worker['name'], ts.id(), err))
+
+    def run(self, test, logdir=None, workers=None, case_queue=None):
+        """Run the given test case or test suite.
+        workers is a list returned by utils_lib.init_workers, cases are pulled
+        from a shared queue by each worker when there are more than one.
+        case_queue is a case_queue.LeasedCases, cases are leased from it
+        instead of test when it is set.
+        """
         result = self._makeResult()
         test_result_summary = ResultSummary()
         registerResult(result)
         result.failfast = self.failfast
         result.buffer = self.buffer
         result.tb_locals = self.tb_locals
+        self.lock = threading.Lock()
+        self.worker_lock = threading.Lock()
+        self.case_id = 0
+        self.prior_run_time = 0
+        self.workers = workers
+        self.case_queue = case_queue
+        cases = list(test or [])
+        first_case = cases and cases[0] or None
+        params = first_case.params if first_case else workers[0]['params']
+        logdir = logdir or params['results_dir']
+        sum_txt = logdir + '/results/sum.log'
+        if params.get('resume'):
+            finished = self._load_journal(logdir + '/results/journal.jsonl', test_result_summary)
+            cases = [ts for ts in cases if ts.id() not in finished]
         with warnings.catch_warnings():
             if self.warnings:
                 # if self.warnings is set, use it to filter all the warnings
@@ -147,104 +467,60 @@ class HTMLTestRunner(object):
                     warnings.filterwarnings('module',
                             category=DeprecationWarning,
                             message=r'Please use assert\w+ instead.')
+            TRACER.reset()
             startTime = time.perf_counter()
-            id = 0
-            all_case_name = [ ts.id() for ts in test ]
-            result.planned = len(all_case_name)
-            for ts in test:
-                logdir = ts.params['results_dir']
-                test_result_summary.comment = ts.params.get('comment')
-                if not os.path.exists(logdir):
-                    os.makedirs(logdir,exist_ok=True)
-                results_dir = logdir + '/results'
-                if not os.path.exists(results_dir):
-                    os.makedirs(results_dir,exist_ok=True)
-                sum_txt = results_dir + '/sum.log'
-                case_status = None
-                case_reason = None
-                id += 1
-                case_startTime = time.perf_counter()
-                startTestRun = getattr(result, 'startTestRun', None)
-                if startTestRun is not None:
-                    startTestRun()
-                try:
-                    ts(result)
-                finally:
-                    stopTestRun = getattr(result, 'stopTestRun', None)
-                    if stopTestRun is not None:
-                        stopTestRun()
-                    ts.duration = timeTaken = round(time.perf_counter() - case_startTime, 3)
-                test_class_name = ts.__class__.__name__
-                case_dir = '.'.join([test_class_name, ts.id()])
-                debug_dir = logdir + "/attachments/" + case_dir
-                if not os.path.exists(debug_dir):
-                    os.makedirs(debug_dir,exist_ok=True)
-                debug_log = "../attachments/" + case_dir + '/' + ts.id() + '.debug'
-                with pushd(results_dir):
-                    mapped_result = {'FAIL':result.failures, 'ERROR':result.errors, 'SKIP':result.skipped}
-                    for status in mapped_result.keys():
-                        for ts_finished, reason in mapped_result[status]:
-                            if ts_finished == ts:
-                                if status == 'FAIL':
-                                    test_result_summary.case_fail += 1
-                                if status == 'ERROR':
-                                    test_result_summary.case_error += 1
-                                if status == 'SKIP':
-                                    test_result_summary.case_skip += 1
-                                case_status = status
-                                case_reason = reason
-                                try:
-                                    ts.log.info('{0}case done{0}'.format('-'*20))
-                                    ts.log.info(reason)
-                                    ts.log.info('{} - {}'.format(ts.id(), status))
-                                except Exception as err:
-                                    with open(debug_log, 'a+') as fh:
-                                        fh.write('{0}case done{0}'.format('-'*20))
-                                        fh.write(reason)
-                                        fh.write('{} - {}'.format(ts.id(), status))
-                                if status in ['ERROR', 'FAIL'] and hasattr(ts, 'log') and ts_finished.params.get('enable_auto_result_check'):
-                                    ts.log.info("-----enable_auto_result_check enabled, auto check result--------")
-                                    src_content = ''
-                                    with open(debug_log, 'r') as fh:
-                                        src_content = fh.read()
-                                    ret, _ = utils_lib.find_word(ts, src_content, case=ts.id())
-                                    case_reason = "{} IS_KNOWN:{} Please check auto analyze details in debug log".format(case_reason, not ret)
-                                break
-                    if not case_status:
-                        test_result_summary.case_pass += 1
-                        with open(debug_log, 'a+') as fh:
-                            fh.write('{} - PASS'.format(ts.id()))
-                        case_status = 'PASS'
-                        case_reason = ''
-                test_result_summary.table_rows.append([id, ts.id(), case_status, case_reason, ts.duration, debug_log, test_class_name])
-                with open(sum_txt, 'a+') as fh:
-                    fh.write('case: {} - {}\n'.format(ts.id(),case_status))
-                    if case_reason:
-                        fh.write('info: {}\n'.format(case_reason))
+            self.start_time = startTime
+            result.planned = len(cases) or (case_queue and case_queue.planned or 0)
+            self.counter = itertools.count(1)
+            self.duration_db = DurationDB(params)
+            channels = int(params.get('channels') or 1)
+            if channels > 1 and (params.get('case_setup') or params.get('case_post')):
+                self.stream.writeln("case_setup or case_post might reboot system, ignore channels")
+                channels = 1
+            if case_queue is not None:
+                self._run_parallel(case_queue, workers, result, test_result_summary)
+            elif channels > 1:
+                # read-only cases share the systems through several channels,
+                # the others run after them with one channel per system
+                if not workers:
+                    workers = [{'name': None, 'params': params, 'vms': first_case.vms,
+                                'disks': first_case.disks, 'nics': first_case.nics, 'SSHs': first_case.SSHs}]
+                concurrent_cases = []
+                serial_cases = []
+                for ts in cases:
+                    if utils_lib.get_case_impact(case=ts) == 'none':
+                        concurrent_cases.append(ts)
+                    else:
+                        serial_cases.append(ts)
+                lanes = []
+                for worker in workers:
+                    lanes.extend(utils_lib.init_lanes(worker, channels))
+                # longest cases first, so no lane is left with a long case at the end
+                concurrent_cases = self.duration_db.sort_lpt(concurrent_cases)
+                if len(workers) > 1:
+                    serial_cases = self.duration_db.sort_lpt(serial_cases)
+                self.stream.writeln("run {} read-only cases in {} channels, then {} cases in serial".format(
+                    len(concurrent_cases), len(lanes), len(serial_cases)))
+                self._run_parallel(concurrent_cases, lanes, result, test_result_summary)
+                if not result.shouldStop:
+                    self._run_parallel(serial_cases, workers, result, test_result_summary)
+            elif workers and len(workers) > 1:
+                cases = self.duration_db.sort_lpt(cases)
+                self._run_parallel(cases, workers, result, test_result_summary)
+            else:
+                for ts in cases:
+                    if result.shouldStop:
+                        break
+                    self._run_case(ts, result, test_result_summary)
             stopTime = time.perf_counter()
         timeTaken = round(stopTime - startTime, 3)
-        test_result_summary.run_time = timeTaken
-        all_case_name.sort()
-        id = 0
-        for case in all_case_name:
-            id += 1
-            is_pass = True
-            #  os.chdir(logdir)
-            debug_log = "../attachments/" + case + '.debug'
+        test_result_summary.run_time = round(self.prior_run_time + timeTaken, 3)
         if hasattr(result, 'separator2'):
             self.stream.writeln(result.separator2)
-        test_result_summary.compute_totals()
-        node_info_file = "{}/attachments/node_info".format(logdir)
-        if os.path.exists(node_info_file):
-            with open(node_info_file) as fh:
-                test_result_summary.node_info = fh.read()
+        write_reports(logdir, test_result_summary)
         results_dir = logdir + '/results'
-        if not os.path.exists(results_dir):
-            os.mkdir(results_dir)
-        sum_html = os.path.join(results_dir, "sum.html")
-        generated_report(sum_html, "sum.html", test_result_summary)
-        sum_junit = os.path.join(results_dir, "sum.xml")
-        generated_report(sum_junit, "sum.xml", test_result_summary)
+        TRACER.save(os.path.join(results_dir, "trace.json"))
+        node_monitor.stop_monitors()
         self.stream.writeln("{} generated".format(os.path.realpath(sum_txt)))
         #result.printErrors()
         if hasattr(result, 'separator2'):
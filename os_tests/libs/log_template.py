@@ -0,0 +1,88 @@
+import re
+
+# parts of log lines which vary between the same messages, eg. pid, address,
+# time, ip, device number, they are masked before lines are compared
+VARIABLE_PATTERNS = (
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}",
+    r"(?:[0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}",
+    r"0x[0-9a-fA-F]+",
+    r"(?<!\w)[0-9a-fA-F]*\d[0-9a-fA-F]*[a-fA-F][0-9a-fA-F]*(?![\w])",
+    r"(?<!\w)[+-]?\d+(?:[.:,/-]\d+)*",
+)
+VARIABLE = re.compile("|".join("(?:{})".format(i) for i in VARIABLE_PATTERNS))
+MASK = "<*>"
+# share of same tokens for a line to join a template
+SIM_THRESHOLD = 0.5
+# lines kept as examples of each template
+MAX_EXAMPLES = 3
+
+
+def mask_line(line):
+    "Return tokens of line with the variable parts masked."
+    return VARIABLE.sub(MASK, line).split()
+
+
+class LogTemplate:
+    "Lines of the same message, the tokens differing between them are masked."
+
+    def __init__(self, tokens, line):
+        self.tokens = tokens
+        self.count = 0
+        self.lines = []
+        self.examples = []
+        self.add(tokens, line)
+
+    @property
+    def template(self):
+        return " ".join(self.tokens)
+
+    def similarity(self, tokens):
+        same = sum(1 for i, j in zip(self.tokens, tokens) if i == j)
+        return same / len(tokens) if tokens else 1.0
+
+    def add(self, tokens, line):
+        self.tokens = [i if i == j else MASK for i, j in zip(self.tokens, tokens)]
+        self.count += 1
+        if line not in self.lines:
+            self.lines.append(line)
+            if len(self.examples) < MAX_EXAMPLES:
+                self.examples.append(line)
+
+    def __str__(self):
+        if len(self.lines) == 1:
+            return self.lines[0]
+        return "{} ({} lines of {} distinct ones like '{}')".format(
+            "\n".join(self.examples), self.count, len(self.lines), self.template
+        )
+
+
+class TemplateMiner:
+    """
+    Cluster log lines into templates as Drain does. Lines are grouped by
+    their token count, a line joins the most similar template in its group
+    if at least SIM_THRESHOLD of the tokens are the same, or starts a new
+    template.
+    """
+
+    def __init__(self, sim_threshold=SIM_THRESHOLD):
+        self.sim_threshold = sim_threshold
+        # {token count: [LogTemplate]}
+        self.groups = {}
+        # templates in the order they are found
+        self.templates = []
+
+    def add(self, line):
+        tokens = mask_line(line)
+        group = self.groups.setdefault(len(tokens), [])
+        best, best_sim = None, -1
+        for template in group:
+            sim = template.similarity(tokens)
+            if sim > best_sim:
+                best, best_sim = template, sim
+        if best is not None and best_sim >= self.sim_threshold:
+            best.add(tokens, line)
+            return best
+        template = LogTemplate(tokens, line)
+        group.append(template)
+        self.templates.append(template)
+        return template
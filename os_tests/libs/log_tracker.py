@@ -0,0 +1,302 @@
+import bisect
+import re
+import threading
+import zlib
+
+# log cmds whose records are tracked, they are fetched once in a boot
+JOURNAL_CMD = re.compile(r"^(sudo )?journalctl -b ?0$")
+KMSG_CMD = re.compile(r"^sudo dmesg$")
+BOOT_ID_CMD = "cat /proc/sys/kernel/random/boot_id"
+JOURNAL_CURSOR = re.compile(r"^-- cursor: (.+)$")
+# lines of journalctl which are not records
+JOURNAL_NOTES = re.compile(r"^-- (No entries|Logs begin at|Journal begins at) ")
+# "priority,seq,timestamp(us),flags;message" of /dev/kmsg
+KMSG_RECORD = re.compile(r"^\d+,(\d+),(\d+),[^;]*;(.*)$")
+KMSG_ESCAPE = re.compile(r"\\x([0-9a-fA-F]{2})")
+# lines compressed together in a snapshot
+BLOCK_LINES = 4096
+# keywords of check cases, lines matching them are indexed in the same pass
+LOG_KEYWORDS = (
+    "error",
+    "fail",
+    "warn",
+    "trace",
+    "unable",
+    "unknown",
+    "invalid",
+    "denied",
+    "conflict",
+    "unexpected",
+    "not found",
+    "no such",
+    "could not",
+    "can not",
+    "dumped core",
+    "traceback",
+    "backtrace",
+)
+
+_TRACKERS = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_log_source(log_cmd):
+    "Return 'journal' or 'kmsg' if records of log_cmd can be tracked, or None."
+    cmd = " ".join(log_cmd.split())
+    if JOURNAL_CMD.match(cmd):
+        return "journal"
+    if KMSG_CMD.match(cmd):
+        return "kmsg"
+    return None
+
+
+def quote(value):
+    return "'{}'".format(value.replace("'", "'\\''"))
+
+
+def get_kmsg_line(record):
+    "Return kmsg record in the format of dmesg, None if it is not a record."
+    found = KMSG_RECORD.match(record)
+    if not found:
+        return None
+    seq, usec, message = found.groups()
+    # non-printable chars and utf-8 bytes are escaped as \xNN
+    message = KMSG_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)), message)
+    message = message.encode("latin-1", "replace").decode("utf-8", "replace")
+    usec = int(usec)
+    return int(seq), "[{:5d}.{:06d}] {}".format(usec // 1000000, usec % 1000000, message)
+
+
+def is_line_pattern(pattern):
+    "Regex pattern cannot match across lines, so it can be searched line by line."
+    return bool(pattern) and not any(i in pattern for i in "\\[^$\n")
+
+
+class LogSnapshot:
+    """
+    Lines of a log in a boot, kept zlib compressed in blocks of BLOCK_LINES.
+    Lines matching each pattern(searched ignoring case) are indexed when they
+    are added, all patterns in one pass. A new pattern is indexed in one pass
+    of the lines got, and kept for the later checks.
+    """
+
+    def __init__(self, patterns=LOG_KEYWORDS):
+        self.lock = threading.RLock()
+        self.blocks = []
+        # lines not in a full block yet
+        self.tail = []
+        self.size = 0
+        # {pattern: compiled regex}
+        self.regexes = {}
+        # {pattern: [line index]}
+        self.hits = {}
+        # regex of all patterns, lines not matching it skip the patterns
+        self.gate = None
+        # {(text, skip pattern): (lines searched, (index, offset) or None)}
+        self.found = {}
+        self.cached_block = (None, None)
+        self.add_patterns(patterns)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, lines):
+        with self.lock:
+            start = self.size
+            self.tail.extend(lines)
+            self.size += len(lines)
+            while len(self.tail) >= BLOCK_LINES:
+                data = "\n".join(self.tail[:BLOCK_LINES]).encode("utf-8", "surrogatepass")
+                self.blocks.append(zlib.compress(data, 1))
+                del self.tail[:BLOCK_LINES]
+            self._index(enumerate(lines, start), self.regexes)
+
+    def add_patterns(self, patterns):
+        "Index lines matching the patterns which are not indexed yet."
+        with self.lock:
+            regexes = {}
+            for pattern in patterns:
+                if pattern in self.regexes or not is_line_pattern(pattern):
+                    continue
+                try:
+                    regexes[pattern] = re.compile(pattern, re.I)
+                except re.error:
+                    continue
+            if not regexes:
+                return
+            self.regexes.update(regexes)
+            for pattern in regexes:
+                self.hits[pattern] = []
+            try:
+                self.gate = re.compile(
+                    "|".join("(?:{})".format(i) for i in self.regexes), re.I
+                )
+            except re.error:
+                self.gate = None
+            self._index(self._iter_lines(), regexes)
+
+    def _index(self, items, regexes):
+        for index, line in items:
+            if self.gate and not self.gate.search(line):
+                continue
+            for pattern, regex in regexes.items():
+                if regex.search(line):
+                    self.hits[pattern].append(index)
+
+    def _get_block(self, block):
+        if self.cached_block[0] != block:
+            data = zlib.decompress(self.blocks[block]).decode("utf-8", "surrogatepass")
+            self.cached_block = (block, data.split("\n"))
+        return self.cached_block[1]
+
+    def _get_line(self, index):
+        block, offset = divmod(index, BLOCK_LINES)
+        if block < len(self.blocks):
+            return self._get_block(block)[offset]
+        return self.tail[index - len(self.blocks) * BLOCK_LINES]
+
+    def _iter_lines(self, start=0):
+        for index in range(start, self.size):
+            yield index, self._get_line(index)
+
+    def get_lines(self):
+        with self.lock:
+            return [line for _, line in self._iter_lines()]
+
+    def _find(self, text, skip=None):
+        """
+        Return (index, offset) of the first line containing text and not
+        matching skip regex, or None.
+        """
+        key = (text, skip and skip.pattern)
+        searched, found = self.found.get(key, (0, None))
+        if found is None:
+            for index, line in self._iter_lines(searched):
+                if text in line and not (skip and skip.search(line)):
+                    found = (index, line.index(text))
+                    break
+            self.found[key] = (self.size, found)
+        return found
+
+    def match_lines(self, pattern=None, skip=None, cursor=None, limit=None):
+        """
+        Return lines matching pattern(all lines if it is None) the same as
+        matching it in the whole log text after filtered and cut by cursor.
+        Arguments:
+            skip {regex} -- drop lines matching it, as "grep -Ev"
+            cursor {string} -- drop text before the first line containing it
+            limit {int} -- return at most limit lines
+        """
+        with self.lock:
+            start, offset = 0, 0
+            if cursor is not None:
+                start, offset = self._find(cursor, skip) or (0, 0)
+            if pattern is not None and pattern not in self.regexes:
+                self.add_patterns([pattern])
+            is_text_search = pattern is not None and pattern not in self.hits
+            if is_text_search:
+                # pattern might match across lines, search it in the whole text
+                limit = None
+            if pattern is None or is_text_search:
+                items = self._iter_lines(start)
+            else:
+                hits = self.hits[pattern]
+                items = (
+                    (i, self._get_line(i))
+                    for i in hits[bisect.bisect_left(hits, start) :]
+                )
+            lines = []
+            for index, line in items:
+                if skip and skip.search(line):
+                    continue
+                if index == start and offset:
+                    line = line[offset:]
+                    if pattern in self.regexes and not self.regexes[pattern].search(
+                        line
+                    ):
+                        continue
+                lines.append(line)
+                if limit and len(lines) >= limit:
+                    break
+            if is_text_search:
+                text = "\n".join(lines)
+                return [text] if re.search(pattern, text, flags=re.I) else []
+            return lines
+
+
+class LogTracker:
+    """
+    Records of a log cmd on a node in current boot, kept on the test host.
+    Each fetch only gets the records after position, the last journal
+    cursor or kmsg sequence number got. The tracker starts over if the
+    node boots again.
+    """
+
+    def __init__(self, log_cmd):
+        self.log_cmd = " ".join(log_cmd.split())
+        self.source = get_log_source(log_cmd)
+        self.lock = threading.Lock()
+        self.boot_id = None
+        self.position = None
+        self.snapshot = LogSnapshot()
+        self.new_lines = 0
+
+    def get_cmd(self):
+        "Return cmd printing boot_id and then the records after position."
+        if self.source == "journal":
+            cmd = "{} --no-pager --show-cursor".format(self.log_cmd)
+            if self.position:
+                cmd += " --after-cursor={}".format(quote(self.position))
+        else:
+            cmd = "sudo dd if=/dev/kmsg iflag=nonblock bs=8192 2>/dev/null"
+            cmd += " | awk -F, -v seq={} '/^ /{{next}} $2+0>seq'".format(
+                -1 if self.position is None else self.position
+            )
+        return "{}; {}".format(BOOT_ID_CMD, cmd)
+
+    def update(self, output):
+        """
+        Add records in output of get_cmd().
+        Return:
+            False if node booted again since last fetch and the records are
+            not the ones after position, fetch again to get all records.
+        """
+        boot_id, _, records = (output or "").partition("\n")
+        boot_id = boot_id.strip()
+        if boot_id != self.boot_id:
+            is_rebooted = self.boot_id is not None
+            self.boot_id = boot_id
+            self.position = None
+            self.snapshot = LogSnapshot()
+            if is_rebooted:
+                return False
+        new_lines = []
+        position = self.position
+        for line in records.split("\n")[: -1 if records.endswith("\n") else None]:
+            if self.source == "journal":
+                found = JOURNAL_CURSOR.match(line)
+                if found:
+                    position = found.group(1)
+                elif not JOURNAL_NOTES.match(line):
+                    new_lines.append(line)
+            else:
+                record = get_kmsg_line(line)
+                if record:
+                    position = record[0]
+                    new_lines.extend(record[1].split("\n"))
+        if position is None:
+            # not tracked, eg. no --show-cursor support or no access to /dev/kmsg
+            new_lines = []
+        self.position = position
+        self.snapshot.add(new_lines)
+        self.new_lines = len(new_lines)
+        return True
+
+
+def get_tracker(node, log_cmd):
+    "Return tracker of log_cmd on node, a new one if it is not tracked yet."
+    key = (node, " ".join(log_cmd.split()))
+    with _TRACKERS_LOCK:
+        if key not in _TRACKERS:
+            _TRACKERS[key] = LogTracker(log_cmd)
+        return _TRACKERS[key]
@@ -0,0 +1,214 @@
+import logging
+import socket
+import threading
+import time
+
+LOG = logging.getLogger("os_tests.os_tests_run")
+
+# seconds between 2 background probes
+PROBE_INTERVAL = 10
+# seconds to wait for tcp connection in one probe
+PROBE_TIMEOUT = 5
+# continuous failed probes to open the breaker
+FAIL_LIMIT = 3
+# recovery attempts before giving up the node, the first one restarts the vm,
+# the later ones re-create it
+RECOVER_LIMIT = 2
+
+_MONITORS = {}
+_MONITORS_LOCK = threading.Lock()
+
+
+def is_port_open(host, port=22, timeout=PROBE_TIMEOUT):
+    try:
+        with socket.create_connection((host, int(port or 22)), timeout=timeout):
+            return True
+    except (OSError, ValueError):
+        return False
+
+
+class NodeMonitor:
+    """
+    Circuit breaker of a node, its ssh port is probed in background.
+    closed: node is reachable.
+    open: FAIL_LIMIT continuous probes failed, cases should not wait for ssh timeout on it.
+    dead: recovery failed RECOVER_LIMIT times, cases on it are skipped.
+    """
+
+    def __init__(self, host, port=22, is_probe=True):
+        self.host = host
+        self.port = port or 22
+        # port cannot be probed directly if ssh goes through proxy
+        self.is_probe = is_probe
+        self.state = "closed"
+        self.fail_count = 0
+        self.recover_count = 0
+        self.boot_id = None
+        self.lock = threading.Lock()
+        self.recover_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._probe_loop, name="monitor-{}".format(host)
+        )
+        self.thread.daemon = True
+        if self.is_probe:
+            self.thread.start()
+
+    def _probe_loop(self):
+        while not self.stopped.wait(PROBE_INTERVAL):
+            self.probe()
+
+    def stop(self):
+        self.stopped.set()
+
+    def probe(self):
+        if not self.is_probe:
+            return True
+        is_up = is_port_open(self.host, self.port)
+        with self.lock:
+            if self.state == "dead":
+                return is_up
+            if is_up:
+                self.fail_count = 0
+                if self.state == "open":
+                    LOG.info("{} is reachable again, close breaker".format(self.host))
+                self.state = "closed"
+            else:
+                self.fail_count += 1
+                if self.fail_count >= FAIL_LIMIT and self.state == "closed":
+                    LOG.info(
+                        "{} unreachable in {} probes, open breaker".format(
+                            self.host, self.fail_count
+                        )
+                    )
+                    self.state = "open"
+        return is_up
+
+    @property
+    def is_open(self):
+        return self.state in ["open", "dead"]
+
+    @property
+    def is_dead(self):
+        return self.state == "dead"
+
+    def trip(self):
+        with self.lock:
+            if self.state == "closed":
+                self.state = "open"
+
+    def wait_ready(self, timeout=600):
+        """
+        Wait for ssh port open, much cheaper than ssh connection retries.
+        Return:
+            True if port is open in timeout
+        """
+        start = time.time()
+        interval = 1
+        while True:
+            if self.probe():
+                return True
+            if time.time() - start >= timeout:
+                return False
+            time.sleep(min(interval, max(timeout - (time.time() - start), 0)))
+            interval = min(interval * 2, PROBE_INTERVAL)
+
+    def update_boot_id(self, boot_id):
+        """
+        Record boot id of node.
+        Return:
+            True if node rebooted since last record
+        """
+        with self.lock:
+            is_rebooted = bool(self.boot_id and boot_id and boot_id != self.boot_id)
+            self.boot_id = boot_id
+        return is_rebooted
+
+    def recover(self, vm=None, timeout=600, log=None):
+        """
+        The only path to bring an unreachable node back, restart vm at first and
+        re-create it if still cannot reach it. Other threads wait for the
+        ongoing recovery instead of starting another one.
+        Arguments:
+            vm {VMResource} -- vm of the node, node without vm cannot be recovered
+            timeout {int} -- seconds to wait for ssh port after each action
+        Return:
+            True if node is reachable, its address might change after re-create
+        """
+        log = log or LOG
+        with self.recover_lock:
+            if self.state == "closed":
+                return True
+            if self.state == "dead" or not vm:
+                self.state = "dead"
+                return False
+            while self.recover_count < RECOVER_LIMIT:
+                self.recover_count += 1
+                try:
+                    vm.get_console_log()
+                except Exception as err:
+                    log.info("cannot get console log: {}".format(err))
+                try:
+                    if self.recover_count == 1:
+                        log.info("{} cannot connect, restart it".format(self.host))
+                        vm.stop()
+                        vm.start()
+                    else:
+                        log.info("{} cannot connect, re-create it".format(self.host))
+                        vm.delete()
+                        vm.create()
+                    if hasattr(vm, "floating_ip"):
+                        self.host = vm.floating_ip or self.host
+                except Exception as err:
+                    log.info("recover {} failed: {}".format(self.host, err))
+                    continue
+                if self.wait_ready(timeout):
+                    with self.lock:
+                        self.state = "closed"
+                        self.fail_count = 0
+                        self.recover_count = 0
+                    return True
+            with self.lock:
+                self.state = "dead"
+            log.info(
+                "{} cannot recover in {} times, skip cases on it".format(
+                    self.host, self.recover_count
+                )
+            )
+            return False
+
+
+def get_monitor(host, port=22, vm=None, is_probe=True):
+    """
+    Get the monitor of node, vm is used as key if provided as its address might
+    change after re-create.
+    """
+    if not host:
+        return None
+    key = vm if vm is not None else (host, port or 22)
+    with _MONITORS_LOCK:
+        monitor = _MONITORS.get(key)
+        if monitor is None:
+            monitor = NodeMonitor(host, port, is_probe=is_probe)
+            _MONITORS[key] = monitor
+        elif monitor.host != host and monitor.state == "closed":
+            monitor.host = host
+        return monitor
+
+
+def find_monitor(host=None, vm=None):
+    "Return the existing monitor of vm or host, or None"
+    with _MONITORS_LOCK:
+        if vm is not None and vm in _MONITORS:
+            return _MONITORS[vm]
+        for monitor in _MONITORS.values():
+            if host and monitor.host == host:
+                return monitor
+    return None
+
+
+def stop_monitors():
+    with _MONITORS_LOCK:
+        for monitor in _MONITORS.values():
+            monitor.stop()
+        _MONITORS.clear()
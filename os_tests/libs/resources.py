@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+from .tracer import TRACER
 
 class UnSupportedAction(Exception):
     """
@@ -71,14 +72,21 @@ class VMResource(BaseResource):
     """
     This is an abstract class for the base vm resource.
     """
+    # vm actions recorded in trace.json, they are usually slow provider api calls
+    traced_methods = ['create', 'delete', 'start', 'stop', 'reboot', 'pause', 'unpause',
+                      'send_nmi', 'send_hibernation', 'get_console_log', 'attach_block',
+                      'detach_block', 'attach_nic', 'detach_nic', 'load']
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.traced_methods:
+            if name in cls.__dict__:
+                setattr(cls, name, TRACER.trace(name="{}.{}".format(cls.__name__, name), cat='vm')(cls.__dict__[name]))
+
     def __init__(self, params):
         super().__init__(params)
         # mark the resource created, default is os_tests_vm
         self.tag = 'os_tests_vm'
-        # dead_count to monitor resource health status
-        # for example, if the vm cannot connect over X times, we can skip the follow cases
-        # no need to retry connection until timeout
-        self.dead_count = 0
 
     @property
     @abstractmethod
@@ -195,6 +203,14 @@ class VMResource(BaseResource):
         :return: console log as str or other info when call it
         """
 
+    def load(self, id=None):
+        """
+        load an existing vm by its id instead of creating a new one, eg. resume a run
+        :param id: vm id saved in previous run
+        :return: True if loaded, False if not found, raise UnSupportedAction if not supported
+        """
+        raise UnSupportedAction("Not support loading existing vm")
+
     @abstractmethod
     def is_started(self):
         """
@@ -108,6 +108,28 @@ class EC2VM(VMResource):
         if self.is_exist():
             LOG.info("Instance ID: {}".format(self.ec2_instance.id))
 
+    def load(self, id=None):
+        """
+        load an existing instance
+        """
+        if not id:
+            LOG.info("Please specify instance id!")
+            return False
+        try:
+            self.ec2_instance = self.resource.Instance(id)
+            self.ec2_instance.reload()
+            self.id = self.ec2_instance.id
+        except Exception as err:
+            LOG.info(err)
+            self.ec2_instance = None
+            return False
+        if not self.is_exist():
+            self.ec2_instance = None
+            self.id = None
+            return False
+        self.is_created = True
+        return True
+
     def create(
         self,
         wait=True,
@@ -1012,6 +1034,23 @@ class EC2NIC(NetworkResource):
             LOG.error(err)
             return False
 
+    def load(self, id=None):
+        """
+        load an existing network interface
+        """
+        if not id:
+            LOG.info("Please specify nic id!")
+            return False
+        try:
+            self.__network_interface = self.resource.NetworkInterface(id)
+            self.__network_interface.reload()
+            self.id = self.__network_interface.id
+        except Exception as err:
+            LOG.info(err)
+            self.__network_interface = None
+            return False
+        return True
+
     def is_free(self):
         self.__network_interface.reload()
         if self.__network_interface.status == "in-use":
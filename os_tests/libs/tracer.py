@@ -0,0 +1,107 @@
+import contextlib
+import inspect
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# arguments longer than it are cut in trace
+MAX_ARG_LEN = 200
+
+
+class Tracer:
+    """
+    Collect spans in Chrome trace event format, open the saved trace.json in
+    chrome://tracing or https://ui.perfetto.dev.
+    Each worker thread(named by worker or lane) gets its own track.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.tracks = {}
+        self.start_time = time.perf_counter()
+
+    def reset(self):
+        with self.lock:
+            self.events = []
+            self.tracks = {}
+            self.start_time = time.perf_counter()
+
+    def _track_id(self):
+        name = threading.current_thread().name
+        if name == "MainThread":
+            name = "main"
+        with self.lock:
+            if name not in self.tracks:
+                self.tracks[name] = len(self.tracks) + 1
+            return self.tracks[name]
+
+    def add_span(self, name, cat, start, end, args=None):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((start - self.start_time) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "pid": os.getpid(),
+            "tid": self._track_id(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, cat="os-tests", args=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, cat, start, time.perf_counter(), args=args)
+
+    def trace(self, name=None, cat="os-tests", arg_names=None):
+        """
+        Decorator to record each call of func as a span.
+        arg_names are the func arguments added to span, eg. cmd of run_cmd.
+        """
+
+        def decorator(func):
+            span_name = name or func.__name__
+            signature = inspect.signature(func) if arg_names else None
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                span_args = None
+                if arg_names:
+                    bound = signature.bind_partial(*args, **kwargs).arguments
+                    span_args = {
+                        i: str(bound[i])[:MAX_ARG_LEN] for i in arg_names if i in bound
+                    }
+                with self.span(span_name, cat=cat, args=span_args):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def save(self, trace_file):
+        with self.lock:
+            events = list(self.events)
+            for track_name, track_id in self.tracks.items():
+                events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": os.getpid(),
+                        "tid": track_id,
+                        "args": {"name": track_name},
+                    }
+                )
+        os.makedirs(os.path.dirname(trace_file), exist_ok=True)
+        with open(trace_file, "w") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+
+TRACER = Tracer()
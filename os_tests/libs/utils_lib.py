@@ -1,18 +1,24 @@
 import argparse
+import asyncio
 import base64
 import decimal
-import difflib
+import hashlib
+import inspect
 import json
 import logging
 import mmap
 import os
 import random
 import re
+import signal
 import string
 import subprocess
 import sys
+import tarfile
 import tempfile
+import threading
 import time
+import uuid
 from copy import deepcopy
 from functools import wraps
 from itertools import chain
@@ -23,7 +29,14 @@ from yaml import dump, load
 import os_tests
 from os_tests import tests
 
+from . import cmd_stream, log_template, log_tracker, node_monitor
+from . import baseline
+from .baseline import get_baseline_index
+from .agent import AgentError, start_ssh_agent
+from .facts import FACTS, PKG_CHANGE_CMD
+from . import fetcher
 from .file import File
+from .tracer import TRACER
 
 try:
     from yaml import CDumper as Dumper
@@ -32,6 +45,21 @@ except ImportError:
     from yaml import Dumper, Loader
 
 LOG = logging.getLogger("os_tests.os_tests_run")
+# seconds between keepalive packets of idle ssh connection
+SSH_KEEPALIVE_INTERVAL = 30
+# seconds to wait for the liveness check of a kept ssh connection
+SSH_CHECK_TIMEOUT = 30
+# run on the system under test to check log keywords there
+LOG_FILTER_SCRIPT = os.path.join(
+    os.path.dirname(os_tests.__file__), "utils", "log_filter.py"
+)
+LOG_FILTER_MARKER = "OS_TESTS_LOG_FILTER"
+# boot_id of the test host when cases run locally
+LOCAL_BOOT_ID = None
+# files uploaded by sync_files() are kept here by content, they are reused by later runs
+SYNC_DIR = "/var/tmp/os_tests_files"
+# {(path, size, mtime): digest} of local files
+FILE_DIGESTS = {}
 
 
 def init_distro(test_instance):
@@ -60,6 +88,14 @@ def init_args():
     parser = argparse.ArgumentParser(
         description="os-tests is a lightweight, fast check and tests collection for Linux OS."
     )
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        default="run",
+        choices=["run", "coordinator", "worker"],
+        help="run(default): run cases in this process, coordinator: share cases with workers \
+                        through a queue and merge their results, worker: run cases leased from --queue",
+    )
     parser.add_argument(
         "-l",
         dest="is_listcase",
@@ -115,6 +151,15 @@ def init_args():
                         'expect_result','debug_want'",
         required=False,
     )
+    parser.add_argument(
+        "--select",
+        dest="select",
+        default=None,
+        action="store",
+        help="select cases by expression of case doc fields, works with -p and -s, \
+                        eg. 'component:kernel & tag:tier1 & !name:ltp', field=value matches exactly",
+        required=False,
+    )
     parser.add_argument(
         "--hosts",
         dest="remote_nodes",
@@ -274,6 +319,63 @@ def init_args():
         help="specify the target version you want to upgrade to, e.g., 9.4",
         required=False,
     )
+    parser.add_argument(
+        "--channels",
+        dest="channels",
+        default=None,
+        type=int,
+        action="store",
+        help="run read-only cases(disruptive: none in case doc) concurrently through N ssh channels per system, other cases run in serial after them",
+        required=False,
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        default=None,
+        type=int,
+        action="store",
+        help="provision N independent systems and run cases on them in parallel, only work with platform_profile",
+        required=False,
+    )
+    parser.add_argument(
+        "--estimate",
+        dest="estimate",
+        action="store_true",
+        help="print the predicted wall time of cases from historical durations, no system is provisioned",
+        required=False,
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        default=None,
+        action="store",
+        help="resume an interrupted run in its results dir, finished cases in results/journal.jsonl are skipped",
+        required=False,
+    )
+    parser.add_argument(
+        "--agent",
+        dest="agent",
+        action="store_true",
+        help="run cmds through a resident agent on remote systems instead of a new ssh exec per cmd, fall back to ssh if agent cannot start",
+        required=False,
+    )
+    parser.add_argument(
+        "--artifact-budget",
+        dest="artifact_budget",
+        default=None,
+        type=int,
+        action="store",
+        help="MiB of core files and other artifacts fetched from systems under test in a run, the ones over it are skipped",
+        required=False,
+    )
+    parser.add_argument(
+        "--queue",
+        dest="queue",
+        default=None,
+        action="store",
+        help="queue file shared by coordinator and workers, default is queue.db in results dir of coordinator",
+        required=False,
+    )
     args = parser.parse_args()
     return args
 
@@ -355,6 +457,153 @@ def init_provider(params=None):
     return vms, disks, nics
 
 
+def init_workers(params=None, vms=None, disks=None, nics=None, sshs=None):
+    """
+    Prepare workers for running cases in parallel.
+    The first worker takes the resources created in main, others get their own
+    params copy and resources from init_provider, the resources are not created
+    until the first case runs on them.
+    Arguments:
+        params {dict} -- params of the run
+        vms, disks, nics, sshs {list} -- resources already initialized in main
+    Return:
+        list of worker dicts
+    """
+    workers = [
+        {
+            "name": "worker0",
+            "params": params,
+            "vms": vms or [],
+            "disks": disks or [],
+            "nics": nics or [],
+            "SSHs": sshs if sshs is not None else [],
+        }
+    ]
+    worker_num = int(params.get("workers") or 1)
+    if worker_num > 1 and not vms:
+        LOG.info("workers only work with platform_profile, run cases in serial")
+        return workers
+    for i in range(1, worker_num):
+        worker_params = deepcopy(params)
+        worker_params["remote_node"] = None
+        worker_params["remote_nodes"] = []
+        # resources are looked up by name in some providers, keep them unique
+        vm_cfg = worker_params.get("VM")
+        if isinstance(vm_cfg, dict):
+            for key in ["vm_name", "vm_name_prefix"]:
+                if vm_cfg.get(key):
+                    vm_cfg[key] = "{}-w{}".format(vm_cfg[key], i)
+        worker_vms, worker_disks, worker_nics = init_provider(params=worker_params)
+        workers.append(
+            {
+                "name": "worker{}".format(i),
+                "params": worker_params,
+                "vms": worker_vms,
+                "disks": worker_disks,
+                "nics": worker_nics,
+                "SSHs": [],
+            }
+        )
+    LOG.info("{} workers ready".format(len(workers)))
+    return workers
+
+
+def init_lanes(worker, channels=1):
+    """
+    Split worker into lanes sharing the same system, each lane has its own
+    params copy and ssh connections, so read-only cases can run concurrently.
+    Arguments:
+        worker {dict} -- worker returned by init_workers
+        channels {int} -- lanes num
+    Return:
+        list of lane dicts, the first one is worker itself
+    """
+    if not worker.get("vm_lock"):
+        worker["vm_lock"] = threading.Lock()
+    lanes = [worker]
+    for i in range(1, channels):
+        lane = dict(worker)
+        lane["name"] = "{}-ch{}".format(worker.get("name") or "worker0", i)
+        lane["params"] = deepcopy(worker["params"])
+        lane["SSHs"] = []
+        lanes.append(lane)
+    return lanes
+
+
+def bind_case(case, worker):
+    """
+    Point case to the params and resources owned by worker.
+    Arguments:
+        case {Test instance} -- unittest.TestCase instance
+        worker {dict} -- worker returned by init_workers
+    """
+    case.worker = worker.get("name")
+    case.params = worker["params"]
+    case.SSHs = worker["SSHs"]
+    case.SSH = case.SSHs and case.SSHs[0] or None
+    case.vms = worker["vms"]
+    case.vm = case.vms and case.vms[0] or None
+    case.disks = worker["disks"]
+    case.disk = case.disks and case.disks[0] or None
+    case.nics = worker["nics"]
+    case.nic = case.nics and case.nics[0] or None
+    case.vm_lock = worker.get("vm_lock")
+
+
+def save_resources(results_dir, workers):
+    """
+    Save resources ids of each worker to results/resources.json, so a resumed
+    run can reattach to them.
+    Arguments:
+        results_dir {string} -- results dir of the run
+        workers {list} -- workers returned by init_workers
+    """
+    resources_data = {}
+    for worker in workers or []:
+        resources_data[worker["name"]] = {}
+        for res_type in ["vms", "disks", "nics"]:
+            resources_data[worker["name"]][res_type] = [
+                res.id or None for res in worker[res_type]
+            ]
+    resources_file = os.path.join(results_dir, "results", "resources.json")
+    os.makedirs(os.path.dirname(resources_file), exist_ok=True)
+    with open(resources_file, "w") as fh:
+        json.dump(resources_data, fh, indent=1)
+
+
+def load_resources(results_dir, workers):
+    """
+    Reattach workers' resources to the ones saved by save_resources, those
+    cannot be loaded are created again when cases need them.
+    Arguments:
+        results_dir {string} -- results dir of the run
+        workers {list} -- workers returned by init_workers
+    """
+    resources_file = os.path.join(results_dir, "results", "resources.json")
+    if not os.path.exists(resources_file):
+        LOG.info("{} not found, no resource to reattach".format(resources_file))
+        return
+    with open(resources_file) as fh:
+        resources_data = json.load(fh)
+    for worker in workers:
+        worker_data = resources_data.get(worker["name"]) or {}
+        for res_type in ["vms", "disks", "nics"]:
+            for res, res_id in zip(worker[res_type], worker_data.get(res_type) or []):
+                if not res_id:
+                    continue
+                try:
+                    if hasattr(res, "load") and res.load(res_id):
+                        LOG.info("{} reattached to {}".format(worker["name"], res_id))
+                        continue
+                except Exception as err:
+                    LOG.info("cannot load {}: {}".format(res_id, err))
+                LOG.info(
+                    "{} not reattached, please release it manually if it still exists".format(
+                        res_id
+                    )
+                )
+
+
 def init_provider_from_guest(test_instance):
     # this init provider from system itself
     if os.getenv("INFRA_PROVIDER"):
@@ -399,6 +648,7 @@ def update_cfgs(
     return tmp_cfg
 
 
+@TRACER.trace(arg_names=["rmt_node"])
 def init_ssh(params=None, timeout=600, interval=10, log=None, rmt_node=None):
     if log is None:
         LOG_FORMAT = "%(levelname)s:%(message)s"
@@ -418,9 +668,21 @@ def init_ssh(params=None, timeout=600, interval=10, log=None, rmt_node=None):
     return ssh
 
 
+@TRACER.trace()
 def init_connection(
-    test_instance, timeout=600, interval=10, rmt_node=None, vm=None, retry=3
+    test_instance,
+    timeout=600,
+    interval=10,
+    rmt_node=None,
+    vm=None,
+    retry=3,
+    force=False,
 ):
+    """
+    Connect to rmt_node(default is remote_node) or vm. A live connection of
+    the same node, port and user is kept across cases, it is re-created only
+    if it is dead(eg. node rebooted) or force is set(eg. sshd config changed).
+    """
     if (
         not test_instance.params["remote_node"]
         and not rmt_node
@@ -447,16 +709,38 @@ def init_connection(
     test_instance.log.info(
         "Current IP bucket:{}".format(test_instance.params["remote_nodes"])
     )
+    is_default_node = not rmt_node
     rmt_node = rmt_node or test_instance.params["remote_node"] or None
     if vm:
         if hasattr(vm, "floating_ip"):
             rmt_node = vm.floating_ip
-        if vm.dead_count > 4:
-            test_instance.fail(
-                "cannot connect to vm over 4 times, skip retry to connect it"
-            )
     if not rmt_node:
         test_instance.fail("no rmt_node found")
+    # the vm owns rmt_node, only it can be restarted or re-created when rmt_node is down
+    node_vm = vm or (is_default_node and test_instance.vm or None)
+    monitor = node_monitor.get_monitor(
+        rmt_node,
+        port=test_instance.params.get("remote_port"),
+        vm=node_vm,
+        is_probe=not test_instance.params.get("proxy_url"),
+    )
+    if monitor.is_dead:
+        test_instance.skipTest(
+            "{} cannot be recovered, skip connecting to it".format(rmt_node)
+        )
+    if not monitor.wait_ready(timeout):
+        monitor.trip()
+        if not monitor.recover(vm=node_vm, timeout=timeout, log=test_instance.log):
+            test_instance.fail("{} is unreachable, please check".format(rmt_node))
+        return init_connection(
+            test_instance,
+            timeout=timeout,
+            interval=interval,
+            rmt_node=None if node_vm else rmt_node,
+            vm=vm,
+            retry=retry,
+            force=force,
+        )
     test_instance.log.info("init connection to {}.".format(rmt_node))
     ssh_exists = False
     is_active = False
@@ -487,14 +771,27 @@ def init_connection(
         pass
     except Exception:
         test_instance.log.info("connection is not live")
+    boot_id = None
+    if ssh_exists and is_active and not force:
+        ssh = test_instance.SSHs[ssh_num]
+        if is_same_login(ssh, test_instance.params):
+            boot_id = check_ssh_alive(ssh, log=test_instance.log)
+    if boot_id:
+        test_instance.log.info("reuse live connection to {}".format(rmt_node))
     for i in range(0, retry):
+        if boot_id:
+            break
         if ssh_exists:
             test_instance.log.info("found existing connection, re-connect")
             if is_active:
                 test_instance.SSHs[ssh_num].close()
-            test_instance.SSHs[ssh_num].timeout = timeout
-            test_instance.SSHs[ssh_num].create_connection()
             ssh = test_instance.SSHs[ssh_num]
+            ssh.port = test_instance.params.get("remote_port")
+            ssh.rmt_user = test_instance.params.get("remote_user")
+            ssh.rmt_password = test_instance.params.get("remote_password")
+            ssh.rmt_keyfile = test_instance.params.get("remote_keyfile")
+            ssh.timeout = timeout
+            ssh.create_connection()
         else:
             ssh = init_ssh(
                 params=test_instance.params,
@@ -508,32 +805,34 @@ def init_connection(
         if ssh.ssh_client:
             break
         test_instance.log.info("retry again {}/{}".format(i, retry))
-    vm = vm or test_instance.vm
     if not ssh.ssh_client:
-        if vm:
-            try:
-                vm.get_console_log()
-            except NotImplementedError:
-                test_instance.log.info(
-                    "{} not implement this func: get_console_log".format(vm.provider)
-                )
-            vm.dead_count += 1
-            test_instance.log.info("vm dead times:{}".format(vm.dead_count))
-            if vm.dead_count == 2:
-                test_instance.log.info(
-                    "vm cannot connect in {} times, restart it".format(vm.dead_count)
-                )
-                vm.stop()
-                vm.start()
-            if vm.dead_count == 3:
-                test_instance.log.info(
-                    "vm cannot connect in {} times, re-create it".format(vm.dead_count)
+        # port cannot be probed through proxy, take ssh failure as node down
+        if not monitor.is_probe and node_vm:
+            monitor.trip()
+            if monitor.recover(vm=node_vm, timeout=timeout, log=test_instance.log):
+                return init_connection(
+                    test_instance,
+                    timeout=timeout,
+                    interval=interval,
+                    rmt_node=None,
+                    vm=vm,
+                    retry=retry,
+                    force=force,
                 )
-                vm.delete()
-                vm.create()
         test_instance.fail("Cannot make ssh connection to remote, please check")
-    if vm:
-        vm.dead_count = 0
+    if not boot_id:
+        set_ssh_keepalive(ssh)
+        boot_id = check_ssh_alive(ssh, log=test_instance.log)
+    if boot_id and monitor.update_boot_id(boot_id):
+        test_instance.log.info("{} rebooted since last connection".format(rmt_node))
+    # facts cached by get_fact() are valid in this boot only
+    ssh.boot_id = boot_id
+    agent = getattr(ssh, "agent", None)
+    if test_instance.params.get("agent") and not (agent and agent.is_alive()):
+        # agent runs in a channel of the old connection, start it again
+        if agent:
+            agent.close()
+        ssh.agent = start_ssh_agent(ssh, log=test_instance.log)
     for tmp_ssh in test_instance.SSHs:
         if tmp_ssh.rmt_node == test_instance.params["remote_node"]:
             test_instance.SSH = tmp_ssh
@@ -541,6 +840,374 @@ def init_connection(
     return True
 
 
+def is_same_login(ssh, params):
+    "Connection is pooled by node, port and user, others cannot reuse it."
+    return (ssh.port or 22) == (params.get("remote_port") or 22) and (
+        ssh.rmt_user == params.get("remote_user")
+    )
+
+
+def set_ssh_keepalive(ssh):
+    "Send keepalive in idle connection, so it is not dropped by NAT or firewall."
+    try:
+        ssh.ssh_client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+    except Exception as err:
+        ssh.log.info("cannot set keepalive: {}".format(err))
+
+
+def check_ssh_alive(ssh, log=None):
+    """
+    Cheap check of connection by reading boot_id, a connection made before
+    reboot cannot pass it.
+    Return:
+        boot_id or None if connection is not usable
+    """
+    log = log or LOG
+    try:
+        ret, boot_id, _ = ssh.cli_run(
+            cmd="cat /proc/sys/kernel/random/boot_id", timeout=SSH_CHECK_TIMEOUT
+        )
+    except Exception as err:
+        log.info("connection is not live: {}".format(err))
+        return None
+    if ret != 0 or not boot_id.strip():
+        log.info("cannot get boot_id: {}".format(boot_id))
+        return None
+    return boot_id.strip()
+
+
+@TRACER.trace(arg_names=["method"])
+def reboot_and_wait(test_instance, method="ssh", cmd=None, timeout=None, msg=None):
+    """
+    Reboot system under test and return as soon as it answers with a new
+    boot_id, instead of "sudo reboot; sleep N; init_connection".
+    The latencies are logged and added to results/trace.json.
+    Arguments:
+        test_instance {Test instance} -- unittest.TestCase instance
+        method {string} -- ssh: "sudo reboot", api: reboot vm by provider api,
+                           kexec: kexec into current kernel
+        cmd {string} -- cmd to trigger reboot instead of the default one of method,
+                        eg. "sudo kexec -e" after loading another kernel
+        timeout {int} -- seconds to wait for system back, default is ssh_timeout
+        msg {string} -- addtional info to mark reboot
+    Return:
+        dict of latencies in seconds: shutdown(until ssh port down), boot(until
+        ssh port up), ssh_ready(until new boot_id answers) and total
+    """
+    timeout = timeout or getattr(test_instance, "ssh_timeout", None) or 600
+    rmt_node = test_instance.params["remote_node"]
+    port = test_instance.params.get("remote_port") or 22
+    # port cannot be probed directly through proxy
+    is_probe = not test_instance.params.get("proxy_url")
+    old_boot_id = run_cmd(
+        test_instance,
+        "cat /proc/sys/kernel/random/boot_id",
+        expect_ret=0,
+        msg="boot_id before reboot",
+    ).strip()
+    start = time.perf_counter()
+    if method == "api":
+        if not test_instance.vm:
+            test_instance.skipTest("no vm to reboot by api")
+        test_instance.log.info(msg or "reboot {} by api".format(rmt_node))
+        test_instance.vm.reboot()
+    elif method == "kexec":
+        if not cmd:
+            run_cmd(
+                test_instance,
+                "sudo kexec -l /boot/vmlinuz-$(uname -r) --initrd=/boot/initramfs-$(uname -r).img --reuse-cmdline",
+                expect_ret=0,
+                msg="load current kernel for kexec",
+            )
+        run_cmd(test_instance, cmd or "sudo systemctl kexec", msg=msg)
+    elif method == "ssh":
+        run_cmd(test_instance, cmd or "sudo reboot", msg=msg)
+    else:
+        test_instance.fail("unknown reboot method: {}".format(method))
+    down_time = None
+    up_time = None
+    new_boot_id = None
+    interval = 0.5
+    while time.perf_counter() - start < timeout:
+        is_open = True
+        if is_probe:
+            is_open = node_monitor.is_port_open(rmt_node, port, timeout=2)
+            if not is_open and down_time is None:
+                down_time = time.perf_counter()
+            elif is_open and down_time is not None and up_time is None:
+                up_time = time.perf_counter()
+        # port might not be seen down in a fast reboot, check boot_id anyway later
+        if is_open and (down_time is not None or time.perf_counter() - start > 20):
+            init_connection(
+                test_instance, timeout=max(int(timeout - (time.perf_counter() - start)), 10)
+            )
+            new_boot_id = check_ssh_alive(test_instance.SSH, log=test_instance.log)
+            if new_boot_id and new_boot_id != old_boot_id:
+                break
+            new_boot_id = None
+        time.sleep(interval)
+        interval = min(interval * 1.5, 5)
+    end = time.perf_counter()
+    if not new_boot_id:
+        test_instance.fail(
+            "{} did not come back with new boot_id in {}s".format(rmt_node, timeout)
+        )
+    latencies = {
+        "shutdown": down_time and round(down_time - start, 1),
+        "boot": down_time and up_time and round(up_time - down_time, 1),
+        "ssh_ready": round(end - (up_time or down_time or start), 1),
+        "total": round(end - start, 1),
+    }
+    test_instance.log.info(
+        "{} rebooted by {}, latencies(s): {}".format(rmt_node, method, latencies)
+    )
+    for name, span_start, span_end in [
+        ("shutdown", start, down_time),
+        ("boot", down_time, up_time),
+        ("ssh_ready", up_time or down_time or start, end),
+    ]:
+        if span_start and span_end:
+            TRACER.add_span(name, "reboot", span_start, span_end)
+    return latencies
+
+
+def get_fact(test_instance, name, func, rmt_node=None, vm=None, keep=None):
+    """
+    Return fact of the system under test which does not change until reboot,
+    eg. platform, release and arch. It is got by func() once in each boot of
+    the node and shared by cases.
+    Arguments:
+        name {string} -- fact name, eg. "is_aws", "cmd_exist:ethtool"
+        func {callable} -- get the fact by running cmds
+        keep {callable} -- cache the value only if keep(value) is True, eg. a
+                           missing cmd might be installed later in any way
+    """
+    node, boot_id = get_node_boot_id(test_instance, rmt_node=rmt_node, vm=vm)
+    return FACTS.get(node, boot_id, name, func, keep=keep)
+
+
+def clear_facts(test_instance, names=None, rmt_node=None, vm=None):
+    """
+    Forget cached facts of the system under test after changing it, eg. pkgs
+    installed or config written. run_cmd() does it after pkg install/remove cmds.
+    Arguments:
+        names {list} -- fact names to forget, default is all
+    """
+    node, _ = get_node_boot_id(test_instance, rmt_node=rmt_node, vm=vm)
+    FACTS.clear(node=node, names=names)
+
+
+def clear_facts_after_pkg_change(func):
+    """
+    Decorator of run_cmd, clear facts of the node after a pkg install/remove
+    cmd returns, so facts cached while it was running are not kept.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            if PKG_CHANGE_CMD.search(bound.get("cmd") or ""):
+                # pkgs changed, facts are got again when they are needed next time
+                clear_facts(
+                    bound["test_instance"],
+                    rmt_node=bound.get("rmt_node"),
+                    vm=bound.get("vm"),
+                )
+
+    return wrapper
+
+
+def get_node_boot_id(test_instance, rmt_node=None, vm=None):
+    """
+    Return (node, boot_id) of the node cmds run on, boot_id was read at
+    connecting and is None if unknown.
+    """
+    global LOCAL_BOOT_ID
+    if not test_instance.is_rmt:
+        if LOCAL_BOOT_ID is None:
+            try:
+                with open("/proc/sys/kernel/random/boot_id") as fh:
+                    LOCAL_BOOT_ID = fh.read().strip()
+            except OSError:
+                LOCAL_BOOT_ID = ""
+        return "localhost", LOCAL_BOOT_ID
+    rmt_node = rmt_node or test_instance.params.get("remote_node")
+    if vm and hasattr(vm, "floating_ip"):
+        rmt_node = vm.floating_ip
+    for ssh in test_instance.SSHs:
+        if ssh.rmt_node == rmt_node:
+            return rmt_node, getattr(ssh, "boot_id", None)
+    return rmt_node, None
+
+
+def get_file_digest(local_file):
+    "Return digest of file content, it is hashed again only if file changed."
+    st = os.stat(local_file)
+    key = (os.path.realpath(local_file), st.st_size, st.st_mtime)
+    if key not in FILE_DIGESTS:
+        digest = hashlib.sha256()
+        with open(local_file, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+        FILE_DIGESTS[key] = digest.hexdigest()[:16]
+    return FILE_DIGESTS[key]
+
+
+@TRACER.trace()
+def sync_files(test_instance, names, timeout=600, rmt_node=None, vm=None):
+    """
+    Upload data and utils files of os-tests to the system under test by their
+    content. Files already there(uploaded by former cases or runs) are not sent
+    again, the missing ones are sent in one compressed tar stream.
+    Arguments:
+        names {string|list} -- logical names of files, path relative to os_tests dir,
+                               eg. "data/guest-images/rogue.sh", "utils/nw_pktgen.sh",
+                               or absolute local path
+    Return:
+        path of file on the system under test, or dict of {name: path} if names is a list,
+        local path is returned if cases run locally
+    """
+    base_dir = os.path.dirname(os_tests.__file__)
+    local_files = {}
+    for name in names if isinstance(names, (list, tuple)) else [names]:
+        local_file = os.path.join(base_dir, name)
+        if not os.path.isfile(local_file):
+            test_instance.fail("{} not found to upload".format(local_file))
+        local_files[name] = local_file
+    if not test_instance.is_rmt:
+        rmt_files = local_files
+    else:
+        rmt_files = {
+            name: "{}/{}/{}".format(
+                SYNC_DIR, get_file_digest(local_file), os.path.basename(local_file)
+            )
+            for name, local_file in local_files.items()
+        }
+        cmd = "for f in {}; do [ -f \"$f\" ] || echo \"$f\"; done".format(
+            " ".join("'{}'".format(i) for i in sorted(set(rmt_files.values())))
+        )
+        output = run_cmd(
+            test_instance, cmd, msg="check files uploaded before", rmt_node=rmt_node, vm=vm
+        )
+        missing = {
+            rmt_files[name]: local_files[name]
+            for name in rmt_files
+            if rmt_files[name] in output.splitlines()
+        }
+        if missing:
+            put_tar_stream(test_instance, missing, timeout=timeout, rmt_node=rmt_node, vm=vm)
+        test_instance.log.info(
+            "{} files synced, {} uploaded".format(len(set(rmt_files.values())), len(missing))
+        )
+    if isinstance(names, (list, tuple)):
+        return rmt_files
+    return rmt_files[names]
+
+
+def put_tar_stream(test_instance, files, timeout=600, rmt_node=None, vm=None):
+    """
+    Send files to SYNC_DIR in one compressed tar stream through an ssh channel,
+    they are unpacked to a temporary dir first so an interrupted upload does not
+    leave partial files.
+    Arguments:
+        files {dict} -- {remote path under SYNC_DIR: local path}
+    """
+    rmt_node = rmt_node or test_instance.params["remote_node"]
+    if vm and hasattr(vm, "floating_ip"):
+        rmt_node = vm.floating_ip
+    SSH = None
+    for ssh in test_instance.SSHs:
+        if ssh.rmt_node == rmt_node:
+            SSH = ssh
+            break
+    incoming = "{}/.incoming.{}".format(SYNC_DIR, uuid.uuid4().hex[:8])
+    cmd = "mkdir -p {0} && tar -xzf - -C {0} && (cd {0} && for d in *; do ".format(
+        incoming
+    )
+    cmd += '[ -e "../$d" ] || mv "$d" ../; done); ret=$?; rm -rf {}; exit $ret'.format(
+        incoming
+    )
+    test_instance.log.info("CMD: {} on {}".format(cmd, rmt_node))
+    channel = SSH.ssh_client.get_transport().open_session()
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(cmd)
+        fh = channel.makefile("wb")
+        with tarfile.open(fileobj=fh, mode="w|gz") as tar:
+            for rmt_file, local_file in files.items():
+                tar.add(local_file, arcname=os.path.relpath(rmt_file, SYNC_DIR))
+        fh.flush()
+        channel.shutdown_write()
+        if not channel.status_event.wait(timeout):
+            test_instance.fail("upload files timed out after {}s".format(timeout))
+        status = channel.recv_exit_status()
+        err = b""
+        if channel.recv_stderr_ready():
+            err = channel.recv_stderr(65536)
+        err = err.decode("utf-8", "replace")
+    finally:
+        channel.close()
+    test_instance.log.info("CMD ret: {} out:{}".format(status, err))
+    if status != 0:
+        test_instance.fail("cannot upload {}: {}".format(list(files.values()), err))
+
+
+@TRACER.trace()
+def fetch_files(test_instance, files, rmt_node=None, vm=None):
+    """
+    Fetch files from the system under test by fetcher.ArtifactFetcher, in
+    parallel, gzipped on the fly, resumed after broken streams and verified by
+    checksum. Files over the artifact budget of the run are skipped.
+    Arguments:
+        files {dict|list} -- {remote file: local file}, or remote files saved to
+                             attachments dir of the run
+    Return:
+        {remote file: local file, or None if it is not fetched}
+    """
+    if not isinstance(files, dict):
+        files = {
+            i: "{}/attachments/{}".format(test_instance.log_dir, os.path.basename(i))
+            for i in files
+        }
+    budget = test_instance.params.get("artifact_budget")
+    fetcher.BUDGET.limit = budget and int(budget) * 1024 * 1024 or None
+    if test_instance.is_rmt:
+        rmt_node = rmt_node or test_instance.params["remote_node"]
+        if vm and hasattr(vm, "floating_ip"):
+            rmt_node = vm.floating_ip
+        SSH = None
+        for ssh in test_instance.SSHs:
+            if ssh.rmt_node == rmt_node:
+                SSH = ssh
+                break
+        open_stream = lambda cmd: fetcher.SSHStream(SSH.ssh_client, cmd)
+    else:
+        open_stream = fetcher.LocalStream
+    test_instance.log.info("fetch {}".format(list(files)))
+    return fetcher.ArtifactFetcher(open_stream, log=test_instance.log).fetch(files)
+
+
+def get_agent(test_instance, rmt_node=None):
+    """
+    Return the running agent on rmt_node(default is remote_node), or None if
+    agent is not enabled or not running.
+    """
+    if not test_instance.is_rmt:
+        return None
+    rmt_node = rmt_node or test_instance.params.get("remote_node")
+    for ssh in test_instance.SSHs:
+        if ssh.rmt_node == rmt_node:
+            agent = getattr(ssh, "agent", None)
+            if agent and agent.is_alive():
+                return agent
+            break
+    return None
+
+
 def send_ssh_cmd(rmt_node, rmt_user, rmt_password, command, timeout=60, log=None):
     if log is None:
         LOG_FORMAT = "%(levelname)s:%(message)s"
@@ -594,6 +1261,36 @@ def load_yaml(yaml_file=None, yaml_content=None):
     return keys_data
 
 
+class CaseLogHandler(logging.Handler):
+    """
+    Route records to the debug log of the case running in current thread, so
+    cases running in parallel do not write to each other's log.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local = threading.local()
+
+    def set_log_file(self, log_file):
+        handler = getattr(self.local, "handler", None)
+        if handler is not None:
+            handler.close()
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
+        )
+        self.local.handler = handler
+
+    def emit(self, record):
+        handler = getattr(self.local, "handler", None)
+        if handler is not None:
+            handler.handle(record)
+
+
+CASE_LOG_HANDLER = CaseLogHandler()
+
+
+@TRACER.trace()
 def init_case(test_instance):
     """init case
     Arguments:
@@ -605,25 +1302,25 @@ def init_case(test_instance):
     results_dir = test_instance.params["results_dir"]
     attachment_dir = results_dir + "/attachments"
     test_instance.log_dir = results_dir
-    if not os.path.exists(results_dir):
-        os.mkdir(results_dir)
-    if not os.path.exists(attachment_dir):
-        os.mkdir(attachment_dir)
     test_class_name = test_instance.__class__.__name__
     case_dir = ".".join([test_class_name, test_instance.id()])
     debug_dir = os.path.join(attachment_dir, case_dir)
-    if not os.path.exists(debug_dir):
-        os.mkdir(debug_dir)
+    os.makedirs(debug_dir, exist_ok=True)
+    test_instance.debug_dir = debug_dir
     case_log = test_instance.id() + ".debug"
     log_file = debug_dir + "/" + case_log
     if os.path.exists(log_file):
         os.unlink(log_file)
     test_instance.log = logging.getLogger(__name__)
     for handler in logging.root.handlers[:]:
+        if handler is CASE_LOG_HANDLER:
+            continue
         handler.close()
         logging.root.removeHandler(handler)
-    FORMAT = "%(asctime)s:%(levelname)s:%(message)s"
-    logging.basicConfig(level=logging.INFO, format=FORMAT, filename=log_file)
+    if CASE_LOG_HANDLER not in logging.root.handlers:
+        logging.root.addHandler(CASE_LOG_HANDLER)
+    logging.root.setLevel(logging.INFO)
+    CASE_LOG_HANDLER.set_log_file(log_file)
     test_instance.log.info("-" * 80)
     test_instance.log.info("Code Repo: {}".format(test_instance.params["code_repo"]))
     test_instance.log.info("Code Version: v{}".format(os_tests.__version__))
@@ -660,22 +1357,28 @@ chpasswd:
 """.format(
             test_instance.vm.run_uuid, "R"
         )
-        if test_instance.vm.dead_count > 4:
-            test_instance.fail("cannot connect to vm over 4 times, skip retry")
+        monitor = node_monitor.find_monitor(vm=test_instance.vm)
+        if monitor and monitor.is_dead:
+            test_instance.skipTest(
+                "{} cannot be recovered, skip cases on it".format(monitor.host)
+            )
         if test_instance.vm.is_metal:
             test_instance.ssh_timeout = 1200
-        if not test_instance.vm.exists():
-            test_instance.vm.create()
-        if hasattr(test_instance.vm, "get_state") and "stopping" in str(
-            test_instance.vm.get_state()
-        ):
-            for count in iterate_timeout(
-                600, "Timed out waiting for getting server stopped."
+        # lanes share the same vm, only one of them brings it up
+        vm_lock = getattr(test_instance, "vm_lock", None) or threading.Lock()
+        with vm_lock:
+            if not test_instance.vm.exists():
+                test_instance.vm.create()
+            if hasattr(test_instance.vm, "get_state") and "stopping" in str(
+                test_instance.vm.get_state()
             ):
-                if test_instance.vm.is_stopped():
-                    break
-        if test_instance.vm.is_stopped():
-            test_instance.vm.start(wait=True)
+                for count in iterate_timeout(
+                    600, "Timed out waiting for getting server stopped."
+                ):
+                    if test_instance.vm.is_stopped():
+                        break
+            if test_instance.vm.is_stopped():
+                test_instance.vm.start(wait=True)
         test_instance.params["remote_port"] = test_instance.vm.port or 22
 
     if test_instance.is_rmt:
@@ -695,21 +1398,24 @@ chpasswd:
     node_info_data = {}
     if not os.path.exists(node_info):
         test_instance.log.info("retrive node info.")
-        node_info_data["release_name"] = get_os_release_info(
-            test_instance, field="NAME"
-        ).rstrip("\n| ")
-        node_info_data["release_version"] = get_os_release_info(
-            test_instance, field="VERSION"
-        ).rstrip("\n| ")
-        node_info_data["kernel_version"] = run_cmd(test_instance, "uname -r").rstrip(
-            "\n| "
-        )
-        node_info_data["product_name"] = run_cmd(
-            test_instance, "cat /sys/devices/virtual/dmi/id/product_name"
-        ).rstrip("\n| ")
-        node_info_data["sys_vendor"] = run_cmd(
-            test_instance, "cat /sys/devices/virtual/dmi/id/sys_vendor"
-        ).rstrip("\n| ")
+        node_info_cmds = {
+            "release_name": {
+                "cmd": "source /etc/os-release ;echo $NAME",
+                "expect_ret": 0,
+                "msg": "get NAME from /etc/os-release",
+            },
+            "release_version": {
+                "cmd": "source /etc/os-release ;echo $VERSION",
+                "expect_ret": 0,
+                "msg": "get VERSION from /etc/os-release",
+            },
+            "kernel_version": "uname -r",
+            "product_name": "cat /sys/devices/virtual/dmi/id/product_name",
+            "sys_vendor": "cat /sys/devices/virtual/dmi/id/sys_vendor",
+        }
+        rets = run_cmds(test_instance, list(node_info_cmds.values()))
+        for key, (_, output) in zip(node_info_cmds, rets):
+            node_info_data[key] = output.rstrip("\n| ")
         with open(node_info, "w+") as fh:
             dump(node_info_data, fh)
         test_instance.node_info = node_info_data
@@ -721,6 +1427,7 @@ chpasswd:
     extra_step_parser(test_instance, extra_steps=extra_case_setups)
 
 
+@TRACER.trace()
 def finish_case(test_instance):
     """finish case
     Arguments:
@@ -735,6 +1442,7 @@ def finish_case(test_instance):
     extra_step_parser(test_instance, extra_steps=extra_case_posts)
 
 
+@TRACER.trace(arg_names=["extra_steps"])
 def extra_step_parser(test_instance, extra_steps=None):
     if not extra_steps:
         test_instance.log.info(
@@ -810,6 +1518,57 @@ def extra_step_parser(test_instance, extra_steps=None):
                 )
 
 
+CASE_IMPACTS = ["none", "config", "reboot", "crash"]
+
+
+def get_case_doc(case=None):
+    """
+    Parse case doc in yaml format.
+    Arguments:
+        case {Test instance} -- unittest.TestCase instance
+    Return:
+        dict of doc fields, description holds the raw doc if it is not in yaml format
+    """
+    return parse_case_doc(case._testMethodDoc, case.id())
+
+
+def parse_case_doc(src_content=None, case_name=None):
+    """
+    Parse case doc text in yaml format, see get_case_doc.
+    """
+    yaml_data = {}
+    try:
+        yaml_data = load(src_content, Loader=Loader)
+        if not hasattr(yaml_data, "get"):
+            yaml_data = {}
+            yaml_data["description"] = src_content
+    except Exception as err:
+        yaml_data = {}
+        yaml_data["doc_yaml_err"] = str(err)
+        yaml_data["description"] = src_content
+    yaml_data["case_name"] = case_name
+    return yaml_data
+
+
+def get_case_impact(case=None, case_doc=None):
+    """
+    Get how the case impacts the system under test from "disruptive" in case doc.
+    none: read state only, config: change system configuration,
+    reboot: reboot or stop the system, crash: crash the system.
+    Arguments:
+        case {Test instance} -- unittest.TestCase instance
+        case_doc {dict} -- parsed case doc, parse it from case if not provided
+    Return:
+        one of CASE_IMPACTS or "unknown", "unknown" is handled as disruptive
+    """
+    if case_doc is None:
+        case_doc = get_case_doc(case=case)
+    impact = str(case_doc.get("disruptive") or "").strip().lower()
+    if impact in CASE_IMPACTS:
+        return impact
+    return "unknown"
+
+
 def filter_case_doc(
     case=None,
     patterns=None,
@@ -817,21 +1576,11 @@ def filter_case_doc(
     filter_field="case_name",
     strict=False,
     verify_doc=False,
+    case_doc=None,
 ):
     if patterns is None and skip_patterns is None and not verify_doc:
         return True
-    yaml_data = {}
-    yaml_fail = None
-    try:
-        src_content = case._testMethodDoc
-        yaml_data = load(src_content, Loader=Loader)
-        if not hasattr(yaml_data, "get"):
-            yaml_data = {}
-            yaml_data["description"] = src_content
-    except Exception as err:
-        yaml_data["doc_yaml_err"] = str(err)
-        yaml_data["description"] = src_content
-    yaml_data["case_name"] = case.id()
+    yaml_data = case_doc if case_doc is not None else get_case_doc(case=case)
     is_skip = False
     is_select = False
     field_value = yaml_data.get(filter_field)
@@ -889,6 +1638,7 @@ def filter_case_doc(
     return is_select and not is_skip
 
 
+@TRACER.trace()
 def msg_to_syslog(test_instance, cmd="sudo virt-what", msg=None):
     """
     Save msg to journal log and dmesg.
@@ -908,6 +1658,7 @@ def msg_to_syslog(test_instance, cmd="sudo virt-what", msg=None):
     run_cmd(test_instance, cmd, expect_ret=0)
 
 
+@TRACER.trace(cat="cmd", arg_names=["cmd"])
 def run_cmd_local(cmd="", timeout=120, is_log_cmd=True, log=None, is_log_ret=False):
     if log is None:
         log = logging.getLogger(__name__)
@@ -934,6 +1685,8 @@ def run_cmd_local(cmd="", timeout=120, is_log_cmd=True, log=None, is_log_ret=Fal
     #    output = output + ret.stderr
 
 
+@TRACER.trace(cat="cmd", arg_names=["cmd"])
+@clear_facts_after_pkg_change
 def run_cmd(
     test_instance,
     cmd,
@@ -957,6 +1710,9 @@ def run_cmd(
     rmt_get_pty=False,
     rmt_node=None,
     vm=None,
+    stream=False,
+    stream_head=cmd_stream.STREAM_HEAD_LINES,
+    stream_tail=cmd_stream.STREAM_TAIL_LINES,
 ):
     """run cmd with/without check return status/keywords and save log
 
@@ -987,12 +1743,52 @@ def run_cmd(
         rmt_redirect_stderr {bool} -- ssh command not exit some times, redirect stderr to tmpfile if needed
         rmt_node {string} -- run command on specific rmt node
         vm {vm} -- run command on specific vm
+        stream {bool} -- copy output to an attachment file chunk by chunk for cmds
+                         with huge output, only its head/tail lines are logged and
+                         returned, keywords are checked line by line; it runs
+                         cmd by the node's ssh client directly, not by the agent
+                         and node monitor as other cmds
+        stream_head {int} -- head lines of streamed output to keep
+        stream_tail {int} -- tail lines of streamed output to keep
 
     Keyword Arguments:
         check_ret {bool} -- [whether check return] (default: {False})
     """
     if msg is not None:
         test_instance.log.info(msg)
+    checks = dict(
+        expect_ret=expect_ret,
+        expect_not_ret=expect_not_ret,
+        expect_kw=expect_kw,
+        expect_not_kw=expect_not_kw,
+        expect_output=expect_output,
+        msg=msg,
+        cancel_kw=cancel_kw,
+        cancel_not_kw=cancel_not_kw,
+        cancel_ret=cancel_ret,
+        cancel_not_ret=cancel_not_ret,
+        is_log_output=is_log_output,
+        cursor=cursor,
+    )
+    if stream:
+        status, capture = run_cmd_stream(
+            test_instance,
+            cmd,
+            timeout=timeout,
+            is_log_cmd=is_log_cmd,
+            rmt_node=rmt_node,
+            vm=vm,
+            patterns=",".join(i for i in [expect_kw, expect_not_kw] if i),
+            words=",".join(i for i in [cancel_kw, cancel_not_kw] if i),
+            head=stream_head,
+            tail=stream_tail,
+        )
+        output = check_cmd_result(
+            test_instance, status, capture and capture.summary, capture=capture, **checks
+        )
+        if ret_status:
+            return status
+        return output
     status = None
     output = None
     exception_hit = False
@@ -1016,14 +1812,27 @@ def run_cmd(
                     break
             if is_log_cmd:
                 test_instance.log.info("CMD: {} on {}".format(cmd, rmt_node))
-            status, output = SSH.remote_excute(
-                cmd,
-                timeout,
-                is_log_cmd,
-                redirect_stdout=rmt_redirect_stdout,
-                redirect_stderr=rmt_redirect_stderr,
-                rmt_get_pty=rmt_get_pty,
-            )
+            agent = getattr(SSH, "agent", None)
+            is_done = False
+            if agent and agent.is_alive() and not (
+                rmt_redirect_stdout or rmt_redirect_stderr or rmt_get_pty
+            ):
+                try:
+                    status, output = agent.exec(cmd, timeout=timeout)
+                    is_done = True
+                except AgentError as err:
+                    test_instance.log.info(
+                        "agent failed, run cmd through ssh: {}".format(err)
+                    )
+            if not is_done:
+                status, output = SSH.remote_excute(
+                    cmd,
+                    timeout,
+                    is_log_cmd,
+                    redirect_stdout=rmt_redirect_stdout,
+                    redirect_stderr=rmt_redirect_stderr,
+                    rmt_get_pty=rmt_get_pty,
+                )
         else:
             status, output = run_cmd_local(
                 cmd=cmd, timeout=timeout, is_log_cmd=is_log_cmd, log=test_instance.log
@@ -1089,6 +1898,36 @@ def run_cmd(
                         )
                     )
 
+    output = check_cmd_result(test_instance, status, output, **checks)
+    if ret_status:
+        return status
+    return output
+
+
+def check_cmd_result(
+    test_instance,
+    status,
+    output,
+    expect_ret=None,
+    expect_not_ret=None,
+    expect_kw=None,
+    expect_not_kw=None,
+    expect_output=None,
+    msg=None,
+    cancel_kw=None,
+    cancel_not_kw=None,
+    cancel_ret=None,
+    cancel_not_ret=None,
+    is_log_output=True,
+    cursor=None,
+    capture=None,
+):
+    """check return status/keywords of a finished cmd, shared by run_cmd and run_cmds.
+    Arguments are the same as run_cmd, keywords are looked up in capture if
+    output was streamed.
+    Return:
+        output, skip content before cursor if cursor found
+    """
     if cursor is not None and output is not None and cursor in output:
         output = output[output.index(cursor) :]
     if is_log_output:
@@ -1107,10 +1946,7 @@ def run_cmd(
         )
     if expect_kw is not None:
         for key_word in expect_kw.split(","):
-            find_list = re.findall(
-                "{}".format(".*" in key_word and key_word or ".*{}.*".format(key_word)),
-                output,
-            )
+            find_list = find_kw(key_word, output, capture)
             if find_list:
                 test_instance.log.info(
                     'expected "{}" found in "{}"'.format(key_word, "".join(find_list))
@@ -1128,10 +1964,7 @@ def run_cmd(
                     )
     if expect_not_kw is not None:
         for key_word in expect_not_kw.split(","):
-            find_list = re.findall(
-                "{}".format(".*" in key_word and key_word or ".*{}.*".format(key_word)),
-                output,
-            )
+            find_list = find_kw(key_word, output, capture)
             if not find_list:
                 test_instance.log.info(
                     'Unexpected "{}" not found in output'.format(key_word)
@@ -1156,7 +1989,7 @@ def run_cmd(
     if cancel_kw is not None:
         cancel_yes = True
         for key_word in cancel_kw.split(","):
-            if key_word in output:
+            if capture.contains(key_word) if capture else key_word in output:
                 cancel_yes = False
         if cancel_yes:
             test_instance.skipTest(
@@ -1164,7 +1997,7 @@ def run_cmd(
             )
     if cancel_not_kw is not None:
         for key_word in cancel_not_kw.split(","):
-            if key_word in output:
+            if capture.contains(key_word) if capture else key_word in output:
                 test_instance.skipTest(
                     "'%s' found, cancel case. msg:%s" % (key_word, msg)
                 )
@@ -1186,11 +2019,333 @@ def run_cmd(
                     "skip ret code '%s' found act ret '%s' cancel case. msg:%s"
                     % (ret, status, msg)
                 )
+    return output
+
+
+def find_kw(key_word, output, capture=None):
+    "Return lines(or the matched part) of output matching key_word of expect_kw."
+    if capture:
+        return capture.findall(key_word)
+    return re.findall(
+        "{}".format(".*" in key_word and key_word or ".*{}.*".format(key_word)),
+        output,
+    )
+
+
+def run_cmd_stream(
+    test_instance,
+    cmd,
+    timeout=120,
+    is_log_cmd=True,
+    rmt_node=None,
+    vm=None,
+    patterns=None,
+    words=None,
+    head=cmd_stream.STREAM_HEAD_LINES,
+    tail=cmd_stream.STREAM_TAIL_LINES,
+):
+    """
+    Run cmd and copy its output to an attachment file of case chunk by chunk.
+    Arguments:
+        patterns {string} -- keywords matched as expect_kw, seperate by ','
+        words {string} -- keywords matched as cancel_kw, seperate by ','
+    Return:
+        (status, StreamCapture), status is None if cmd failed to run or timed out
+    """
+    out_dir = getattr(test_instance, "debug_dir", None) or os.path.join(
+        test_instance.params["results_dir"], "attachments"
+    )
+    os.makedirs(out_dir, exist_ok=True)
+    out_file = cmd_stream.get_stream_file(out_dir, cmd)
+    capture = cmd_stream.StreamCapture(
+        out_file,
+        patterns=patterns and patterns.split(","),
+        words=words and words.split(","),
+        head=head,
+        tail=tail,
+    )
+    status = None
+    try:
+        if test_instance.is_rmt:
+            rmt_node = rmt_node or test_instance.params["remote_node"] or None
+            if vm and hasattr(vm, "floating_ip"):
+                rmt_node = vm.floating_ip
+            SSH = None
+            for ssh in test_instance.SSHs:
+                if ssh.rmt_node == rmt_node:
+                    SSH = ssh
+                    break
+            if is_log_cmd:
+                test_instance.log.info("CMD: {} on {}".format(cmd, rmt_node))
+            status = cmd_stream.stream_ssh(SSH.ssh_client, cmd, capture, timeout)
+        else:
+            if is_log_cmd:
+                test_instance.log.info("CMD: {}".format(cmd))
+            status = cmd_stream.stream_local(cmd, capture, timeout)
+    except Exception as err:
+        test_instance.log.error("Run cmd failed: {}".format(err))
+    finally:
+        capture.close()
+    test_instance.log.info(
+        "output {} bytes saved to {}".format(capture.size, capture.out_file)
+    )
+    return status, capture
+
+
+def run_cmds(
+    test_instance,
+    cmds,
+    timeout=120,
+    is_log_cmd=True,
+    rmt_node=None,
+    vm=None,
+):
+    """run cmds in one remote exec instead of one ssh round trip per cmd,
+    then check each cmd the same as run_cmd.
+    All cmds are run before checking, so do not batch cmds depending on the
+    checks of previous ones.
+    If the batch breaks at a cmd(eg. timeout), the cmd is not run again, its
+    status is None with its partial output, and the cmds after it are run in a
+    new batch.
+
+    Arguments:
+        test_instance {Test instance} -- unittest.TestCase instance
+        cmds {list} -- cmd strings, or dicts of "cmd" and the check arguments of
+                       run_cmd, eg. {"cmd": "uname -r", "expect_ret": 0, "msg": "get kernel"}
+        timeout {int} -- timeout of all cmds
+        is_log_cmd {bool} -- print cmd or not
+        rmt_node {string} -- run cmds on specific rmt node
+        vm {vm} -- run cmds on specific vm
+    Return:
+        list of (status, output) of each cmd
+    """
+    cmd_list = [cmd if isinstance(cmd, dict) else {"cmd": cmd} for cmd in cmds]
+    if (
+        test_instance.is_rmt
+        and not test_instance.params["remote_node"]
+        and not rmt_node
+        and not vm
+    ):
+        return [(None, None)] * len(cmd_list)
+    results = {}
+    indexes = list(range(len(cmd_list)))
+    while indexes:
+        finished, partial = _run_cmds_script(
+            test_instance, cmd_list, indexes, timeout, rmt_node, vm
+        )
+        results.update(finished)
+        broken = next((i for i in indexes if i not in finished), None)
+        if broken is None:
+            break
+        # the batch broke at this cmd, eg. timeout, it might be half done so
+        # it is not run again
+        test_instance.log.info(
+            "cmd not finished in batch: {}".format(cmd_list[broken]["cmd"])
+        )
+        results[broken] = (None, partial)
+        indexes = [i for i in indexes if i > broken]
+    rets = []
+    for index, cmd in enumerate(cmd_list):
+        checks = dict(cmd)
+        cmd_str = checks.pop("cmd")
+        status, output = results.get(index, (None, None))
+        if checks.get("msg") is not None:
+            test_instance.log.info(checks["msg"])
+        if is_log_cmd:
+            test_instance.log.info("CMD: {}".format(cmd_str))
+        output = check_cmd_result(test_instance, status, output, **checks)
+        rets.append((status, output))
+    return rets
+
+
+def _run_cmds_script(
+    test_instance, cmd_list, indexes, timeout, rmt_node=None, vm=None
+):
+    """
+    Run cmds of indexes as one script, each cmd is followed by a delimiter line
+    with its index and return status.
+    Return:
+        (dict of index and (status, output) of the finished cmds,
+         output after the last finished cmd)
+    """
+    delimiter = "OS_TESTS_CMD_{}".format(uuid.uuid4().hex)
+    script = "\n".join(
+        "( {}\n) 2>&1; printf '\\n{} {} %s\\n' $?".format(
+            cmd_list[index]["cmd"], delimiter, index
+        )
+        for index in indexes
+    )
+    # the script stops itself on the node at timeout, so run_cmd returns the
+    # output got before it and the broken cmd can be told
+    output = run_cmd(
+        test_instance,
+        cmd_stream.get_timeout_cmd(script, timeout),
+        timeout=timeout + cmd_stream.KILL_GRACE * 2,
+        is_log_cmd=False,
+        is_log_output=False,
+        rmt_node=rmt_node,
+        vm=vm,
+    )
+    results = {}
+    if not output:
+        return results, output
+    pos = 0
+    for ret in re.finditer(r"\n{} (\d+) (\d+)(?:\n|$)".format(delimiter), output):
+        results[int(ret.group(1))] = (int(ret.group(2)), output[pos : ret.start()])
+        pos = ret.end()
+    return results, output[pos:]
+
+
+async def arun_cmd(
+    test_instance,
+    cmd,
+    timeout=120,
+    ret_status=False,
+    is_log_cmd=True,
+    rmt_node=None,
+    vm=None,
+    **checks
+):
+    """async counterpart of run_cmd, cmds on different nodes(or the same node)
+    can be awaited together, eg. start server, client and monitor at the same time.
+    Remote cmds run in their own channel of the existing ssh connection of node,
+    call init_connection() for the node before it.
+
+    Arguments:
+        test_instance {Test instance} -- unittest.TestCase instance
+        cmd {string} -- cmd to run
+        timeout {int} -- cmd is stopped and its status is None after timeout
+        ret_status {bool} -- return ret code instead of output
+        rmt_node {string} -- run cmd on specific rmt node
+        vm {vm} -- run cmd on specific vm
+        checks -- expect_*, cancel_*, msg, cursor, is_log_output the same as run_cmd
+    """
+    if checks.get("msg") is not None:
+        test_instance.log.info(checks["msg"])
+    status = None
+    output = None
+    try:
+        if test_instance.is_rmt:
+            rmt_node = rmt_node or test_instance.params["remote_node"] or None
+            if vm and hasattr(vm, "floating_ip"):
+                rmt_node = vm.floating_ip
+            SSH = None
+            for ssh in test_instance.SSHs:
+                if ssh.rmt_node == rmt_node:
+                    SSH = ssh
+                    break
+            if SSH is None:
+                test_instance.fail("no connection to {}".format(rmt_node))
+            if is_log_cmd:
+                test_instance.log.info("CMD: {} on {}".format(cmd, rmt_node))
+            status, output = await _aexec_ssh(SSH, cmd, timeout)
+        else:
+            if is_log_cmd:
+                test_instance.log.info("CMD: {}".format(cmd))
+            status, output = await _aexec_local(cmd, timeout)
+    except asyncio.TimeoutError:
+        test_instance.log.error("Run cmd failed: timeout after {}s".format(timeout))
+    except Exception as err:
+        test_instance.log.error("Run cmd failed: {}".format(err))
+    output = check_cmd_result(test_instance, status, output, **checks)
     if ret_status:
         return status
     return output
 
 
+async def _aexec_ssh(ssh, cmd, timeout):
+    """
+    Run cmd in a new channel of ssh without blocking event loop. cmd runs
+    under timeout(1) on the node, so it is stopped there when it times out.
+    Return:
+        (status, output), output is stdout followed by stderr as remote_excute
+    """
+    loop = asyncio.get_running_loop()
+    channel = await loop.run_in_executor(
+        None, ssh.ssh_client.get_transport().open_session
+    )
+    try:
+        start = time.time()
+        await loop.run_in_executor(
+            None, channel.exec_command, cmd_stream.get_timeout_cmd(cmd, timeout)
+        )
+        channel.setblocking(0)
+        stdout = []
+        stderr = []
+        # the channel is only closed locally if the node does not stop cmd in time
+        deadline = loop.time() + timeout + cmd_stream.KILL_GRACE * 2
+        interval = 0.01
+        while True:
+            is_data = False
+            while channel.recv_ready():
+                stdout.append(channel.recv(65536))
+                is_data = True
+            while channel.recv_stderr_ready():
+                stderr.append(channel.recv_stderr(65536))
+                is_data = True
+            if (
+                channel.exit_status_ready()
+                and not channel.recv_ready()
+                and not channel.recv_stderr_ready()
+            ):
+                break
+            if loop.time() > deadline:
+                raise asyncio.TimeoutError()
+            interval = 0.01 if is_data else min(interval * 2, 0.5)
+            await asyncio.sleep(interval)
+        status = channel.recv_exit_status()
+        if cmd_stream.is_timed_out(status, start, timeout):
+            raise asyncio.TimeoutError()
+    finally:
+        channel.close()
+    output = b"".join(stdout) + b"".join(stderr)
+    return status, output.decode("utf-8", "replace")
+
+
+async def _aexec_local(cmd, timeout):
+    proc = await asyncio.create_subprocess_shell(
+        cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # kill the whole session, children of shell keep the pipe open
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        await proc.wait()
+        raise
+    return proc.returncode, stdout.decode("utf-8", "replace")
+
+
+def gather_on_nodes(test_instance, cmds, timeout=120):
+    """run cmds at the same time and wait for all of them, it is for sync cases
+    and cannot be called in a running event loop.
+
+    Arguments:
+        test_instance {Test instance} -- unittest.TestCase instance
+        cmds {list} -- cmd strings run on remote_node, or dicts of "cmd" and
+                       other arguments of arun_cmd, eg. {"cmd": "iperf3 -s -1", "rmt_node": srv_node}
+        timeout {int} -- default timeout of each cmd
+    Return:
+        list of arun_cmd results in the order of cmds
+    """
+
+    async def gather():
+        tasks = []
+        for cmd in cmds:
+            kwargs = {"timeout": timeout}
+            kwargs.update(cmd if isinstance(cmd, dict) else {"cmd": cmd})
+            tasks.append(arun_cmd(test_instance, **kwargs))
+        return await asyncio.gather(*tasks)
+
+    return asyncio.run(gather())
+
+
 def compare_nums(test_instance, num1=None, num2=None, ratio=0, msg="Compare 2 nums"):
     """
     Compare num1 and num2.
@@ -1296,7 +2451,9 @@ def is_arch(test_instance, arch="", action=None):
         arm: return True
         other: return False
     """
-    output = run_cmd(test_instance, "lscpu", expect_ret=0)
+    output = get_fact(
+        test_instance, "lscpu", lambda: run_cmd(test_instance, "lscpu", expect_ret=0)
+    )
     if arch in output:
         test_instance.log.info("{}detected.".format(arch))
         return True
@@ -1317,19 +2474,25 @@ def is_aws(test_instance, action=None):
         aws: return True
         other: return False
     """
-    if is_pkg_installed(
-        test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
-    ):
-        output = run_cmd(
-            test_instance,
-            "sudo bash -c 'cat /sys/devices/virtual/dmi/id/bios_*; virt-what'",
-            expect_ret=0,
-        )
-    else:
-        output = run_cmd(
-            test_instance, "sudo cat /sys/devices/virtual/dmi/id/bios_*", expect_ret=0
-        )
-    if any(x in output.lower() for x in ["aws", "amazon"]):
+
+    def probe():
+        if is_pkg_installed(
+            test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
+        ):
+            output = run_cmd(
+                test_instance,
+                "sudo bash -c 'cat /sys/devices/virtual/dmi/id/bios_*; virt-what'",
+                expect_ret=0,
+            )
+        else:
+            output = run_cmd(
+                test_instance,
+                "sudo cat /sys/devices/virtual/dmi/id/bios_*",
+                expect_ret=0,
+            )
+        return any(x in output.lower() for x in ["aws", "amazon"])
+
+    if get_fact(test_instance, "is_aws", probe):
         test_instance.log.info("AWS system.")
         return True
     else:
@@ -1349,7 +2512,13 @@ def is_azure(test_instance, action=None):
         azure: return True
         other: return False
     """
-    ret = run_cmd(test_instance, "ls /dev/disk/cloud/azure_root", ret_status=True)
+    ret = get_fact(
+        test_instance,
+        "is_azure",
+        lambda: run_cmd(
+            test_instance, "ls /dev/disk/cloud/azure_root", ret_status=True
+        ),
+    )
     if ret == 0:
         test_instance.log.info("Azure system.")
         return True
@@ -1370,21 +2539,25 @@ def is_ali(test_instance, action=None):
         ali: return True
         other: return False
     """
-    if is_pkg_installed(
-        test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
-    ):
-        output = run_cmd(
-            test_instance,
-            "sudo bash -c 'cat /sys/devices/virtual/dmi/id/product_*; virt-what'",
-            expect_ret=0,
-        )
-    else:
-        output = run_cmd(
-            test_instance,
-            "sudo cat /sys/devices/virtual/dmi/id/product_*",
-            expect_ret=0,
-        )
-    if "alibaba" in output.lower():
+
+    def probe():
+        if is_pkg_installed(
+            test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
+        ):
+            output = run_cmd(
+                test_instance,
+                "sudo bash -c 'cat /sys/devices/virtual/dmi/id/product_*; virt-what'",
+                expect_ret=0,
+            )
+        else:
+            output = run_cmd(
+                test_instance,
+                "sudo cat /sys/devices/virtual/dmi/id/product_*",
+                expect_ret=0,
+            )
+        return "alibaba" in output.lower()
+
+    if get_fact(test_instance, "is_ali", probe):
         test_instance.log.info("Ali system.")
         return True
     else:
@@ -1424,17 +2597,21 @@ def is_ahv(test_instance, action=None):
         ahv: return True
         other: return False
     """
-    if is_pkg_installed(
-        test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
-    ):
-        output = run_cmd(test_instance, "sudo virt-what", expect_ret=0)
-    else:
-        output = run_cmd(
-            test_instance,
-            "sudo cat /sys/devices/virtual/dmi/id/product_*",
-            expect_ret=0,
-        )
-    if "ahv" in output.lower():
+
+    def probe():
+        if is_pkg_installed(
+            test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
+        ):
+            output = run_cmd(test_instance, "sudo virt-what", expect_ret=0)
+        else:
+            output = run_cmd(
+                test_instance,
+                "sudo cat /sys/devices/virtual/dmi/id/product_*",
+                expect_ret=0,
+            )
+        return "ahv" in output.lower()
+
+    if get_fact(test_instance, "is_ahv", probe):
         test_instance.log.info("Nutanix AHV system.")
         return True
     else:
@@ -1454,15 +2631,21 @@ def is_gcp(test_instance, action=None):
         aws: return True
         other: return False
     """
-    if is_pkg_installed(
-        test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
-    ):
-        output = run_cmd(test_instance, "sudo virt-what", expect_ret=0)
-    else:
-        output = run_cmd(
-            test_instance, "sudo cat /sys/devices/virtual/dmi/id/bios_*", expect_ret=0
-        )
-    if "google" in output.lower():
+
+    def probe():
+        if is_pkg_installed(
+            test_instance, pkg_name="virt-what", cancel_case=False, is_install=False
+        ):
+            output = run_cmd(test_instance, "sudo virt-what", expect_ret=0)
+        else:
+            output = run_cmd(
+                test_instance,
+                "sudo cat /sys/devices/virtual/dmi/id/bios_*",
+                expect_ret=0,
+            )
+        return "google" in output.lower()
+
+    if get_fact(test_instance, "is_gcp", probe):
         test_instance.log.info("gcp system.")
         return True
     else:
@@ -1487,7 +2670,9 @@ def is_metal(test_instance, action=None):
             if not test_instance.vm.is_metal:
                 test_instance.skipTest("Cancel it in non metal system.")
         return test_instance.vm.is_metal
-    output_lscpu = run_cmd(test_instance, "lscpu", expect_ret=0)
+    output_lscpu = get_fact(
+        test_instance, "lscpu", lambda: run_cmd(test_instance, "lscpu", expect_ret=0)
+    )
     if "x86_64" in output_lscpu and "Hypervisor" not in output_lscpu:
         test_instance.log.info("It is a bare metal instance.")
         return True
@@ -1521,7 +2706,16 @@ def is_cmd_exist(
         is_install {bool} -- try to install it or not
     """
     cmd_check = "which %s" % cmd
-    ret = run_cmd(test_instance, cmd_check, ret_status=True, rmt_node=rmt_node, vm=vm)
+    ret = get_fact(
+        test_instance,
+        "cmd_exist:{}".format(cmd),
+        lambda: run_cmd(
+            test_instance, cmd_check, ret_status=True, rmt_node=rmt_node, vm=vm
+        ),
+        rmt_node=rmt_node,
+        vm=vm,
+        keep=lambda ret: ret == 0,
+    )
     if ret == 0:
         return True
     else:
@@ -1824,7 +3018,13 @@ def get_memsize(test_instance, action=None):
         aws: return True
         other: return False
     """
-    output = run_cmd(test_instance, "cat /proc/meminfo |grep MemTotal", expect_ret=0)
+    output = get_fact(
+        test_instance,
+        "mem_total",
+        lambda: run_cmd(
+            test_instance, "cat /proc/meminfo |grep MemTotal", expect_ret=0
+        ),
+    )
 
     mem_kb = int(re.findall("\d+", output)[0])
     mem_gb = mem_kb / 1024 / 1024
@@ -1857,15 +3057,21 @@ def get_cmd_cursor(
     Return:
         cursor {string}
     """
-    output = run_cmd(
-        test_instance,
-        cmd,
-        expect_ret=0,
-        is_log_output=False,
-        rmt_redirect_stdout=rmt_redirect_stdout,
-        rmt_get_pty=rmt_get_pty,
-        timeout=timeout,
+    lines = get_log_lines(
+        test_instance, cmd, timeout=timeout, rmt_redirect_stdout=rmt_redirect_stdout
     )
+    if lines is not None:
+        output = "\n".join(lines)
+    else:
+        output = run_cmd(
+            test_instance,
+            cmd,
+            expect_ret=0,
+            is_log_output=False,
+            rmt_redirect_stdout=rmt_redirect_stdout,
+            rmt_get_pty=rmt_get_pty,
+            timeout=timeout,
+        )
     if len(output.split("\n")) < 5:
         return output.split("\n")[-1]
     for i in range(-1, -10, -1):
@@ -1876,6 +3082,76 @@ def get_cmd_cursor(
     return cursor
 
 
+def get_log_snapshot(
+    test_instance,
+    log_cmd,
+    timeout=180,
+    rmt_redirect_stdout=False,
+    rmt_node=None,
+    vm=None,
+):
+    """
+    Get snapshot of log_cmd in current boot from its tracker, only records not
+    got by former calls are fetched, eg. by "journalctl --after-cursor".
+    Arguments:
+        log_cmd {string} -- "journalctl -b 0", "sudo journalctl -b 0" or "sudo dmesg"
+    Return:
+        LogSnapshot, or None if log_cmd cannot be tracked and needs to run as before
+    """
+    if not log_tracker.get_log_source(log_cmd):
+        return None
+    node, _ = get_node_boot_id(test_instance, rmt_node=rmt_node, vm=vm)
+    tracker = log_tracker.get_tracker(node, log_cmd)
+    with tracker.lock:
+        for _ in range(2):
+            output = run_cmd(
+                test_instance,
+                tracker.get_cmd(),
+                is_log_output=False,
+                msg="Get new records of '{}'".format(log_cmd),
+                timeout=timeout,
+                rmt_redirect_stdout=rmt_redirect_stdout,
+                rmt_node=rmt_node,
+                vm=vm,
+            )
+            if tracker.update(output):
+                break
+            test_instance.log.info("{} booted again, get its log from start".format(node))
+        if tracker.position is None:
+            test_instance.log.info("Cannot track '{}', get the whole log".format(log_cmd))
+            return None
+        test_instance.log.info(
+            "{} new lines of '{}', {} lines in boot {}".format(
+                tracker.new_lines, log_cmd, len(tracker.snapshot), tracker.boot_id
+            )
+        )
+        return tracker.snapshot
+
+
+def get_log_lines(
+    test_instance,
+    log_cmd,
+    timeout=180,
+    rmt_redirect_stdout=False,
+    rmt_node=None,
+    vm=None,
+):
+    """
+    Get lines of log_cmd in current boot, the same as get_log_snapshot().
+    Return:
+        list of lines, or None if log_cmd cannot be tracked and needs to run as before
+    """
+    snapshot = get_log_snapshot(
+        test_instance,
+        log_cmd,
+        timeout=timeout,
+        rmt_redirect_stdout=rmt_redirect_stdout,
+        rmt_node=rmt_node,
+        vm=vm,
+    )
+    return snapshot.get_lines() if snapshot is not None else None
+
+
 def check_log(
     test_instance,
     log_keyword,
@@ -1913,33 +3189,88 @@ def check_log(
     if skip_words:
         check_cmd = check_cmd + '|grep -Ev "{}"'.format(skip_words.replace(",", "|"))
 
-    ret = False
-    if cursor is not None:
-        out = run_cmd(
+    baseline_dict = get_baseline_dict(test_instance)
+    triggers = get_baseline_index(baseline_dict).triggers
+    snapshot = None
+    if not match_word_exact and not (cursor and "\n" in cursor):
+        snapshot = get_log_snapshot(
+            test_instance, log_cmd, rmt_redirect_stdout=rmt_redirect_stdout
+        )
+    filtered = None
+    if snapshot is not None:
+        # the same as the grep pipeline of check_cmd, looked up in the lines
+        # indexed by keyword instead of matching the whole log
+        skip_patterns = [test_instance.id()]
+        if "test_check" in test_instance.id():
+            skip_patterns.append("test_check")
+        if skip_words:
+            skip_patterns.append(skip_words.replace(",", "|"))
+        skip = re.compile("|".join("(?:{})".format(i) for i in skip_patterns))
+        test_instance.log.info("CMD: {}".format(check_cmd))
+        check_cmd_result(
             test_instance,
-            check_cmd,
+            0 if snapshot.match_lines(skip=skip, limit=1) else 1,
+            None,
             expect_ret=expect_ret,
             expect_not_ret=expect_not_ret,
-            msg="Get log......",
+            is_log_output=False,
+        )
+        filtered = {
+            "found": {
+                kw: snapshot.match_lines(kw, skip=skip, cursor=cursor)
+                for kw in log_keyword.split(",")
+            },
+            "triggers": [
+                i
+                for i in triggers
+                if snapshot.match_lines(i, skip=skip, cursor=cursor, limit=1)
+            ],
+        }
+    else:
+        filtered = filter_log(
+            test_instance,
+            check_cmd,
+            log_keyword.split(","),
+            skip_words=skip_words,
+            triggers=triggers,
             cursor=cursor,
+            expect_ret=expect_ret,
+            expect_not_ret=expect_not_ret,
             rmt_redirect_stderr=rmt_redirect_stderr,
             rmt_redirect_stdout=rmt_redirect_stdout,
             rmt_get_pty=rmt_get_pty,
         )
-    else:
+    if filtered is None:
         out = run_cmd(
             test_instance,
             check_cmd,
             expect_ret=expect_ret,
             expect_not_ret=expect_not_ret,
             msg="Get log......",
+            cursor=cursor,
             rmt_redirect_stderr=rmt_redirect_stderr,
             rmt_redirect_stdout=rmt_redirect_stdout,
             rmt_get_pty=rmt_get_pty,
         )
 
     for keyword in log_keyword.split(","):
-        ret, msg = find_word(test_instance, out, keyword, skip_words=skip_words)
+        if filtered is None:
+            ret, msg = find_word(
+                test_instance,
+                out,
+                keyword,
+                baseline_dict=baseline_dict,
+                skip_words=skip_words,
+            )
+        else:
+            ret, msg = find_word(
+                test_instance,
+                "\n".join(filtered["found"][keyword]),
+                keyword,
+                baseline_dict=baseline_dict,
+                skip_words=skip_words,
+                triggers_found=filtered["triggers"],
+            )
         if ret:
             test_instance.fail(
                 "Found {} in {} log!\n{}".format(keyword, check_cmd, "\n".join(msg))
@@ -1950,6 +3281,83 @@ def check_log(
             )
 
 
+def filter_log(
+    test_instance,
+    log_cmd,
+    keywords,
+    skip_words=None,
+    triggers=None,
+    cursor=None,
+    expect_ret=None,
+    expect_not_ret=None,
+    rmt_redirect_stdout=False,
+    rmt_redirect_stderr=False,
+    rmt_get_pty=False,
+):
+    """
+    Check keywords in output of log_cmd on the system under test by
+    os_tests/utils/log_filter.py, only matched lines are sent back.
+    Arguments:
+        keywords {list} -- keywords matched the same as find_word
+        skip_words {string} -- drop matched lines with any of them, split by ","
+        triggers {list} -- regex to search in the whole log, eg. baseline triggers
+        cursor {string} -- check log after the first line with cursor
+    Return:
+        dict of "lines"(total lines checked), "found"({keyword: {line: count}}),
+        "triggers"(triggers found), or None if filter cannot run there(eg. no
+        python) or the matched lines are too many to be sent back
+    """
+    spec = {
+        "keywords": keywords,
+        "skip_words": skip_words and skip_words.split(",") or [],
+        "triggers": triggers or [],
+        "cursor": cursor,
+    }
+    with open(LOG_FILTER_SCRIPT, "rb") as fh:
+        script = base64.b64encode(fh.read()).decode()
+    cmd = "( {}\n) | {{ py=$(command -v python3 || command -v /usr/libexec/platform-python || command -v python); ".format(
+        log_cmd
+    )
+    cmd += '$py -c "import base64,sys;exec(base64.b64decode(sys.argv[1]))" {} {}; }}'.format(
+        script, base64.b64encode(json.dumps(spec).encode()).decode()
+    )
+    test_instance.log.info("CMD: {} | log_filter.py {}".format(log_cmd, spec["keywords"]))
+    output = run_cmd(
+        test_instance,
+        cmd,
+        is_log_cmd=False,
+        msg="Get log......",
+        rmt_redirect_stderr=rmt_redirect_stderr,
+        rmt_redirect_stdout=rmt_redirect_stdout,
+        rmt_get_pty=rmt_get_pty,
+    )
+    found = re.search(r"^{} (.*)$".format(LOG_FILTER_MARKER), output or "", flags=re.M)
+    try:
+        result = json.loads(found.group(1))
+    except (AttributeError, ValueError):
+        test_instance.log.info("Cannot filter log on guest, check the whole log")
+        return None
+    if result.get("truncated"):
+        test_instance.log.info("Too many lines matched on guest, check the whole log")
+        return None
+    test_instance.log.info(
+        "{} lines of log checked, {} lines matched".format(
+            result["lines"],
+            sum(len(i) for i in result["found"].values()),
+        )
+    )
+    # log_filter.py exits as "grep -v" at the end of log_cmd pipeline
+    check_cmd_result(
+        test_instance,
+        0 if result["lines"] else 1,
+        None,
+        expect_ret=expect_ret,
+        expect_not_ret=expect_not_ret,
+        is_log_output=False,
+    )
+    return result
+
+
 def clean_sentence(test_instance, line1, line2):
     """only keep neccessary words
     eg.
@@ -1968,25 +3376,12 @@ def clean_sentence(test_instance, line1, line2):
         line1
         line2
     """
-    tmpline = ""
-    line1_longer = True
-    if len(line1) > len(line2):
-        tmpline = line2
-    else:
-        tmpline = line1
-        line1_longer = False
-    for i in re.findall("\w+", tmpline):
-        if len(i) >= 3:
-            if i not in line1 or i not in line2:
-                return line1, line2
-            # test_instance.log.info("got start word {}".format(i))
-            if line1_longer:
-                line1 = line1[line1.index(i) :]
-            else:
-                line2 = line2[line2.index(i) :]
-            # test_instance.log.info("return line1:{} line2:{}".format(line1, line2))
-            return line1, line2
-    return line1, line2
+    return baseline.clean_sentence(line1, line2)
+
+
+def get_baseline_dict(test_instance):
+    "Return baseline data of known log messages, it is loaded once in a run."
+    return get_baseline_index().baseline
 
 
 def find_word(
@@ -1996,6 +3391,7 @@ def find_word(
     baseline_dict=None,
     skip_words=None,
     case=None,
+    triggers_found=None,
 ):
     """find words in content
 
@@ -2007,17 +3403,16 @@ def find_word(
         skip_words: skip words as you want, split by ","
         case: only check items when cases are same, so users can know which case found it and
                also can be used for test result auto checks.
+        triggers_found: baseline triggers found in the log when check_str only has the
+               matched lines, eg. filtered by filter_log()
     Returns:
         [Bool] -- [True|False]
+        [list] -- unknown items, lines of the same template are shown as one
+               item with their count
     """
     if not baseline_dict:
-        # Baseline data file
-        baseline_file = os.path.dirname(os_tests.__file__) + "/data/baseline_log.json"
-        with open(baseline_file, "r") as fh:
-            test_instance.log.info(
-                "Loading baseline data file from {}".format(baseline_file)
-            )
-            baseline_dict = json.load(fh)
+        baseline_dict = get_baseline_dict(test_instance)
+    index = get_baseline_index(baseline_dict)
     log_keywords = []
     kw_from_case = False
     if log_keyword and "," in log_keyword:
@@ -2025,12 +3420,8 @@ def find_word(
     elif log_keyword:
         log_keywords.append(log_keyword)
     elif log_keyword is None and case:
-        msg_ids = []
-        for key in baseline_dict.keys():
-            if baseline_dict[key].get("cases"):
-                if case in baseline_dict[key].get("cases"):
-                    log_keywords.append(baseline_dict[key].get("content"))
-                    msg_ids.append(key)
+        msg_ids = index.keys_of_case(case)
+        log_keywords.extend(baseline_dict[key].get("content") for key in msg_ids)
         test_instance.log.info(
             "fetched rules from {} matching case:{}".format(msg_ids, case)
         )
@@ -2063,56 +3454,47 @@ def find_word(
     if not all_items:
         # if no items found in checking list, no need to do further checking
         return new_fail_found or kw_from_case, []
-    remain_items = list(set(deepcopy(all_items)))
+    # templates group the lines of the same message in log, each distinct line
+    # is still checked with baseline as lines of a template might differ
+    miner = log_template.TemplateMiner()
+    for item in all_items:
+        miner.add(item)
+    test_instance.log.info(
+        "{} items in {} templates".format(len(all_items), len(miner.templates))
+    )
+    unknown_lines = set()
 
-    for line1 in set(all_items):
-        test_instance.log.info("Checking:{}".format(line1))
-        new_fail_found = False
-        found_it = False
-        if not baseline_dict:
-            break
-        for basekey in baseline_dict:
-            if (
-                case
-                and baseline_dict[basekey].get("cases")
-                and case not in baseline_dict[basekey].get("cases")
-            ):
+    for template in miner.templates:
+        test_instance.log.info(
+            "Checking {} items like:{}\nexamples:{}".format(
+                template.count, template.template, template.examples
+            )
+        )
+        for line1 in template.lines:
+            new_fail_found = False
+            found_it = False
+            if not baseline_dict:
+                unknown_lines.add(line1)
                 continue
             # this round go through with regex
-            for sub_basekey_content in baseline_dict[basekey]["content"].split(";"):
-                if sub_basekey_content and re.search(sub_basekey_content, line1):
-                    found_it = True
-                    matched_msg = basekey
-                    test_instance.log.info("regex found in baseline:{}".format(basekey))
-                    break
-        if not found_it:
-            # this round compare the content
-            # compare 2 strings, if similary over pass_rate, consider it as same.
-            pass_rate = 70
-            for basekey in baseline_dict:
-                if (
-                    case
-                    and baseline_dict[basekey].get("cases")
-                    and case not in baseline_dict[key].get("cases")
-                ):
-                    continue
-                line1_tmp = line1
-                line2_tmp = baseline_dict[basekey]["content"]
-                line1_tmp, line2_tmp = clean_sentence(
-                    test_instance, line1_tmp, line2_tmp
-                )
-                seq = difflib.SequenceMatcher(None, a=line1_tmp, b=line2_tmp)
-                same_rate = seq.ratio() * 100
-                if same_rate > pass_rate:
+            matched_msg = index.match(line1, case=case)
+            if matched_msg:
+                found_it = True
+                test_instance.log.info("regex found in baseline:{}".format(matched_msg))
+            if not found_it:
+                # this round compare the content
+                # compare 2 strings, if similary over pass_rate, consider it as same.
+                matched_msg, same_rate = index.similar(line1, case=case)
+                if matched_msg:
                     test_instance.log.info(
                         "content similar rate:{} over {} baseline:{}".format(
-                            same_rate, pass_rate, basekey
+                            same_rate, baseline.SIMILAR_RATE, matched_msg
                         )
                     )
-                    matched_msg = basekey
                     found_it = True
-                    break
-        if found_it:
+            if not found_it:
+                unknown_lines.add(line1)
+                continue
             basekey = matched_msg
             if baseline_dict[basekey]["status"] != "active":
                 test_instance.log.info(
@@ -2122,13 +3504,16 @@ def find_word(
                 )
                 new_fail_found = True
             trigger = baseline_dict[basekey]["trigger"]
-            if trigger and re.search(trigger, check_str, flags=re.I):
+            if triggers_found is not None:
+                trigger_found = trigger in triggers_found
+            else:
+                trigger_found = trigger and re.search(trigger, check_str, flags=re.I)
+            if trigger and trigger_found:
                 test_instance.log.info(
                     "Guess it is expected because trigger keywords found '{}'".format(
                         trigger
                     )
                 )
-                remain_items.remove(line1)
             elif trigger:
                 test_instance.log.info(
                     "Guess it is unexpected because trigger keywords not found '{}'".format(
@@ -2136,12 +3521,20 @@ def find_word(
                     )
                 )
                 new_fail_found = True
-            elif not trigger and not new_fail_found:
-                remain_items.remove(line1)
+                unknown_lines.add(line1)
+            elif new_fail_found:
+                unknown_lines.add(line1)
             test_instance.log.info(baseline_dict[basekey])
-            continue
+    # unknown lines are shown by their templates with counts
+    remain_miner = log_template.TemplateMiner()
+    for item in all_items:
+        if item in unknown_lines:
+            remain_miner.add(item)
+    remain_items = [str(i) for i in remain_miner.templates]
     if remain_items:
-        test_instance.log.info("Below items are unknow!\n{}".format(remain_items))
+        test_instance.log.info(
+            "Below items are unknow!\n{}".format("\n".join(remain_items))
+        )
         new_fail_found = True
 
     return new_fail_found, remain_items
@@ -2149,7 +3542,11 @@ def find_word(
 
 def get_product_id(test_instance):
     cmd = "source /etc/os-release ;echo $VERSION_ID"
-    product_id = run_cmd(test_instance, cmd, expect_ret=0, msg="check release name")
+    product_id = get_fact(
+        test_instance,
+        "os_release:VERSION_ID",
+        lambda: run_cmd(test_instance, cmd, expect_ret=0, msg="check release name"),
+    )
     test_instance.log.info("Get product id: {}".format(product_id))
     return product_id
 
@@ -2157,8 +3554,15 @@ def get_product_id(test_instance):
 def get_os_release_info(test_instance, field="VERSION_ID"):
     data_file = "/etc/os-release"
     cmd = "source {} ;echo ${}".format(data_file, field)
-    output = run_cmd(
-        test_instance, cmd, expect_ret=0, msg="get {} from {}".format(field, data_file)
+    output = get_fact(
+        test_instance,
+        "os_release:{}".format(field),
+        lambda: run_cmd(
+            test_instance,
+            cmd,
+            expect_ret=0,
+            msg="get {} from {}".format(field, data_file),
+        ),
     )
     test_instance.log.info("Got: {}".format(output))
     return output.strip("\n")
@@ -2196,11 +3600,12 @@ def set_service(
                 "msg": "enable and start {}".format(service),
             },
         ]
-    for cmd in cmd_dict:
-        if check_ret:
+    if check_ret:
+        # a failed cmd fails the case before the next cmds run
+        for cmd in cmd_dict:
             run_cmd(test_instance, cmd["cmd"], expect_ret=0, msg=cmd["msg"])
-        else:
-            run_cmd(test_instance, cmd["cmd"], msg=cmd["msg"])
+    else:
+        run_cmds(test_instance, cmd_dict)
 
 
 def wait_for(
@@ -2384,6 +3789,7 @@ def check_attribute(target, attributes, test_instance=None, cancel_case=True):
     return True
 
 
+@TRACER.trace()
 def core_file_check(test_instance=None):
     """
     when there is core file exists, collect it to test result dir for further debugging
@@ -2392,40 +3798,14 @@ def core_file_check(test_instance=None):
     core_files = run_cmd(test_instance, cmd, msg="check if core file exists")
     if "No such file or directory" not in core_files:
         test_instance.log.info("Please attached core files when report bugs")
-        for core_file in core_files.split("\n"):
-            core_file = core_file.strip("\n")
-            if not core_file:
-                continue
-            cmd = "sudo chmod 766 {}".format(core_file)
-            run_cmd(test_instance, cmd, expect_ret=0)
-            if test_instance.params.get("remote_node") is not None:
-                test_instance.log.info(
-                    "retrive {} from remote to {}".format(
-                        core_file, test_instance.log_dir
-                    )
-                )
-                test_instance.SSH.get_file(
-                    rmt_file=core_file,
-                    local_file="{}/attachments/{}".format(
-                        test_instance.log_dir, os.path.basename(core_file)
-                    ),
-                )
-            else:
-                cmd = "cp {} {}/attachments/{}".format(
-                    core_file, test_instance.log_dir, os.path.basename(core_file)
-                )
-                run_cmd(
-                    test_instance,
-                    cmd,
-                    msg="save {} to {}".format(core_file, test_instance.log_dir),
-                )
+        fetch_files(test_instance, [i.strip() for i in core_files.split("\n") if i.strip()])
         run_cmd(
             test_instance,
             "sudo rm -rf /var/lib/systemd/coredump/core*",
             msg="clean up core files",
         )
         cmd = "sudo journalctl -b0"
-        run_cmd(test_instance, cmd, msg="get traceback from journal")
+        run_cmd(test_instance, cmd, msg="get traceback from journal", stream=True)
 
 
 def get_test_disk(test_instance=None):
@@ -2433,12 +3813,16 @@ def get_test_disk(test_instance=None):
     Look for non-boot disk to do test
     """
     test_disk = None
-    cmd = "lsblk -r --output NAME,MOUNTPOINT|awk -F' ' '{if($2) printf\"%s \",$1}'"
-    output = run_cmd(test_instance, cmd, expect_ret=0)
+    cmds = [
+        {
+            "cmd": "lsblk -r --output NAME,MOUNTPOINT|awk -F' ' '{if($2) printf\"%s \",$1}'",
+            "expect_ret": 0,
+        },
+        {"cmd": "lsblk -d --output NAME|grep -v NAME", "expect_ret": 0},
+    ]
+    (_, output), (_, disk_output) = run_cmds(test_instance, cmds)
     mount_disks = output.split(" ")
-    cmd = "lsblk -d --output NAME|grep -v NAME"
-    output = run_cmd(test_instance, cmd, expect_ret=0)
-    disk_list = output.split("\n")
+    disk_list = disk_output.split("\n")
     for disk in disk_list:
         disk_in_use = False
         if not disk:
@@ -2496,9 +3880,7 @@ def fips_enable(test_instance=None):
     if not test_instance.is_rmt:
         test_instance.log.info("run locally, please reboot system to take effect")
         return False
-    run_cmd(test_instance, "sudo reboot", msg="reboot system under test")
-    time.sleep(10)
-    init_connection(test_instance, timeout=test_instance.ssh_timeout)
+    reboot_and_wait(test_instance, msg="reboot system under test")
     run_cmd(test_instance, "cat /proc/cmdline", expect_kw="fips=1")
     return True
 
@@ -2527,9 +3909,7 @@ def fips_disable(test_instance=None):
     if not test_instance.is_rmt:
         test_instance.log.info("run locally, please reboot system to take effect")
         return False
-    run_cmd(test_instance, "sudo reboot", msg="reboot system under test")
-    time.sleep(10)
-    init_connection(test_instance, timeout=test_instance.ssh_timeout)
+    reboot_and_wait(test_instance, msg="reboot system under test")
     run_cmd(test_instance, "cat /proc/cmdline", expect_not_kw="fips=1")
     return True
 
@@ -2607,9 +3987,7 @@ Operation not permitted" When using secure boot"""
         test_instance.log.info("run locally, please reboot system to take effects")
         return False
 
-    run_cmd(test_instance, "sudo reboot", msg="reboot OS to take debug kernel effects")
-    time.sleep(60)
-    init_connection(test_instance, timeout=test_instance.ssh_timeout)
+    reboot_and_wait(test_instance, msg="reboot OS to take debug kernel effects")
     run_cmd(test_instance, "uname -r", expect_kw="debug")
     run_cmd(test_instance, "cat /proc/cmdline", expect_kw="kmemleak=on")
     return True
@@ -2678,11 +4056,7 @@ def debugkernel_disable(test_instance=None):
         test_instance.log.info("run locally, please reboot system to take effects")
         return False
 
-    run_cmd(
-        test_instance, "sudo reboot", msg="reboot OS to take default kernel effects"
-    )
-    time.sleep(60)
-    init_connection(test_instance, timeout=test_instance.ssh_timeout)
+    reboot_and_wait(test_instance, msg="reboot OS to take default kernel effects")
     run_cmd(test_instance, "uname -r", expect_not_kw="debug")
     run_cmd(test_instance, "cat /proc/cmdline", expect_not_kw="kmemleak=on")
     return True
@@ -2869,10 +4243,15 @@ def collect_basic_info(test_instance=None, rmt_node=None, vm=None):
     """
     Collect baisc information of system.
     """
-    run_cmd(test_instance, "sudo rpm -qa | grep -E 'kernel|grub|cloud-init'")
-    run_cmd(test_instance, "sudo ls /boot/grub2/")
-    run_cmd(test_instance, "sudo uname -r")
-    run_cmd(test_instance, "sudo fdisk -l")
+    run_cmds(
+        test_instance,
+        [
+            "sudo rpm -qa | grep -E 'kernel|grub|cloud-init'",
+            "sudo ls /boot/grub2/",
+            "sudo uname -r",
+            "sudo fdisk -l",
+        ],
+    )
 
 
 def configure_repo(
@@ -2950,16 +4329,13 @@ sslverify=0
 
 def save_file(test_instance, file_dir=None, file_name=None, rmt_node=None, vm=None):
     saved_file = file_dir + file_name
-    if test_instance.params["remote_nodes"] is not None:
-        cmd = "sudo cp {} /tmp/".format(saved_file)
-        run_cmd(test_instance, cmd, msg="Prepare for saving {}".format(saved_file))
-        test_instance.SSH.get_file(
-            rmt_file="/tmp/{}".format(file_name),
-            local_file="{}/attachments/{}".format(test_instance.log_dir, file_name),
-        )
-    else:
-        cmd = "sudo cp {} {}/attachments/".format(saved_file, test_instance.log_dir)
-        run_cmd(test_instance, cmd, msg="Save {}".format(saved_file))
+    test_instance.log.info("Save {}".format(saved_file))
+    fetch_files(
+        test_instance,
+        {saved_file: "{}/attachments/{}".format(test_instance.log_dir, file_name)},
+        rmt_node=rmt_node,
+        vm=vm,
+    )
 
 
 def determine_architecture(test_instance):
@@ -1,8 +1,9 @@
-import copy
 import logging
 import os
 import re
+import socket
 import sys
+import time
 import unittest
 import uuid
 from itertools import chain
@@ -12,13 +13,19 @@ from yaml import dump, load
 
 import os_tests
 from os_tests.libs import utils_lib
-from os_tests.libs.html_runner import HTMLTestRunner
+from os_tests.libs.case_index import CaseIndex
+from os_tests.libs.case_queue import POLL_INTERVAL, CaseQueue, LeasedCases
+from os_tests.libs.duration_db import DurationDB
+from os_tests.libs.html_runner import HTMLTestRunner, ResultSummary, write_reports
 from os_tests.libs.utils_lib import (
+    bind_case,
     filter_case_doc,
     get_cfg,
     init_args,
     init_provider,
     init_ssh,
+    init_workers,
+    load_resources,
     update_cfgs,
 )
 
@@ -32,6 +39,92 @@ log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 
 
+def run_coordinator(params, case_name_list):
+    """
+    Share cases with workers through a queue file, and merge their results into
+    sum.html and sum.xml when all cases are done.
+    """
+    results_dir = params["results_dir"]
+    queue_file = os.path.realpath(
+        params.get("queue") or os.path.join(results_dir, "queue.db")
+    )
+    if os.path.exists(queue_file):
+        os.unlink(queue_file)
+    duration_db = DurationDB(params)
+    case_queue = CaseQueue(queue_file)
+    case_queue.init_cases(
+        sorted(case_name_list, key=duration_db.estimate, reverse=True)
+    )
+    log.info(
+        "{} cases queued, start workers by: os-tests worker --queue {} [platform options]".format(
+            len(case_name_list), queue_file
+        )
+    )
+    start_time = time.time()
+    last_num = None
+    while True:
+        case_queue.reclaim()
+        num = case_queue.count()
+        if num != last_num:
+            log.info(
+                "pending:{} leased:{} done:{}".format(
+                    num.get("pending", 0), num.get("leased", 0), num.get("done", 0)
+                )
+            )
+            last_num = num
+        if not num.get("pending") and not num.get("leased"):
+            break
+        time.sleep(POLL_INTERVAL)
+    test_result_summary = ResultSummary()
+    test_result_summary.comment = params.get("comment")
+    sum_dir = os.path.join(results_dir, "results")
+    os.makedirs(sum_dir, exist_ok=True)
+    with open(os.path.join(sum_dir, "sum.log"), "w") as fh:
+        for i, (row, worker_results_dir) in enumerate(case_queue.results(), 1):
+            row[0] = i
+            if worker_results_dir:
+                # debug log is relative to the results dir of worker
+                row[5] = os.path.relpath(
+                    os.path.join(worker_results_dir, "results", row[5]), sum_dir
+                )
+                node_info_file = os.path.join(worker_results_dir, "attachments/node_info")
+                if not test_result_summary.node_info and os.path.exists(node_info_file):
+                    with open(node_info_file) as node_fh:
+                        test_result_summary.node_info = node_fh.read()
+            test_result_summary.add_case(row)
+            fh.write("case: {} - {}\n".format(row[1], row[2]))
+            if row[3]:
+                fh.write("info: {}\n".format(row[3]))
+    test_result_summary.run_time = round(time.time() - start_time, 3)
+    write_reports(results_dir, test_result_summary)
+    log.info(
+        "Total:{} PASS:{} FAIL:{} ERROR:{} SKIP:{}".format(
+            test_result_summary.total,
+            test_result_summary.case_pass,
+            test_result_summary.case_fail,
+            test_result_summary.case_error,
+            test_result_summary.case_skip,
+        )
+    )
+
+
+def cleanup_resources(params, resources):
+    for res in resources:
+        if params.get("no_cleanup"):
+            log.info(
+                "skipped resource cleanup because --no-cleanup found, please release resources manually"
+            )
+            for i in resources:
+                if i.id:
+                    log.info(i.id)
+            break
+        if hasattr(res, "exists"):
+            if res.exists():
+                res.delete()
+        elif hasattr(res, "is_exist") and res.is_exist():
+            res.delete()
+
+
 def main():
     args = init_args()
     params = get_cfg()
@@ -46,7 +139,13 @@ def main():
             provider_data = get_cfg(cfg_file=args.platform_profile)
             update_cfgs(params, provider_data)
         update_cfgs(params, vars(args))
-        if not args.is_listcase and not args.verifydoc and not args.dumpdoc:
+        if (
+            not args.is_listcase
+            and not args.verifydoc
+            and not args.dumpdoc
+            and not args.estimate
+            and args.mode != "coordinator"
+        ):
             vms, disks, nics = init_provider(params=params)
     update_cfgs(params, vars(args))
 
@@ -56,8 +155,24 @@ def main():
 
     is_rmt = bool(args.remote_nodes or vms)
 
+    if params.get("resume"):
+        params["results_dir"] = params["resume"]
+    worker_name = "{}-{}".format(socket.gethostname(), os.getpid())
+    if params.get("mode") == "worker":
+        if not params.get("queue") or not os.path.exists(params.get("queue")):
+            log.info("please specify the queue file of coordinator by --queue")
+            sys.exit(1)
+        # workers save results under the results dir of coordinator by default
+        params["results_dir"] = args.results_dir or os.path.join(
+            os.path.dirname(os.path.realpath(params["queue"])), "workers", worker_name
+        )
     results_dir = params["results_dir"]
-    if os.path.exists(results_dir) and not params.get("is_listcase"):
+    if (
+        os.path.exists(results_dir)
+        and not params.get("is_listcase")
+        and not params.get("estimate")
+        and not params.get("resume")
+    ):
         rmtree(results_dir)
         log.info("saving results to {}".format(results_dir))
     os_tests_dir = os.path.dirname(__file__)
@@ -102,79 +217,102 @@ def main():
     utils_dir = os.path.dirname(base_dir) + "/utils"
     data_dir = os.path.dirname(base_dir) + "/data"
 
-    ts = unittest.defaultTestLoader.discover(
+    def setup_case(case):
+        case.is_rmt = is_rmt
+        case.params = params
+        case.run_uuid = params.get("run_uuid")
+        case.utils_dir = utils_dir
+        case.data_dir = data_dir
+
+    if params.get("mode") == "worker":
+        workers = init_workers(
+            params=params, vms=vms, disks=disks, nics=nics, sshs=sshs
+        )
+        leased_cases = LeasedCases(
+            params["queue"], name=worker_name, setup_case=setup_case
+        )
+        try:
+            HTMLTestRunner(verbosity=2).run(
+                None, workers=workers, case_queue=leased_cases
+            )
+        finally:
+            leased_cases.stop()
+        resources = []
+        for worker in workers:
+            resources.extend(chain(worker["vms"], worker["disks"], worker["nics"]))
+        cleanup_resources(params, resources)
+        return
+
+    # select cases from the index of case docs, test modules are not imported
+    case_index = CaseIndex(
         start_dir=os_tests_dir,
         pattern="test_*.py",
         top_level_dir=os.path.dirname(os_tests_dir),
     )
-    tmp_ts = copy.deepcopy(ts)
-    final_ts = unittest.TestSuite()
-    tests_list = []
-    for ts1 in tmp_ts:
-        if len(ts1._tests) > 0:
-            for ts2 in ts1._tests:
-                try:
-                    for case in ts2._tests:
-                        case.is_rmt = is_rmt
-                        case.params = params
-                        case.run_uuid = params.get("run_uuid")
-                        case.utils_dir = utils_dir
-                        case.data_dir = data_dir
-                        case.SSHs = sshs
-                        case.SSH = case.SSHs and case.SSHs[0] or None
-                        case.vms = vms
-                        case.vm = case.vms and vms[0] or None
-                        case.disks = disks
-                        case.disk = case.disks and disks[0] or None
-                        case.nics = nics
-                        case.nic = case.nics and nics[0] or None
-                        if filter_case_doc(
-                            case=case,
-                            patterns=test_patterns,
-                            skip_patterns=skip_patterns,
-                            filter_field=params.get("filter_by"),
-                            strict=params.get("is_strict"),
-                            verify_doc=params.get("verifydoc"),
-                        ):
-                            tests_list.append(case)
-                except Exception as err:
-                    log.info("Cannot handle ts discovered:{}".format(ts2))
-                    log.info(err)
+    case_name_list = case_index.filter(
+        patterns=test_patterns,
+        skip_patterns=skip_patterns,
+        filter_field=params.get("filter_by"),
+        strict=params.get("is_strict"),
+    )
+    if params.get("select"):
+        try:
+            selected = set(case_index.query(params.get("select")))
+        except ValueError as err:
+            log.info(err)
+            sys.exit(1)
+        case_name_list = [i for i in case_name_list if i in selected]
+    # cases of modules which cannot be imported cannot run, leave them out
+    case_name_list = case_index.get_loadable(case_name_list)
     # sort cases following the patterns specified order
     if test_patterns and "case_name" in params.get("filter_by"):
-        sorted_tests = []
+        sorted_names = []
         for pattern in test_patterns.split(","):
-            for case in tests_list:
+            for case_name in case_name_list:
                 if (
-                    re.match(".*{}.*".format(pattern), case.id(), re.IGNORECASE)
-                    and case not in sorted_tests
+                    re.match(".*{}.*".format(pattern), case_name, re.IGNORECASE)
+                    and case_name not in sorted_names
                 ):
-                    sorted_tests.append(case)
-        tests_list = sorted_tests
-    final_ts.addTests(tests_list)
-    if final_ts.countTestCases() == 0:
+                    sorted_names.append(case_name)
+        case_name_list = sorted_names
+    resources = list(chain(vms, disks, nics))
+    if not case_name_list:
         log.info("No case found!")
         sys.exit(1)
+    final_ts = unittest.TestSuite()
+    if params.get("verifydoc") or not (
+        params.get("is_listcase")
+        or params.get("dumpdoc")
+        or params.get("estimate")
+        or params.get("mode") == "coordinator"
+    ):
+        default_worker = {
+            "name": None,
+            "params": params,
+            "vms": vms,
+            "disks": disks,
+            "nics": nics,
+            "SSHs": sshs,
+        }
+        # only the modules of selected cases are imported
+        for case_name in case_name_list:
+            for case in unittest.defaultTestLoader.loadTestsFromName(case_name):
+                if case.id() != case_name:
+                    log.info("Cannot load case:{}".format(case_name))
+                    continue
+                setup_case(case)
+                bind_case(case, default_worker)
+                if params.get("verifydoc"):
+                    filter_case_doc(case=case, verify_doc=True)
+                final_ts.addTest(case)
     if params.get("is_listcase") or params.get("verifydoc") or params.get("dumpdoc"):
         if params.get("dumpdoc"):
             tmp_yaml_data = {}
-            for case in final_ts:
-                yaml_data = {}
-                try:
-                    src_content = case._testMethodDoc
-                    yaml_data = load(src_content, Loader=Loader)
-                    if not hasattr(yaml_data, "get"):
-                        yaml_data = {}
-                        yaml_data["description"] = src_content
-                except Exception as err:
-                    yaml_data["doc_yaml_err"] = str(err)
-                    yaml_data["description"] = src_content
-                yaml_data["case_name"] = case.id()
-                tmp_yaml_data[case.id()] = yaml_data
+            for case_name in case_name_list:
+                tmp_yaml_data[case_name] = case_index.cases[case_name]["doc"]
             with open(params.get("dumpdoc"), "w") as fh:
                 dump(tmp_yaml_data, fh)
                 log.info("Saved casesdoc to {}".format(params.get("dumpdoc")))
-        case_name_list = [case.id() for case in final_ts]
         log.info(
             "\n".join(
                 [
@@ -187,24 +325,52 @@ def main():
                 ]
             )
         )
-        log.info("Total case num: %s" % final_ts.countTestCases())
+        log.info("Total case num: %s" % len(case_name_list))
+    elif params.get("mode") == "coordinator":
+        run_coordinator(params, case_name_list)
+    elif params.get("estimate"):
+        duration_db = DurationDB(params)
+        workers = int(params.get("workers") or 1)
+        channels = int(params.get("channels") or 1)
+        if params.get("case_setup") or params.get("case_post"):
+            channels = 1
+        for case_name in case_name_list:
+            log.info("{} - {}s".format(case_name, duration_db.estimate(case_name)))
+        if channels > 1:
+            concurrent_cases = [
+                case_name
+                for case_name in case_name_list
+                if utils_lib.get_case_impact(
+                    case_doc=case_index.cases[case_name]["doc"]
+                )
+                == "none"
+            ]
+            serial_cases = [i for i in case_name_list if i not in concurrent_cases]
+            wall_time = duration_db.predict(
+                concurrent_cases, workers * channels
+            ) + duration_db.predict(serial_cases, workers)
+        else:
+            wall_time = duration_db.predict(case_name_list, workers)
+        log.info(
+            "Total case num: {}, serial time: {}s, predicted wall time with {} workers {} channels: {}s".format(
+                len(case_name_list),
+                round(duration_db.predict(case_name_list)),
+                workers,
+                channels,
+                round(wall_time),
+            )
+        )
     else:
-        HTMLTestRunner(verbosity=2).run(final_ts)
+        workers = init_workers(
+            params=params, vms=vms, disks=disks, nics=nics, sshs=sshs
+        )
+        if params.get("resume"):
+            load_resources(results_dir, workers)
+        HTMLTestRunner(verbosity=2).run(final_ts, workers=workers)
+        for worker in workers[1:]:
+            resources.extend(chain(worker["vms"], worker["disks"], worker["nics"]))
 
-    for res in chain(vms, disks, nics):
-        if params.get("no_cleanup"):
-            log.info(
-                "skipped resource cleanup because --no-cleanup found, please release resources manually"
-            )
-            for i in chain(vms, disks, nics):
-                if i.id:
-                    log.info(i.id)
-            break
-        if hasattr(res, "exists"):
-            if res.exists():
-                res.delete()
-        elif hasattr(res, "is_exist") and res.is_exist():
-            res.delete()
+    cleanup_resources(params, resources)
 
 
 if __name__ == "__main__":
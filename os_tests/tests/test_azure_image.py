@@ -69,11 +69,7 @@ class TestAzureImage(unittest.TestCase):
                     src_file = src_file.replace("_rhel{}".format(project), "_rhel8")
             # Get the base file path
             # If remote node, copy the basefile to the remote node /tmp/
-            if self.params.get('remote_node') is not None:
-                base_file = "/tmp/"+basefile
-                self.SSH.put_file(local_file=src_file, rmt_file=base_file)
-            else:
-                base_file = src_file
+            base_file = utils_lib.sync_files(self, src_file)
             test_file = testfile
         # If base is a block of strings
         elif expected:
@@ -522,7 +518,7 @@ hypervkvpd,hyperv-daemons-license,hypervfcopyd,hypervvssd,hyperv-daemons'''
         '''
         check unsatisfied dependencies of pkg.
         '''
-        utils_lib.run_cmd(self, "sudo rpm -Va", expect_not_kw='Unsatisfied', timeout=300, msg='check unsatisfied dependencies of pkg')
+        utils_lib.run_cmd(self, "sudo rpm -Va", expect_not_kw='Unsatisfied', timeout=300, msg='check unsatisfied dependencies of pkg', stream=True)
 
     def test_check_selinux(self):
         '''
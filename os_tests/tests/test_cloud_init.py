@@ -596,9 +596,7 @@ grep -Pzv "stages.py\\",\s+line\s+[1088|1087]|util.py\\",\s+line\s+[399|400]"'''
             self.skipTest('modify disk size func is not supported in {}'.format(self.vm.provider))
         except Exception as err:
             self.skipTest('Cannot modify disk size:{}'.format(self.vm.provider, err))
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=1200)
+        utils_lib.reboot_and_wait(self, timeout=1200, msg='reboot system under test')
         boot_dev = self._get_boot_temp_devices()
         partition = utils_lib.run_cmd(self,
             "find /dev/ -name {}[0-9]|sort|tail -n 1".format(boot_dev)).replace('\n', '')
@@ -1393,7 +1391,7 @@ EOF""".format(device, size), expect_ret=0)
         # 3. Run module ssh
         utils_lib.run_cmd(self, "sudo cloud-init single -n ssh")
         # 4. Verify can login
-        utils_lib.init_connection(self, timeout=20)
+        utils_lib.init_connection(self, timeout=20, force=True)
         output=utils_lib.run_cmd(self, "whoami", expect_ret=0)
         self.assertEqual(
             self.vm.vm_username, output.rstrip('\n'),
@@ -1776,7 +1774,7 @@ ssh_pwauth: True
         before = utils_lib.run_cmd(self, 'last reboot --time-format full')
         utils_lib.run_cmd(self, 'sudo reboot')
         time.sleep(sleeptime)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.init_connection(self, timeout=self.ssh_timeout, force=True)
         output = utils_lib.run_cmd(self, 'whoami')
         self.assertEqual(
             self.vm.vm_username, output.strip(),
@@ -2745,9 +2743,7 @@ ssh_pwauth: True '''.format(**pw_config_dict)
         utils_lib.run_cmd(self, "sudo rm -rf /var/lib/cloud/instance /var/lib/cloud/instances/* /var/log/cloud-init.log")
         # Restart VM
         # self.vm.reboot(wait=True)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(30)
-        utils_lib.init_connection(self, timeout=1200)
+        utils_lib.reboot_and_wait(self, timeout=1200, msg='reboot system under test')
         # Verify cloud-init.log
         utils_lib.run_cmd(self, "sudo grep 'Permission denied' /var/log/cloud-init.log",expect_ret=1, msg="BZ#1857309. Should not have 'Permission denied'")
 
@@ -2817,9 +2813,7 @@ ssh_pwauth: True '''.format(**pw_config_dict)
             self.log.info(err)
         # Restart VM and verify connection
         # self.vm.reboot(wait=True)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(30)
-        utils_lib.init_connection(self, timeout=1200)
+        utils_lib.reboot_and_wait(self, timeout=1200, msg='reboot system under test')
         #saw activating (start) in CI log, change to loop check.
         for count in utils_lib.iterate_timeout(
             60, "check cloud-final status", wait=10):
@@ -3034,9 +3028,7 @@ ssh_pwauth: True '''.format(**pw_config_dict)
         cmd = 'sudo rm /run/cloud-init/ /var/lib/cloud/* -rf'
         utils_lib.run_cmd(self, cmd, msg='clean cloud-init and redo it')
         #self.vm.reboot()
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(20)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
         cmd = 'cat /etc/sysconfig/network'
         output = utils_lib.run_cmd(self, cmd, msg="New network configuration.")
         if "NETWORKING_IPV6=no" in output:
@@ -3373,7 +3365,7 @@ EOF
                 time.sleep(30)
             self.vm.create()
             time.sleep(30)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.init_connection(self, timeout=self.ssh_timeout, force=True)
             output = utils_lib.run_cmd(self, 'whoami').rstrip('\n')
             self.assertEqual(
                 self.vm.vm_username, output,
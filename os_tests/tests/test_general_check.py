@@ -26,17 +26,7 @@ class TestGeneralCheck(unittest.TestCase):
                 utils_lib.run_cmd(self, cmd, msg="verify pkgs", timeout=600)
                 self.output = utils_lib.run_cmd(self, 'cat {}'.format(rpm_V_file), expect_ret=0, msg="check if output exists again")
         if any(x in self.id().lower() for x in ['systemd_analyze_verify', 'journalctl_service_unknown']):    
-            check_file = self.utils_dir + '/systemd_analyze_services.sh'
-            check_file_tmp = '/tmp/systemd_analyze_services.sh'
-            if self.params.get('remote_node') is not None:
-                cmd = 'ls -l {}'.format(check_file_tmp)
-                ret = utils_lib.run_cmd(self, cmd, ret_status=True, msg='check if {} exists'.format(check_file))
-                if ret != 0:
-                    self.SSH.put_file(local_file=check_file, rmt_file=check_file_tmp)
-            else:
-                cmd = 'sudo cp -f {} {}'.format(check_file,check_file_tmp)
-                utils_lib.run_cmd(self, cmd)
-            check_file = check_file_tmp
+            check_file = utils_lib.sync_files(self, 'utils/systemd_analyze_services.sh')
             utils_lib.run_cmd(self, 'sudo chmod 755 {}'.format(check_file))
             utils_lib.run_cmd(self, 'sudo ls -l {}'.format(check_file))
             self.systemd_analyze_verify_file = '/tmp/{}_systemd_analyze_verify.log'.format(self.run_uuid)
@@ -49,6 +39,8 @@ class TestGeneralCheck(unittest.TestCase):
             test_check_avclog
         component:
             selinux-policy
+        disruptive:
+            none
         bugzilla_id:
             N/A
         maintainer:
@@ -74,6 +66,8 @@ class TestGeneralCheck(unittest.TestCase):
             test_check_avclog_nfs
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             1771856
         is_customer_case:
@@ -129,6 +123,8 @@ class TestGeneralCheck(unittest.TestCase):
             test_check_available_clocksource
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1726487
         is_customer_case:
@@ -185,6 +181,8 @@ available_clocksource'
             test_check_boot_time
         component:
             rng-tools
+        disruptive:
+            none
         bugzilla_id:
             1776710
         is_customer_case:
@@ -213,6 +211,8 @@ available_clocksource'
             test_check_dmesg_error
         component:
             kernal
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -238,6 +238,8 @@ available_clocksource'
             test_check_dmesg_fail
         component:
             kernal
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -263,6 +265,8 @@ available_clocksource'
             test_check_dmesg_warn
         component:
             kernal
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -288,6 +292,8 @@ available_clocksource'
             test_check_dmesg_unable
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1779454
         is_customer_case:
@@ -314,6 +320,8 @@ available_clocksource'
             test_check_dmesg_calltrace
         component:
             kernel
+        disruptive:
+            none
         bug_id:
             bugzilla_1777179,bugzilla_1627644,bugzilla_2091523,jira_RHEL-21709
         is_customer_case:
@@ -339,6 +347,8 @@ available_clocksource'
             os_tests.tests.test_general_check.TestGeneralCheck.test_check_dmesg_unknownsymbol
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1649215, 2018886
         customer_case_id:
@@ -369,6 +379,8 @@ available_clocksource'
             1
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1917824
         customer_case_id:
@@ -399,6 +411,8 @@ available_clocksource'
             2
         component:
             dmidecode
+        disruptive:
+            config
         bugzilla_id:
             1885823
         customer_case_id:
@@ -419,7 +433,7 @@ available_clocksource'
             binfile = '/tmp/dmidecode_debug.bin'
             cmd = "sudo dmidecode --dump-bin {}".format(binfile)
             utils_lib.run_cmd(self, cmd, msg='save dmidecode_debug.bin for debug purpose, please attach it if file bug')
-            self.SSH.get_file(rmt_file=binfile,local_file='{}/attachments/dmidecode_debug.bin'.format(self.log_dir))
+            utils_lib.fetch_files(self, [binfile])
         else:
             cmd = "sudo dmidecode --dump-bin {}/attachments/dmidecode_debug.bin".format(self.log_dir)
             utils_lib.run_cmd(self, cmd, msg='save dmidecode_debug.bin for debug purpose, please attach it if file bug')
@@ -432,6 +446,8 @@ available_clocksource'
             test_check_dmidecode_outofspec
         component:
             dmidecode
+        disruptive:
+            config
         bugzilla_id:
             1858350
         maintainer:
@@ -459,6 +475,8 @@ available_clocksource'
             test_check_cpu_vulnerabilities
         component:
             kenel
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -552,6 +570,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             1661977
         polarion_id:
@@ -609,6 +629,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_journal_calltrace
         component:
             Operations
+        disruptive:
+            none
         bugzilla_id:
             1801999,1736818
         is_customer_case:
@@ -634,6 +656,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             2
         component:
             journal
+        disruptive:
+            none
         bugzilla_id:
             1975897,2026544,2022432
         is_customer_case:
@@ -659,6 +683,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             2
         component:
             journal
+        disruptive:
+            none
         bugzilla_id:
             
         customer_case_id:
@@ -684,6 +710,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             2
         component:
             journal
+        disruptive:
+            none
         bugzilla_id:
             1978507
         customer_case_id:
@@ -709,6 +737,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             os_tests.tests.test_general_check.TestGeneralCheck.test_check_journalctl_disabled
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             N/A
         customer_case_id:
@@ -735,6 +765,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_journalctl_dumpedcore
         component:
             sssd
+        disruptive:
+            none
         bugzilla_id:
             1797973,2027674
         is_customer_case:
@@ -759,6 +791,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_journalctl_error
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -787,6 +821,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1    
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1879368
         polarion_id:
@@ -810,6 +846,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             2
         component:
             journal
+        disruptive:
+            none
         bugzilla_id:
             1855252
         customer_case_id:
@@ -836,6 +874,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             2
         component:
             journal
+        disruptive:
+            none
         bugzilla_id:
             1978507
         customer_case_id:
@@ -859,6 +899,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_journalctl_warn
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             N/A
         is_customer_case:
@@ -885,6 +927,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_journalctl_invalid
         component:
             sg3_utils
+        disruptive:
+            none
         bugzilla_id:
             1750417
         is_customer_case:
@@ -914,6 +958,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             https://github.com/liangxiao1/os-tests/blob/master/os_tests/tests/test_general_check.py
         component:
             systemd
+        disruptive:
+            config
         bug_id:
             bugzilla_1871139,bugzilla_2115230,jira_RHEL-56860,jira_RHEL-57001
         customer_case_id:
@@ -945,6 +991,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1
         component:
             glibc
+        disruptive:
+            config
         bugzilla_id:
             2000878,2061604
         polarion_id:
@@ -988,6 +1036,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1
         component:
             lshw
+        disruptive:
+            config
         bugzilla_id:
             1882157
         polarion_id:
@@ -1041,6 +1091,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1
         component:
             util-linux
+        disruptive:
+            none
         bugzilla_id:
             1712768
         polarion_id:
@@ -1069,6 +1121,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             1
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             1551091
         polarion_id:
@@ -1095,6 +1149,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             https://github.com/virt-s1/os-tests/blob/master/os_tests/tests/test_general_check.py
         component:
             kernel
+        disruptive:
+            config
         bug_id:
             bugzilla_1656862,bugzilla_2173504
         polarion_id:
@@ -1168,6 +1224,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_memleaks
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             161666
         is_customer_case:
@@ -1250,6 +1308,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_microcode_load
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1607899
         is_customer_case:
@@ -1294,6 +1354,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_nouveau
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1349927, 1645772, jira_COMPOSER-1807
         is_customer_case:
@@ -1327,6 +1389,8 @@ itlb_multihit|grep -v 'no microcode'|grep -v retbleed|sed 's/:/^/' | column -t -
             test_check_nvme_io_timeout
         component:
             distribution
+        disruptive:
+            none
         bugzilla_id:
             1859088
         is_customer_case:
@@ -1363,6 +1427,8 @@ in cmdline as bug1859088")
             test_check_release_name
         component:
             ec2-images
+        disruptive:
+            none
         bugzilla_id:
             1852657
         is_customer_case:
@@ -1418,6 +1484,8 @@ in cmdline as bug1859088")
             1
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1773868
         polarion_id:
@@ -1439,6 +1507,8 @@ in cmdline as bug1859088")
             test_check_product_id
         component:
             ec2-images
+        disruptive:
+            none
         bugzilla_id:
             1938930
         is_customer_case:
@@ -1475,6 +1545,8 @@ in cmdline as bug1859088")
             1
         component:
             systemd
+        disruptive:
+            none
         bugzilla_id:
             1740443
         polarion_id:
@@ -1498,6 +1570,8 @@ in cmdline as bug1859088")
             1
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1741462
         polarion_id:
@@ -1522,6 +1596,8 @@ in cmdline as bug1859088")
             1
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1619602
         customer_case_id:
@@ -1547,6 +1623,8 @@ in cmdline as bug1859088")
             2
         component:
             systemd
+        disruptive:
+            config
         bugzilla_id:
             1974184
         customer_case_id:
@@ -1572,6 +1650,8 @@ in cmdline as bug1859088")
             https://github.com/liangxiao1/os-tests/blob/master/os_tests/tests/test_general_check.py
         component:
             systemd
+        disruptive:
+            config
         bugzilla_id:
             2016305
         customer_case_id:
@@ -1600,6 +1680,8 @@ in cmdline as bug1859088")
             2
         component:
             systemd
+        disruptive:
+            config
         bugzilla_id:
             1974108
         customer_case_id:
@@ -1640,9 +1722,11 @@ in cmdline as bug1859088")
             No ordering cycle found
         debug_want:
             # journalctl -b0
+        disruptive:
+            config
         '''
         cmd = 'sudo journalctl -b0'
-        utils_lib.run_cmd(self, cmd, expect_not_kw='ordering cycle', msg='Check there is no ordering cycle in journal log')
+        utils_lib.run_cmd(self, cmd, expect_not_kw='ordering cycle', msg='Check there is no ordering cycle in journal log', stream=True)
         utils_lib.run_cmd(self, 'cat {}'.format(self.systemd_analyze_verify_file),expect_ret=0, expect_not_kw='ordering cycle', msg='Check there is no ordering cycle which may block boot up')
 
     def test_check_systemd_analyze_verify_instead(self):
@@ -1671,6 +1755,8 @@ in cmdline as bug1859088")
             N/A
         component:
             systemd
+        disruptive:
+            config
         bug_id:
             bugzilla_2155468
         is_customer_case:
@@ -1704,6 +1790,8 @@ in cmdline as bug1859088")
             test_check_tsc_deadline_timer
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             1503160
         is_customer_case:
@@ -1750,6 +1838,8 @@ current_device"
             1
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             1893063
         polarion_id:
@@ -1778,6 +1868,8 @@ current_device"
             test_check_virtwhat
         component:
             virt-what
+        disruptive:
+            config
         bugzilla_id:
             1782435
         is_customer_case:
@@ -1844,6 +1936,8 @@ current_device"
             1
         component:
             rpm
+        disruptive:
+            config
         bugzilla_id:
             n/a
         customer_case_id:
@@ -1895,6 +1989,8 @@ current_device"
             test_check_rpm_V_efi
         component:
             efi-rpm-macros
+        disruptive:
+            config
         bug_id:
             bugzilla_1845052, jira_RHELPLAN-69739, jira_RHEL-54694
         is_customer_case:
@@ -1928,6 +2024,8 @@ current_device"
             1
         component:
             rpm
+        disruptive:
+            config
         bugzilla_id:
             n/a
         customer_case_id:
@@ -1962,6 +2060,8 @@ current_device"
             1
         component:
             kernel
+        disruptive:
+            config
         bugzilla_id:
             1889702
         polarion_id:
@@ -2028,12 +2128,7 @@ current_device"
                 expect_ret=0, expect_kw="tar.gz",
                 msg="please attach this archive if file bug", timeout=180)
         gz_file = re.findall('/var/cache/insights-client/.*tar.gz', out)[0]
-        file_name = gz_file.split('/')[-1]
-        if self.params.get('remote_node') is not None:
-            utils_lib.run_cmd(self, 'sudo cp {} /tmp/'.format(gz_file))
-            self.SSH.get_file(rmt_file='/tmp/{}'.format(file_name),local_file='{}/attachments/{}'.format(self.log_dir,file_name))
-        else:
-            utils_lib.run_cmd(self, 'sudo cp {} {}/attachments/'.format(gz_file, self.log_dir))
+        utils_lib.fetch_files(self, [gz_file])
         try:
             tmp_dict = json.loads(result_out)
             if len(tmp_dict) > 0:
@@ -2047,6 +2142,8 @@ current_device"
             test_check_sos_works
         component:
             sos
+        disruptive:
+            config
         bugzilla_id:
             1718087
         is_customer_case:
@@ -2070,13 +2167,7 @@ current_device"
         cmd = 'sudo ls /var/tmp/sos*.xz'
         sosfile = utils_lib.run_cmd(self, cmd, expect_ret=0)
         sosfile = sosfile.strip('\n')
-        cmd = 'sudo chmod 766 {}'.format(sosfile)
-        utils_lib.run_cmd(self, cmd, expect_ret=0)
-        if self.params.get('remote_node') is not None:
-            self.SSH.get_file(rmt_file=sosfile,local_file='{}/attachments/{}'.format(self.log_dir,os.path.basename(sosfile)))
-        else:
-            cmd = "cp {} {}/attachments/{}".format(sosfile, self.log_dir,os.path.basename(sosfile) )
-            utils_lib.run_cmd(self, cmd, msg='save {} to {}'.format(sosfile, self.log_dir))
+        utils_lib.fetch_files(self, [sosfile])
 
     def test_check_dmesg_sev(self):
         """
@@ -2086,6 +2177,8 @@ current_device"
             os_tests.tests.test_general_check.TestGeneralCheck.test_check_dmesg_sev
         component:
             kernel
+        disruptive:
+            none
         bugzilla_id:
             2103821
         customer_case_id:
@@ -2132,6 +2225,8 @@ current_device"
             os_tests.tests.test_general_check.test_check_secure_ioerror
         component:
             secure_log
+        disruptive:
+            config
         bugzilla_id:
             1103344
         is_customer_case:
@@ -373,14 +373,8 @@ int main(int argc, char *argv[])
             self.skipTest('skip when mem lower than 4GiB')
         utils_lib.is_cmd_exist(self, cmd='gcc', cancel_case=True)
         utils_lib.is_cmd_exist(self, cmd='wget', cancel_case=True)
-        redis_src = self.utils_dir + '/redis_8124.c'
-        redis_src_tmp = '/tmp/redis_8124.c'
-        if self.params.get('remote_node') is not None:
-            self.SSH.put_file(local_file=redis_src, rmt_file=redis_src_tmp)
-        else:
-            cmd = "sudo cp -f {} {}".format(redis_src, redis_src_tmp)
-            utils_lib.run_cmd(self, cmd, expect_ret=0, timeout=120)
-        cmd = 'gcc -o /tmp/os_tests_redis /tmp/redis_8124.c'
+        redis_src = utils_lib.sync_files(self, 'utils/redis_8124.c')
+        cmd = 'gcc -o /tmp/os_tests_redis {}'.format(redis_src)
         utils_lib.run_cmd(self, cmd, expect_ret=0, timeout=120)
         for i in [550, 1024, 2048]:
             cmd = "sudo systemd-run --scope -p MemoryLimit={}M /tmp/os_tests_redis".format(i)
@@ -880,9 +874,7 @@ RUN touch /tmp/test.txt
             if boot_param_required not in out:
                 cmd = 'sudo grubby --update-kernel=ALL --args="{}"'.format(boot_param_required)
                 utils_lib.run_cmd(self, cmd, msg="append {} to boot params".format(boot_param_required))
-                utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-                time.sleep(10)
-                utils_lib.init_connection(self, timeout=self.ssh_timeout)
+                utils_lib.reboot_and_wait(self, msg='reboot system under test')
         utils_lib.run_cmd(self, 'sudo lspci', msg="get pci list")
         tmp_pci = None
         cmd = "lspci|grep 'Non-Volatile memory'|wc -l"
@@ -84,6 +84,8 @@ class TestLifeCycle(unittest.TestCase):
             N/A
         component:
             component
+        disruptive:
+            reboot
         bug_id:
             bugzilla_1703366
         is_customer_case:
@@ -150,9 +152,7 @@ class TestLifeCycle(unittest.TestCase):
         if need_reboot:
             cmd = 'sudo grubby --update-kernel=ALL --args="kmemleak=on"'
             utils_lib.run_cmd(self, cmd, expect_ret=0, msg="enable kmemleak")
-            utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, msg='reboot system under test')
         utils_lib.run_cmd(self,
                     'uname -r',
                     expect_ret=0,
@@ -212,6 +212,8 @@ class TestLifeCycle(unittest.TestCase):
             n/a
         component:
             kernel
+        disruptive:
+            reboot
         bug_id:
             bugzilla_1787270, bugzilla_1973106
         is_customer_case:
@@ -254,9 +256,7 @@ class TestLifeCycle(unittest.TestCase):
                         timeout=600)
             cmd = 'sudo grubby --update-kernel=ALL --args="fips=1"'
             utils_lib.run_cmd(self, cmd, msg='Enable fips!', timeout=600)
-            utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, msg='reboot system under test')
             utils_lib.run_cmd(self, 'cat /proc/cmdline', expect_kw='fips=1')
             utils_lib.run_cmd(self, 'sudo dmesg', msg='save dmesg')
             cmd = 'sudo grubby --update-kernel=ALL  --remove-args="fips=1"'
@@ -269,9 +269,7 @@ class TestLifeCycle(unittest.TestCase):
                 cmd = 'sudo dnf remove kernel-debug -y'
                 utils_lib.run_cmd(self, cmd, msg='remove debug kernel to save space')
                 utils_lib.run_cmd(self, fips_enable_cmd, msg='Enable fips again!', timeout=600)
-            utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, msg='reboot system under test')
             utils_lib.run_cmd(self,
                         'sudo fips-mode-setup --check',
                         expect_kw='enabled')
@@ -306,6 +304,8 @@ class TestLifeCycle(unittest.TestCase):
             N/A
         component:
             component
+        disruptive:
+            reboot
         bug_id:
             bugzilla_1660796, bugzilla_1764790
         is_customer_case:
@@ -335,9 +335,7 @@ class TestLifeCycle(unittest.TestCase):
         utils_lib.is_arch(self, arch='x86', action='cancel')
         cmd = 'sudo grubby --update-kernel=ALL --args="hpet_mmap=1"'
         utils_lib.run_cmd(self, cmd, msg='Append hpet_mmap=1 to command line!', timeout=600)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
         utils_lib.run_cmd(self, 'cat /proc/cmdline', expect_kw='hpet_mmap=1')
         utils_lib.run_cmd(self, 'sudo dmesg | grep -i hpet', expect_kw='enabled', expect_not_kw='6HPET')
         cmd = 'sudo cat /sys/devices/system/clocksource/clocksource0/available_clocksource'
@@ -350,6 +348,8 @@ class TestLifeCycle(unittest.TestCase):
         '''
         bz: 1896786
         polarion_id:
+        disruptive:
+            reboot
         '''
         utils_lib.run_cmd(self,
                     r'sudo rm -rf /var/crash/*',
@@ -361,9 +361,7 @@ class TestLifeCycle(unittest.TestCase):
             self.skipTest("skip when cpu count over 36 when nosmt passing")
         cmd = 'sudo grubby --update-kernel=ALL --args="mitigations=auto,nosmt"'
         utils_lib.run_cmd(self, cmd, msg='Append mitigations=auto,nosmt to command line!', timeout=600)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
         utils_lib.run_cmd(self, 'cat /proc/cmdline', expect_kw='mitigations=auto,nosmt')
         utils_lib.check_log(self, "CallTrace", skip_words='ftrace,Failed to write ATTR,nofail', rmt_redirect_stdout=True)
 
@@ -371,15 +369,15 @@ class TestLifeCycle(unittest.TestCase):
         '''
         bz: 1809429
         polarion_id:
+        disruptive:
+            reboot
         '''
         utils_lib.run_cmd(self, r'sudo rm -rf /var/crash/*',
                     expect_ret=0, msg='clean /var/crash firstly')
         option = 'usbcore.quirks=quirks=0781:5580:bk,0a5c:5834:gij'
         cmd = 'sudo grubby --update-kernel=ALL --args="{}"'.format(option)
         utils_lib.run_cmd(self, cmd, msg='Append {} to command line!'.format(option), timeout=600)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
 
         utils_lib.run_cmd(self, 'cat /proc/cmdline', expect_kw=option)
         cmd = r'sudo cat /var/crash/*/vmcore-dmesg.txt|tail -100'
@@ -413,6 +411,8 @@ class TestLifeCycle(unittest.TestCase):
             AMD
         component:
             component
+        disruptive:
+            reboot
         bug_id:
             bugzilla_2241202,bugzilla_2218934
         is_customer_case:
@@ -475,6 +475,8 @@ class TestLifeCycle(unittest.TestCase):
             N/A
         component:
             component
+        disruptive:
+            reboot
         bug_id:
             https://issues.redhat.com/browse/RHEL-15176
         is_customer_case:
@@ -504,9 +506,7 @@ class TestLifeCycle(unittest.TestCase):
                     msg='clean /var/crash firstly')
         cmd = 'sudo grubby --update-kernel=ALL --args="mem_encrypt=on"'
         utils_lib.run_cmd(self, cmd, msg='Append mem_encrypt=on to command line!', timeout=600)
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
         utils_lib.run_cmd(self, 'cat /proc/cmdline', expect_kw='mem_encrypt=on')
         utils_lib.run_cmd(self, 'sudo dmesg | grep -i mem_encrypt', expect_kw='=on')
         utils_lib.check_log(self, "CallTrace", skip_words='ftrace', rmt_redirect_stdout=True)
@@ -521,6 +521,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.test_kdump_no_specify_cpu
         component:
             kdump
+        disruptive:
+            crash
         bugzilla_id:
             1654962
         is_customer_case:
@@ -584,6 +586,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.test_kdump_each_cpu
         component:
             kdump
+        disruptive:
+            crash
         bugzilla_id:
             1396554
         is_customer_case:
@@ -669,6 +673,8 @@ class TestLifeCycle(unittest.TestCase):
             note: kexec "-s" is recommended in 2118669 devel's comment
         pass_criteria: 
             System shutdown and reboot with the specified kernel version, kernel can be loaded via kexec.
+        disruptive:
+            reboot
         '''
         cmd = 'sudo rpm -qa|grep -e "kernel-[0-9]"'
         output = utils_lib.run_cmd(self, cmd, msg='Get kernel version')
@@ -685,9 +691,7 @@ class TestLifeCycle(unittest.TestCase):
                 cmd = "sudo kexec -s -l %s --initrd=%s --reuse-cmdline" % (kernel_vmlinuz, kernel_initramfs)
             utils_lib.run_cmd(self, cmd, msg='Switch kernel', expect_ret=0)
             cmd = "sudo systemctl kexec"
-            utils_lib.run_cmd(self, cmd, msg='fast reboot system')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, method='kexec', cmd=cmd, msg='fast reboot system')
             utils_lib.run_cmd(self, 'uname -r', msg='check kernel', expect_ret=0, expect_kw=kernel[7:])
 
     def test_kdump_fastboot_kexec_e(self):
@@ -712,6 +716,8 @@ class TestLifeCycle(unittest.TestCase):
             3. When the kernel is loaded, run command "sudo kexec -e".
         pass_criteria: 
             Kernel can be loaded via kexec, and system will reboot into the loaded kernel via kexec -e without calling shutdown(8).
+        disruptive:
+            reboot
         '''
         cmd = 'sudo rpm -qa|grep -e "kernel-[0-9]"'
         output = utils_lib.run_cmd(self, cmd, msg='Get kernel version')
@@ -728,9 +734,7 @@ class TestLifeCycle(unittest.TestCase):
                 cmd = "sudo kexec -s -l %s --initrd=%s --reuse-cmdline" % (kernel_vmlinuz, kernel_initramfs)
             utils_lib.run_cmd(self, cmd, msg='Switch kernel', expect_ret=0)
             cmd = "sudo kexec -e"
-            utils_lib.run_cmd(self, cmd, msg='fast reboot system')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, method='kexec', cmd=cmd, msg='fast reboot system')
             utils_lib.run_cmd(self, 'uname -r', msg='check kernel', expect_ret=0, expect_kw=kernel[7:])
 
     def test_launch_pingable(self):
@@ -759,6 +763,8 @@ class TestLifeCycle(unittest.TestCase):
             N/A
         component:
             component
+        disruptive:
+            reboot
         bug_id:
             jira_RHEL-40816
         is_customer_case:
@@ -863,6 +869,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_reboot_vm
         component:
             lifecycle
+        disruptive:
+            reboot
         bugzilla_id:
             N/A
         is_customer_case:
@@ -883,9 +891,7 @@ class TestLifeCycle(unittest.TestCase):
         before = utils_lib.run_cmd(self, 'last reboot --time-format full')
         if not self.vm:
             self.skipTest('no vm provider found')
-        self.vm.reboot(wait=True)
-        time.sleep(30)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, method='api')
         output = utils_lib.run_cmd(self, 'whoami').strip()
         self.assertEqual(
             self.vm.vm_username, output,
@@ -907,6 +913,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_reboot_inside_vm
         component:
             lifecycle
+        disruptive:
+            reboot
         bugzilla_id:
             N/A
         is_customer_case:
@@ -925,9 +933,7 @@ class TestLifeCycle(unittest.TestCase):
             N/A
         """
         before = utils_lib.run_cmd(self, 'last reboot --time-format full|wc -l')
-        utils_lib.run_cmd(self, 'sudo reboot')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self)
         output = utils_lib.run_cmd(self, 'whoami')
         if self.vm:
             self.assertEqual(
@@ -964,6 +970,8 @@ class TestLifeCycle(unittest.TestCase):
             Generic case without any specific setup.
         component:
             kernel
+        disruptive:
+            reboot
         bug_id:
             bugzilla_2033214
         is_customer_case:
@@ -989,7 +997,7 @@ class TestLifeCycle(unittest.TestCase):
         before = utils_lib.run_cmd(self, 'uptime -s')
         utils_lib.run_cmd(self, 'sudo bash -c "echo b > /proc/sysrq-trigger & echo b > /proc/sysrq-trigger"')
         time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.init_connection(self, timeout=self.ssh_timeout, force=True)
         output = utils_lib.run_cmd(self, 'whoami')
         if self.vm:
             self.assertEqual(
@@ -1003,7 +1011,7 @@ class TestLifeCycle(unittest.TestCase):
     def _start_vm_and_check(self):
         self.vm.start(wait=True)
         time.sleep(60)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.init_connection(self, timeout=self.ssh_timeout, force=True)
         output = utils_lib.run_cmd(self, 'whoami').strip()
         self.assertEqual(self.vm.vm_username,
             output,
@@ -1019,6 +1027,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_stop_start_vm
         component:
             lifecycle
+        disruptive:
+            reboot
         bugzilla_id:
             N/A
         is_customer_case:
@@ -1061,9 +1071,7 @@ class TestLifeCycle(unittest.TestCase):
     def _update_kernel_args(self, boot_param_required):
         cmd = 'sudo grubby --update-kernel=ALL --args="{}"'.format(boot_param_required)
         utils_lib.run_cmd(self, cmd, msg="append {} to boot params".format(boot_param_required))
-        utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test')
-        time.sleep(10)
-        utils_lib.init_connection(self, timeout=self.ssh_timeout)
+        utils_lib.reboot_and_wait(self, msg='reboot system under test')
         cat_proc_cmdline = utils_lib.run_cmd(self, 'cat /proc/cmdline')
         return cat_proc_cmdline
 
@@ -1157,6 +1165,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_kdump_nr_cpus
         component:
             kexec-tools
+        disruptive:
+            crash
         bugzilla_id:
             2123230
         is_customer_case:
@@ -1238,6 +1248,8 @@ class TestLifeCycle(unittest.TestCase):
             4. Send Diagnostic Interrupt to the instance.
         pass_criteria: 
             Unknown NMI received and kernel panic isn't triggered, system is still running with no error message.
+        disruptive:
+            crash
         '''
         if not self.vm:
             self.skipTest('vm not init')
@@ -1280,6 +1292,8 @@ class TestLifeCycle(unittest.TestCase):
             4. Send Diagnostic Interrupt to the instance.
         pass_criteria: 
             Kernel panic is triggered, system reboot after panic, and vm core is gernerated in /var/crash after crash. 
+        disruptive:
+            crash
         '''
         if not self.vm:
             self.skipTest('vm not init')
@@ -1325,6 +1339,8 @@ class TestLifeCycle(unittest.TestCase):
             https://github.com/virt-s1/os-tests/blob/master/os_tests/tests/test_lifecycle.py
         component:
             kernel
+        disruptive:
+            reboot
         bugzilla_id:
             1898677
         is_customer_case:
@@ -1408,9 +1424,7 @@ class TestLifeCycle(unittest.TestCase):
                 utils_lib.run_cmd(self, cmd, timeout=240)
 
                 utils_lib.run_cmd(self, 'sudo dracut -f', msg='Regenerate initramfs')
-                utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system to make updating kernel take effect')
-                time.sleep(10)
-                utils_lib.init_connection(self, timeout=self.ssh_timeout)
+                utils_lib.reboot_and_wait(self, msg='reboot system to make updating kernel take effect')
                 utils_lib.run_cmd(self, 'cat /proc/cmdline', msg='Check /proc/cmdline')
 
         cmd = "sleep 3600 > /dev/null 2>&1 &"
@@ -1451,6 +1465,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_kdump_over_ssh
         component:
             kexec-tools
+        disruptive:
+            crash
         bugzilla_id:
             1672817, 2186123,2185043
         is_customer_case:
@@ -1555,6 +1571,8 @@ class TestLifeCycle(unittest.TestCase):
             os_tests.tests.test_lifecycle.TestLifeCycle.test_kdump_over_nfs
         component:
             kexec-tools
+        disruptive:
+            crash
         bugzilla_id:
             1672817, 2186123,2185043
         is_customer_case:
@@ -1705,9 +1723,7 @@ class TestLifeCycle(unittest.TestCase):
                     self.vm.create()
                 utils_lib.init_connection(self, timeout=self.ssh_timeout)
         if reboot_require:
-            utils_lib.run_cmd(self, 'sudo reboot', msg='reboot system under test to restore setting')
-            time.sleep(10)
-            utils_lib.init_connection(self, timeout=self.ssh_timeout)
+            utils_lib.reboot_and_wait(self, msg='reboot system under test to restore setting')
             utils_lib.run_cmd(self, 'cat /proc/cmdline', msg='Check /proc/cmdline')
         
         if "test_kdump_over_ssh" in self.id() or "test_kdump_over_nfs" in self.id():
@@ -23,25 +23,21 @@ class TestLTP(unittest.TestCase):
         utils_lib.run_cmd(self, '\n')
         utils_lib.run_cmd(self, ltp_cmd, timeout=600)
         time.sleep(5)
-        utils_lib.run_cmd(self, 'sudo cat /tmp/ltplog')
+        utils_lib.run_cmd(self, 'sudo cat /tmp/ltplog', stream=True)
         utils_lib.run_cmd(self,
                     'sudo cat /opt/ltp/results/*',
-                    expect_ret=0,expect_kw='Total Failures: 0')
+                    expect_ret=0,expect_kw='Total Failures: 0', stream=True)
 
     def setUp(self):
         utils_lib.init_case(self)
         if utils_lib.is_arch(self, arch='aarch64'):
             ltp_rpm = self.utils_dir + '/ltp-master.aarch64.rpm'
-            ltp_rpm_tmp = '/tmp/ltp-master.aarch64.rpm'
         else:
             ltp_rpm = self.utils_dir + '/ltp-master.x86_64.rpm'
-            ltp_rpm_tmp = '/tmp/ltp-master.x86_64.rpm'
         cmd = 'ls -l /opt/ltp/runtest/smoketest'
         ret = utils_lib.run_cmd(self, cmd, ret_status=True, msg='Check if it is ltp version with smoketest')
         if not utils_lib.is_pkg_installed(self, pkg_name='ltp',is_install=False) or ret != 0:
-            if self.params.get('remote_node') is not None:
-                self.SSH.put_file(local_file=ltp_rpm, rmt_file=ltp_rpm_tmp)
-                ltp_rpm = ltp_rpm_tmp
+            ltp_rpm = utils_lib.sync_files(self, ltp_rpm)
         if ret != 0:
             force = True
         else:
@@ -973,22 +973,26 @@ COMMIT
         if len(self.params['remote_nodes']) < 2:
             self.skipTest("2 nodes required, current IP bucket:{}".format(self.params['remote_nodes']))
         self.log.info("Current IP bucket:{}".format(self.params['remote_nodes']))
-        self.log.info('Install iperf3 on vm[0]')
-        utils_lib.is_cmd_exist(self,"iperf3")
-        self.log.info('Install iperf3 on vm[1]')
-        utils_lib.init_connection(self, timeout=180, rmt_node=self.params['remote_nodes'][-1])
-        utils_lib.run_cmd(self, "rpm -q iperf3||sudo yum install -y iperf3", expect_ret=0, timeout=180, rmt_node=self.params['remote_nodes'][-1])
-        self.log.info('Start iperf testing')
-        iperf_srv_cmd = 'sudo bash -c "iperf3 -s >/dev/null 2>&1 &"'
-        utils_lib.run_cmd(self, iperf_srv_cmd, rmt_node=self.params['remote_nodes'][-1])
-        cmd = "ip addr show {}".format(self.active_nic )
-        output = utils_lib.run_cmd(self, cmd, expect_ret=0, \
-            msg='try to get {} ipv4 address'.format(self.active_nic ),rmt_node=self.params['remote_nodes'][-1])
+        srv_node = self.params['remote_nodes'][-1]
+        utils_lib.init_connection(self, timeout=180, rmt_node=srv_node)
+        self.log.info('Install iperf3 on vm[0] and vm[1]')
+        install_cmd = "rpm -q iperf3||sudo yum install -y iperf3"
+        _, _, output = utils_lib.gather_on_nodes(self, [
+            {'cmd': install_cmd, 'expect_ret': 0},
+            {'cmd': install_cmd, 'expect_ret': 0, 'rmt_node': srv_node},
+            {'cmd': "ip addr show {}".format(self.active_nic), 'expect_ret': 0, 'rmt_node': srv_node,
+             'msg': 'try to get {} ipv4 address'.format(self.active_nic)}], timeout=180)
         srv_ipv4 = re.findall('[\d.]{7,16}', output)[0]
-        iperf_cli_cmd = 'iperf3 -P 10 -c {} -t 60'.format(srv_ipv4)
-        res = utils_lib.run_cmd(self, iperf_cli_cmd, expect_ret=0, timeout=120)
-        if not re.search('(\d+)\s+Mbits/sec.+sender', res):
-            res = utils_lib.run_cmd(self, iperf_cli_cmd, expect_ret=0, timeout=120)
+        self.log.info('Start iperf testing')
+        # server exits after serving one client, client retries until server is listening
+        iperf_srv_cmd = 'sudo timeout 150 iperf3 -s -1'
+        iperf_cli_cmd = 'for i in $(seq 10); do iperf3 -P 10 -c {} -t 60 && break; sleep 1; done'.format(srv_ipv4)
+        for _ in range(2):
+            _, res = utils_lib.gather_on_nodes(self, [
+                {'cmd': iperf_srv_cmd, 'rmt_node': srv_node},
+                {'cmd': iperf_cli_cmd, 'expect_ret': 0}], timeout=180)
+            if re.search('(\d+)\s+Mbits/sec.+sender', res):
+                break
         bandwidth_map = {'default':1000}
         if self.vm and hasattr(self.vm, 'net_bandwidth'):
             if self.vm.net_bandwidth>100:
@@ -1658,18 +1662,9 @@ COMMIT
         """
         if utils_lib.is_aws(self) or utils_lib.is_gcp(self):
             self.skipTest("Unable to download pkg from internal site now")
-        check_file = self.utils_dir + '/nw_pktgen.sh'
-        check_file_tmp = '/tmp/nw_pktgen.sh'
-        if self.params.get('remote_node') is not None:
-            cmd = 'ls -l {}'.format(check_file_tmp)
-            ret = utils_lib.run_cmd(self, cmd, ret_status=True, msg='check if {} exists'.format(check_file))
-            if ret != 0:
-                self.SSH.put_file(local_file=check_file, rmt_file=check_file_tmp)
-        else:
-            cmd = 'sudo cp -f {} {}'.format(check_file,check_file_tmp)
-            utils_lib.run_cmd(self, cmd)
+        check_file_tmp = utils_lib.sync_files(self, 'utils/nw_pktgen.sh')
         utils_lib.run_cmd(self,"sudo chmod 755 %s" % check_file_tmp)
-        res = utils_lib.run_cmd(self,"sudo /tmp/nw_pktgen.sh %s" % self.rhel_x_version)
+        res = utils_lib.run_cmd(self,"sudo %s %s" % (check_file_tmp, self.rhel_x_version))
         self.assertIn("INFO: Case passed", res, "nw_pktgen.sh check failed.")
 
     def test_network_device_hotplug(self):
@@ -1792,16 +1787,7 @@ COMMIT
 
         utils_lib.imds_tracer_tool(self, timeout=10, interval=5, log_check=False)
         if self.vm.provider == 'ali':
-            config_file = self.utils_dir + '/nm_cloud_setup.sh'
-            config_file_tmp = '/tmp/nm_cloud_setup.sh'
-            if self.params.get('remote_node') is not None:
-                cmd = 'ls -l {}'.format(config_file_tmp)
-                ret = utils_lib.run_cmd(self, cmd, ret_status=True, msg='check if {} exists'.format(config_file))
-                if ret != 0:
-                    self.SSH.put_file(local_file=config_file, rmt_file=config_file_tmp)
-            else:
-                cmd = 'sudo cp -f {} {}'.format(config_file,config_file_tmp)
-                utils_lib.run_cmd(self, cmd)
+            config_file_tmp = utils_lib.sync_files(self, 'utils/nm_cloud_setup.sh')
             utils_lib.run_cmd(self,'sudo chmod 755 {}'.format(config_file_tmp))
             utils_lib.run_cmd(self,'sudo {} ALIYUN'.format(config_file_tmp), rmt_get_pty=True)
 
@@ -1919,16 +1905,7 @@ COMMIT
         secondary_ip_count = 10
         if self.vm.provider == 'ali':
             secondary_ip_count = self.vm.private_ip_quantity - 1
-            config_file = self.utils_dir + '/nm_cloud_setup.sh'
-            config_file_tmp = '/tmp/nm_cloud_setup.sh'
-            if self.params.get('remote_node') is not None:
-                cmd = 'ls -l {}'.format(config_file_tmp)
-                ret = utils_lib.run_cmd(self, cmd, ret_status=True, msg='check if {} exists'.format(config_file))
-                if ret != 0:
-                    self.SSH.put_file(local_file=config_file, rmt_file=config_file_tmp)
-            else:
-                cmd = 'sudo cp -f {} {}'.format(config_file,config_file_tmp)
-                utils_lib.run_cmd(self, cmd)
+            config_file_tmp = utils_lib.sync_files(self, 'utils/nm_cloud_setup.sh')
             utils_lib.run_cmd(self,'sudo chmod 755 {}'.format(config_file_tmp))
             utils_lib.run_cmd(self,'sudo {} ALIYUN'.format(config_file_tmp), rmt_get_pty=True)
 
@@ -2127,13 +2104,7 @@ COMMIT
         debug_want: |
             dmesg
         """
-        veth_nic_rx = self.utils_dir + '/veth_nic_rx.sh'
-        veth_nic_rx_run = '/tmp/veth_nic_rx.sh'
-        if self.params.get('remote_node') is not None:
-            self.SSH.put_file(local_file=veth_nic_rx, rmt_file=veth_nic_rx_run)
-        else:
-            cmd = 'sudo cp -f {} {}'.format(veth_nic_rx,veth_nic_rx_run)
-            utils_lib.run_cmd(self, cmd)
+        veth_nic_rx_run = utils_lib.sync_files(self, 'utils/veth_nic_rx.sh')
         utils_lib.run_cmd(self,"sudo chmod 755 %s" % veth_nic_rx_run)
         utils_lib.run_cmd(self,'sudo bash -c "{} {}"'.format(veth_nic_rx_run, self.active_nic), timeout=500, msg='the system might loss connection if the script cannot finish normally.')
         utils_lib.init_connection(self, timeout=180)
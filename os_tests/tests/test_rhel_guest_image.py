@@ -471,9 +471,7 @@ class TestGuestImage(unittest.TestCase):
         selinux_now = "/tmp/" + "selinux.now"
         product_id = utils_lib.get_product_id(self)
         data_file = "selinux.el%s.lst" % product_id.split('.')[0]
-        src_path = self.data_dir + '/guest-images/' + data_file
-        dest_path = "/tmp/" + data_file
-        self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+        dest_path = utils_lib.sync_files(self, 'data/guest-images/' + data_file)
         cmd = "sudo restorecon -R -v -n / -e /mnt -e /proc -e /sys \
 -e /tmp -e /var/tmp -e /run >{0}".format(selinux_now)
         output = utils_lib.run_cmd(
@@ -524,18 +522,15 @@ class TestGuestImage(unittest.TestCase):
         product_id = utils_lib.get_product_id(self)
         data_file = "rogue.el%s.lst" % product_id.split('.')[0]
         utils_script = "rogue.sh"
-        src_path = self.data_dir + '/guest-images/' + utils_script
-        dest_path = '/tmp/' + utils_script
-        self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+        files = utils_lib.sync_files(self, ['data/guest-images/' + utils_script, 'data/guest-images/' + data_file])
+        dest_path = files['data/guest-images/' + utils_script]
         cmd = "sudo sh -c 'chmod 755 %s && %s'" % (dest_path, dest_path)
         output = utils_lib.run_cmd(self,
                                    cmd,
                                    expect_ret=0,
                                    timeout=300,
                                    msg="run rogue.sh")
-        src_path = self.data_dir + '/guest-images/' + data_file
-        dest_path = '/tmp/' + data_file
-        self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+        dest_path = files['data/guest-images/' + data_file]
         cmd = "grep -vxFf %s %s" % (dest_path, "/tmp/rogue")
         output = utils_lib.run_cmd(self,
                                    cmd,
@@ -575,9 +570,7 @@ class TestGuestImage(unittest.TestCase):
         data_file = "rpm_va.el%s.lst" % product_id.split('.')[0]
         # cmd = "sudo prelink -amR"
         # output = utils_lib.run_cmd(self, cmd, expect_ret=0, msg="prelink -amR")
-        src_path = self.data_dir + '/guest-images/' + data_file
-        dest_path = '/tmp/' + data_file
-        self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+        dest_path = utils_lib.sync_files(self, 'data/guest-images/' + data_file)
 
         cmd = "sudo rpm -Va | grep -vxFf {0} | grep -Ev \
         '/boot/initramfs|/boot/System.map'".format(dest_path)
@@ -592,6 +585,9 @@ class TestGuestImage(unittest.TestCase):
         src_dir = self.data_dir + "/guest-images/file_cmp.el%s/" % product_id.split(
             '.')[0]
         if os.path.isdir(src_dir):
+            # upload all files to compare at once
+            cmp_dir = "data/guest-images/file_cmp.el%s/" % product_id.split('.')[0]
+            files = utils_lib.sync_files(self, [cmp_dir + f for f in os.listdir(src_dir)])
             for f in os.listdir(src_dir):
                 m = re.match(r"^(%.*%)(.*)\.el(\d)$", f)
                 if m:
@@ -604,11 +600,9 @@ class TestGuestImage(unittest.TestCase):
                     m = re.match(r"^(%.*%)(.*)$", f)
                     f_name = m.group(2)
                     f_name_l = f.replace('%', '/')
-                src_path = src_dir + f
-                dest_path = '/tmp/' + f_name
-                self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+                dest_path = files[cmp_dir + f]
                 cmd = "grep -xv '^[[:space:]][[:space:]]*$' %s | diff \
--wB - %s" % (f_name_l, "/tmp/" + f_name)
+-wB - %s" % (f_name_l, dest_path)
                 output = utils_lib.run_cmd(self,
                                            cmd,
                                            msg="compare through grep")
@@ -706,9 +700,7 @@ class TestGuestImage(unittest.TestCase):
             N/A
         """
         data_file = "rpm_sign.lst"
-        src_path = self.data_dir + '/guest-images/' + data_file
-        dest_path = '/tmp/' + data_file
-        self.SSH.put_file(local_file=src_path, rmt_file=dest_path)
+        dest_path = utils_lib.sync_files(self, 'data/guest-images/' + data_file)
         cmd = "rpm -qa --qf '%{name}-%{version}-%{release}.%{arch} \
 (%{SIGPGP:pgpsig})\n'|grep -v 'Key ID'" + "|grep -vFf %s" % dest_path
         output = utils_lib.run_cmd(self, cmd, msg="compare through grep")
@@ -196,18 +196,11 @@ class TestSLES(unittest.TestCase):
             self.assertTrue(result == 0)
 
     def confirm_license_content(self, license_dirs, license_content):
-        for dir in license_dirs:
-            if self.file.exists(dir) and self.file.is_directory(dir):
+        for dir, is_dir in zip(license_dirs, self.file.is_directory(license_dirs)):
+            if is_dir:
                 license = dir + "license.txt"
-                return all(
-                    [
-                        self.file.exists(license),
-                        self.file.is_file(license),
-                        any(
-                            self.file.contains(content, license)
-                            for content in license_content
-                        ),
-                    ]
+                return self.file.is_file(license) and any(
+                    self.file.contains(license_content, license)
                 )
 
     def test_sles_license(self):
@@ -28,14 +28,10 @@ class TestStorage(unittest.TestCase):
         utils_dir = os.path.dirname(utils_dir) + '/utils'
         if utils_lib.is_arch(self, arch='aarch64'):
             blktests_rpm = utils_dir + '/blktests-master.aarch64.rpm'
-            blktests_rpm_tmp = '/tmp/blktests-master.aarch64.rpm'
         else:
             blktests_rpm = utils_dir + '/blktests-master.x86_64.rpm'
-            blktests_rpm_tmp = '/tmp/blktests-master.x86_64.rpm'
         if not utils_lib.is_pkg_installed(self, pkg_name='blktests',is_install=False) and 'blktests' in self.id():
-            if self.params['remote_node']:
-                self.SSH.put_file(local_file=blktests_rpm, rmt_file=blktests_rpm_tmp)
-                blktests_rpm = blktests_rpm_tmp
+            blktests_rpm = utils_lib.sync_files(self, blktests_rpm)
         if 'blktests' in self.id():
             utils_lib.pkg_install(self, pkg_name='blktests', pkg_url=blktests_rpm,force=True)
         self.cursor = utils_lib.get_cmd_cursor(self, timeout=120)
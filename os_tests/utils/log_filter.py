@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Log keyword filter of os-tests run on the system under test, stdlib only and
+works with python2.7/3.6+.
+It reads log from stdin and checks all keywords and baseline triggers in one
+pass, only matched lines are sent back, so the transfer size depends on the
+findings instead of log size.
+The spec is a base64 encoded json in the last argument:
+    {"keywords": ["error", "warn"], "skip_words": ["skipped"],
+     "triggers": ["aarch64"], "cursor": "last line got before"}
+keywords are matched the same as utils_lib.find_word(".*kw.*" ignoring case),
+lines containing any of skip_words are dropped, triggers are regex searched
+in all lines. Lines before cursor are ignored if cursor is found.
+Output is one line of marker followed by json:
+    {"lines": 1024, "found": {"error": {"matched line": 2}}, "triggers": ["aarch64"],
+     "truncated": false}
+"truncated" is true if a keyword matched more than MAX_ITEMS distinct lines,
+the found lines are not complete then and the log needs to be checked as a whole.
+It exits with 1 if no log line is read, the same as "grep -v" in a pipeline.
+"""
+import base64
+import json
+import re
+import sys
+
+MARKER = "OS_TESTS_LOG_FILTER"
+# distinct matched lines kept for each keyword
+MAX_ITEMS = 1000
+
+
+def main():
+    spec = json.loads(base64.b64decode(sys.argv[-1]).decode("utf-8"))
+    keywords = spec.get("keywords") or []
+    patterns = [
+        (kw, re.compile(".*" in kw and kw or ".*{}.*".format(kw), re.I))
+        for kw in keywords
+    ]
+    skip_words = spec.get("skip_words") or []
+    triggers = [(i, re.compile(i, re.I)) for i in spec.get("triggers") or []]
+    cursor = spec.get("cursor")
+
+    def new_result():
+        return {
+            "lines": 0,
+            "found": dict((kw, {}) for kw in keywords),
+            "triggers": [],
+            "truncated": False,
+        }
+
+    result = new_result()
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
+    for raw in stdin:
+        line = raw.decode("utf-8", "replace").rstrip("\n")
+        if cursor and cursor in line:
+            # the same as run_cmd, check log from the first line with cursor
+            result = new_result()
+            line = line[line.index(cursor) :]
+            cursor = None
+        result["lines"] += 1
+        for trigger, pattern in triggers:
+            if trigger not in result["triggers"] and pattern.search(line):
+                result["triggers"].append(trigger)
+        for kw, pattern in patterns:
+            items = result["found"][kw]
+            for item in pattern.findall(line):
+                if any(word in item for word in skip_words):
+                    continue
+                if item in items:
+                    items[item] += 1
+                elif len(items) < MAX_ITEMS:
+                    items[item] = 1
+                else:
+                    result["truncated"] = True
+    sys.stdout.write("\n{} {}\n".format(MARKER, json.dumps(result)))
+    sys.exit(0 if result["lines"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Resident agent of os-tests on the system under test, stdlib only and works
+with python3.6+ (platform-python on RHEL8).
+It reads one json request per line from stdin and writes one json response
+per line to stdout, responses carry the id of their requests and might be
+out of order as requests are handled concurrently.
+Requests:
+    {"id": 1, "op": "ping"}
+    {"id": 2, "op": "exec", "cmd": "uname -r", "timeout": 120}
+    {"id": 3, "op": "stat", "path": "/etc/os-release"}
+    {"id": 4, "op": "read", "path": "/var/log/messages", "offset": 0, "size": 1048576}
+    {"id": 5, "op": "write", "path": "/tmp/a", "data": "<base64>", "append": false}
+    {"id": 6, "op": "tail", "path": "/var/log/messages", "offset": 1024}
+The agent runs as root when started by sudo, cmds are run as the sudo user
+the same as plain ssh exec, file operations are done as root.
+It exits when stdin is closed, eg. ssh channel closed.
+"""
+import base64
+import json
+import os
+import pwd
+import signal
+import subprocess
+import sys
+import threading
+
+VERSION = 1
+# max bytes returned by one read or tail request
+MAX_READ_SIZE = 4 * 1024 * 1024
+DEFAULT_PATH = "/usr/local/bin:/usr/bin:/usr/local/sbin:/usr/sbin"
+
+OUT_LOCK = threading.Lock()
+
+
+def get_user_env():
+    """
+    Return (preexec_fn, env, cwd) to run cmds as the user who started agent by sudo.
+    """
+    user = os.environ.get("SUDO_USER")
+    if os.getuid() != 0 or not user or user == "root":
+        return None, None, None
+    user_info = pwd.getpwnam(user)
+    env = {
+        "HOME": user_info.pw_dir,
+        "USER": user,
+        "LOGNAME": user,
+        "SHELL": user_info.pw_shell,
+        "PATH": DEFAULT_PATH,
+        "LANG": os.environ.get("LANG", "C.UTF-8"),
+    }
+
+    def demote():
+        os.setgid(user_info.pw_gid)
+        os.initgroups(user, user_info.pw_gid)
+        os.setuid(user_info.pw_uid)
+
+    cwd = user_info.pw_dir if os.path.isdir(user_info.pw_dir) else "/"
+    return demote, env, cwd
+
+
+PREEXEC_FN, USER_ENV, USER_CWD = get_user_env()
+
+
+def do_ping(req):
+    return {"version": VERSION, "pid": os.getpid()}
+
+
+def do_exec(req):
+    shell = (USER_ENV or {}).get("SHELL") or "/bin/sh"
+    proc = subprocess.Popen(
+        [shell, "-c", req["cmd"]],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=PREEXEC_FN,
+        env=USER_ENV,
+        cwd=USER_CWD,
+        start_new_session=True,
+    )
+    try:
+        stdout, stderr = proc.communicate(timeout=req.get("timeout"))
+        is_timeout = False
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        stdout, stderr = proc.communicate()
+        is_timeout = True
+    return {
+        "status": None if is_timeout else proc.returncode,
+        "timeout": is_timeout,
+        "stdout": stdout.decode("utf-8", "replace"),
+        "stderr": stderr.decode("utf-8", "replace"),
+    }
+
+
+def do_stat(req):
+    path = req["path"]
+    try:
+        st = os.stat(path)
+    except OSError:
+        # the same as "test -e", broken link does not exist
+        return {"exists": False, "is_file": False, "is_dir": False}
+    return {
+        "exists": True,
+        "is_file": os.path.isfile(path),
+        "is_dir": os.path.isdir(path),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "mode": st.st_mode,
+    }
+
+
+def do_read(req):
+    size = min(int(req.get("size") or MAX_READ_SIZE), MAX_READ_SIZE)
+    with open(req["path"], "rb") as fh:
+        fh.seek(int(req.get("offset") or 0))
+        data = fh.read(size)
+        total = os.fstat(fh.fileno()).st_size
+    return {
+        "data": base64.b64encode(data).decode(),
+        "eof": len(data) < size,
+        "size": total,
+    }
+
+
+def do_write(req):
+    with open(req["path"], "ab" if req.get("append") else "wb") as fh:
+        fh.write(base64.b64decode(req.get("data") or ""))
+    if req.get("mode") is not None:
+        os.chmod(req["path"], int(req["mode"]))
+    return {"size": os.stat(req["path"]).st_size}
+
+
+def do_tail(req):
+    """
+    Return content appended since offset, read from the beginning if the
+    file was truncated or rotated.
+    """
+    offset = int(req.get("offset") or 0)
+    if not os.path.exists(req["path"]):
+        return {"data": "", "offset": 0}
+    if os.stat(req["path"]).st_size < offset:
+        offset = 0
+    with open(req["path"], "rb") as fh:
+        fh.seek(offset)
+        data = fh.read(MAX_READ_SIZE)
+    return {"data": base64.b64encode(data).decode(), "offset": offset + len(data)}
+
+
+OPS = {
+    "ping": do_ping,
+    "exec": do_exec,
+    "stat": do_stat,
+    "read": do_read,
+    "write": do_write,
+    "tail": do_tail,
+}
+
+
+def reply(resp):
+    line = json.dumps(resp) + "\n"
+    with OUT_LOCK:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def handle(req):
+    resp = {"id": req.get("id")}
+    try:
+        resp.update(OPS[req["op"]](req))
+    except KeyError as err:
+        resp["error"] = "unknown op or missing field: {}".format(err)
+    except Exception as err:
+        resp["error"] = "{}: {}".format(err.__class__.__name__, err)
+    reply(resp)
+
+
+def main():
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+        except ValueError as err:
+            reply({"id": None, "error": "bad request: {}".format(err)})
+            continue
+        thread = threading.Thread(target=handle, args=(req,))
+        thread.daemon = True
+        thread.start()
+
+
+if __name__ == "__main__":
+    main()